@@ -94,10 +94,10 @@ a = Analysis(
     binaries=[],
     datas=[
         ('icon.png', '.'),
-        ('core/webview_launcher.py', 'core'),
     ],
     hiddenimports=[
         'webview',
+        'webview_launcher',
         'requests',
         'PIL',
         'PIL._tkinter_finder',
@@ -176,12 +176,8 @@ EOF
         exit 1
     fi
     
-    # Copy webview_launcher.py
-    if [ -f "core/webview_launcher.py" ]; then
-        mkdir -p "$APP_DIR/core"
-        cp core/webview_launcher.py "$APP_DIR/core/"
-        cp core/webview_launcher.py "$APP_DIR/usr/bin/"
-    fi
+    # Console windows run the executable itself in webview worker mode,
+    # so no launcher script or system Python is needed
     
     if [ -f "icon.png" ]; then
         cp icon.png "$APP_DIR/"
@@ -198,12 +194,6 @@ export APPDIR="${HERE}"
 
 cd "${HERE}"
 
-if [ -f "${HERE}/core/webview_launcher.py" ]; then
-    export PYTHONPATH="${HERE}:${HERE}/core:${PYTHONPATH}"
-elif [ -f "${HERE}/usr/bin/webview_launcher.py" ]; then
-    export PYTHONPATH="${HERE}/usr/bin:${PYTHONPATH}"
-fi
-
 exec "${HERE}/usr/bin/yap-switch-manager" "$@"
 APPRUN_EOF
     chmod +x "$APP_DIR/AppRun"
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Alert engine - turns switch reachability changes into few, meaningful notifications.
+
+Reachability observations (from site agents or probes) go through three
+stages before anyone is notified:
+
+- Debounce: a new state has to hold for a few seconds before it counts, so
+  one lost probe does not raise an alert.
+- Flap suppression: a switch that changes state too often within a window
+  is reported once as flapping and stays quiet until it has been stable for
+  a whole window again.
+- Grouping: confirmed changes are collected for a short while and sent as
+  one alert per group and kind, e.g. "37 switches at site B unreachable".
+
+The engine also keeps running counts of confirmed states, from which the
+aggregate health shown by the tray icon is derived without rescanning the
+inventory. Only switches with recent activity are looked at on each tick.
+"""
+import threading
+import time
+from collections import deque, namedtuple
+from typing import Callable, Dict, Iterable, Optional
+
+# PIL draws the tray icon badges; HealthIconCache is only created when it is installed
+try:
+    from PIL import ImageDraw
+except ImportError:
+    ImageDraw = None
+
+
+# One notification.
+#   kind: 'down', 'up', 'stale' (no longer reported) or 'flapping'
+#   group: Group the switches belong to (e.g. the site), or None
+Alert = namedtuple('Alert', ['kind', 'group', 'names', 'message', 'at'])
+
+# Aggregate health levels, from best to worst
+HEALTH_UNKNOWN = 'unknown'
+HEALTH_OK = 'ok'
+HEALTH_DEGRADED = 'degraded'
+HEALTH_CRITICAL = 'critical'
+
+# Badge colors of the tray icon per health level
+HEALTH_COLORS = {
+    HEALTH_UNKNOWN: '#999999',
+    HEALTH_OK: '#00AA00',
+    HEALTH_DEGRADED: '#E69500',
+    HEALTH_CRITICAL: '#CC0000',
+}
+
+_KIND_OF_STATE = {True: 'up', False: 'down', None: 'stale'}
+_KIND_TEXT = {'up': 'reachable again', 'down': 'unreachable', 'stale': 'no longer reported'}
+
+
+class _SwitchState:
+    """Observed and confirmed state of one switch."""
+
+    __slots__ = ('observed', 'observed_since', 'confirmed', 'transitions', 'flapping', 'group')
+
+    def __init__(self, state, now, group):
+        self.observed = state
+        self.observed_since = now
+        self.confirmed = state
+        self.transitions = deque()
+        self.flapping = False
+        self.group = group
+
+
+class AlertEngine:
+    """Debounces, de-flaps and groups reachability changes (thread-safe)."""
+
+    def __init__(self, notify: Callable[[Alert], None], settle: float = 10.0,
+                 flap_window: float = 300.0, flap_threshold: int = 4, group_window: float = 5.0,
+                 critical_ratio: float = 0.5):
+        """
+        Initialize the engine.
+
+        Args:
+            notify: Called with each Alert (from the thread calling tick())
+            settle: Seconds a new state must hold before it is confirmed
+            flap_window: Window in seconds for counting state changes
+            flap_threshold: State changes within the window that make a switch flapping
+            group_window: Seconds confirmed changes are collected before being sent together
+            critical_ratio: Share of unreachable switches from which health is critical
+        """
+        self.notify = notify
+        self.settle = settle
+        self.flap_window = flap_window
+        self.flap_threshold = max(2, int(flap_threshold))
+        self.group_window = group_window
+        self.critical_ratio = critical_ratio
+        self._lock = threading.Lock()
+        self._switches = {}
+        # Switches with unconfirmed changes or recent transitions (looked at by tick)
+        self._active = set()
+        self._counts = {True: 0, False: 0, None: 0}
+        # (kind, group) -> names waiting to be sent, and when the first was added
+        self._outbox = {}
+        self._outbox_since = None
+
+    def observe(self, name: str, state: Optional[bool], group: Optional[str] = None,
+                now: Optional[float] = None):
+        """
+        Record the current reachability of one switch.
+
+        Args:
+            name: Switch name
+            state: True reachable, False unreachable, None unknown (e.g. site stopped reporting)
+            group: Group for combined alerts (e.g. the site)
+            now: Current monotonic time (for tests; defaults to time.monotonic())
+        """
+        self.observe_all({name: state}, {name: group} if group is not None else None, now)
+
+    def observe_all(self, states: Dict[str, Optional[bool]], groups: Optional[Dict[str, str]] = None,
+                    now: Optional[float] = None):
+        """
+        Record the reachability of many switches at once.
+
+        The first observation of a switch only sets its baseline; alerts are
+        raised for later changes.
+
+        Args:
+            states: Dictionary mapping switch names to True/False/None
+            groups: Optional dictionary mapping switch names to their group
+            now: Current monotonic time (defaults to time.monotonic())
+        """
+        now = time.monotonic() if now is None else now
+        groups = groups or {}
+        with self._lock:
+            for name, state in states.items():
+                record = self._switches.get(name)
+                if record is None:
+                    self._switches[name] = _SwitchState(state, now, groups.get(name))
+                    self._counts[state] += 1
+                    continue
+                record.group = groups.get(name, record.group)
+                if state == record.observed:
+                    continue
+                record.observed = state
+                record.observed_since = now
+                record.transitions.append(now)
+                self._active.add(name)
+                if not record.flapping and self._recent_transitions(record, now) >= self.flap_threshold:
+                    record.flapping = True
+                    self._queue('flapping', record.group, name, now)
+
+    def forget(self, names: Iterable[str]):
+        """Stop tracking switches (e.g. deleted ones)."""
+        with self._lock:
+            for name in names:
+                record = self._switches.pop(name, None)
+                if record is not None:
+                    self._counts[record.confirmed] -= 1
+                    self._active.discard(name)
+
+    def names(self) -> set:
+        """Get the names of all tracked switches."""
+        with self._lock:
+            return set(self._switches)
+
+    def _recent_transitions(self, record: _SwitchState, now: float) -> int:
+        while record.transitions and now - record.transitions[0] > self.flap_window:
+            record.transitions.popleft()
+        return len(record.transitions)
+
+    def _queue(self, kind: str, group: Optional[str], name: str, now: float):
+        """Add a change to the outbox (caller holds the lock)."""
+        self._outbox.setdefault((kind, group), []).append(name)
+        if self._outbox_since is None:
+            self._outbox_since = now
+
+    def tick(self, now: Optional[float] = None):
+        """
+        Confirm settled changes and send due alerts; call about once a second.
+
+        Args:
+            now: Current monotonic time (defaults to time.monotonic())
+        """
+        now = time.monotonic() if now is None else now
+        alerts = []
+        with self._lock:
+            for name in list(self._active):
+                record = self._switches[name]
+                recent = self._recent_transitions(record, now)
+                if record.flapping:
+                    if recent:
+                        continue
+                    # Quiet for a whole window: report where it ended up
+                    record.flapping = False
+                if record.observed != record.confirmed and now - record.observed_since >= self.settle:
+                    self._counts[record.confirmed] -= 1
+                    self._counts[record.observed] += 1
+                    record.confirmed = record.observed
+                    self._queue(_KIND_OF_STATE[record.observed], record.group, name, now)
+                if record.observed == record.confirmed and not recent:
+                    self._active.discard(name)
+
+            if self._outbox and now - self._outbox_since >= self.group_window:
+                for (kind, group), names in sorted(self._outbox.items(), key=lambda item: (item[0][0], str(item[0][1]))):
+                    alerts.append(Alert(kind, group, sorted(names), self._message(kind, group, names), time.time()))
+                self._outbox = {}
+                self._outbox_since = None
+
+        for alert in alerts:
+            try:
+                self.notify(alert)
+            except Exception as e:
+                print(f"Alert notification error: {e}")
+
+    @staticmethod
+    def _message(kind: str, group: Optional[str], names) -> str:
+        where = f" at {group}" if group else ""
+        subject = names[0] if len(names) == 1 else f"{len(names)} switches"
+        if kind == 'flapping':
+            return f"{subject}{where} flapping; alerts suppressed until stable"
+        return f"{subject}{where} {_KIND_TEXT[kind]}"
+
+    def counts(self) -> Dict[Optional[bool], int]:
+        """Get the number of switches per confirmed state (True/False/None)."""
+        with self._lock:
+            return dict(self._counts)
+
+    def health(self) -> str:
+        """
+        Get the aggregate health of all tracked switches.
+
+        Returns:
+            HEALTH_UNKNOWN (nothing tracked), HEALTH_OK, HEALTH_DEGRADED (some
+            unreachable or unreported) or HEALTH_CRITICAL (at least critical_ratio unreachable)
+        """
+        with self._lock:
+            total = sum(self._counts.values())
+            down = self._counts[False]
+            unknown = self._counts[None]
+        if not total:
+            return HEALTH_UNKNOWN
+        if down >= max(1.0, total * self.critical_ratio):
+            return HEALTH_CRITICAL
+        if down or unknown:
+            return HEALTH_DEGRADED
+        return HEALTH_OK
+
+
+class HealthIconCache:
+    """Tray icon images with a health badge, composited once per level."""
+
+    def __init__(self, base_image, size: int = 64):
+        """
+        Initialize the cache.
+
+        Args:
+            base_image: PIL image of the application icon
+            size: Edge length of the tray icon in pixels
+        """
+        self.base = base_image.convert('RGBA').resize((size, size))
+        self.size = size
+        self._images = {}
+
+    def image(self, health: str):
+        """
+        Get the icon for a health level.
+
+        Args:
+            health: One of the HEALTH_* levels
+
+        Returns:
+            PIL image (the same object for every call with the same level)
+        """
+        image = self._images.get(health)
+        if image is None:
+            image = self.base.copy()
+            # Colored dot with a white ring in the bottom right corner
+            draw = ImageDraw.Draw(image)
+            start = self.size - 2 * (self.size // 5) - 2
+            draw.ellipse((start - 2, start - 2, self.size - 1, self.size - 1), fill='white')
+            draw.ellipse((start, start, self.size - 3, self.size - 3), fill=HEALTH_COLORS.get(health, '#999999'))
+            self._images[health] = image
+        return image
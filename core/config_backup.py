@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+"""
+Configuration backup - fetches switch configurations in parallel into a
+compressed, content-addressed snapshot store.
+
+Snapshots are stored once per distinct content (keyed by SHA-256), so backing
+up an unchanged configuration adds no bytes. A small index maps every switch
+to its latest snapshot and history without reading the snapshots themselves.
+
+Which URL is backed up for a switch comes from its SwitchStorage entry:
+'config_url' (absolute) or 'config_path' (relative to the switch URL), falling
+back to the engine's default path.
+"""
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+import zlib
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urljoin
+
+import requests
+
+from http_session import create_session
+from switch_storage import SwitchStorage, get_config_dir, write_atomic
+
+
+# Outcome of one switch backup.
+#   status: 'changed' (first snapshot or differs from the previous one),
+#   'unchanged', 'skipped' or 'failed'
+BackupResult = namedtuple('BackupResult', ['name', 'status', 'digest', 'size', 'error', 'seconds'])
+
+# Snapshots kept in each switch's index history
+MAX_HISTORY = 500
+
+
+class BackupStore:
+    """Compressed, content-addressed snapshot store with a per-switch index."""
+
+    def __init__(self, root: Optional[str] = None):
+        """
+        Initialize the store.
+
+        Args:
+            root: Store directory. If None, uses 'backups' in the config directory.
+        """
+        if root is None:
+            root = os.path.join(get_config_dir(), 'backups')
+        self.root = root
+        self.objects_dir = os.path.join(root, 'objects')
+        self.index_file = os.path.join(root, 'index.json')
+        os.makedirs(self.objects_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._index = self._load_index()
+        self._dirty = False
+
+    def _load_index(self) -> Dict[str, Dict]:
+        """Read the snapshot index."""
+        if not os.path.exists(self.index_file):
+            return {}
+        try:
+            with open(self.index_file, 'r') as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except Exception as e:
+            print(f"Error loading backup index: {e}")
+            return {}
+
+    def _object_path(self, digest: str) -> str:
+        """Get the file path of a snapshot object."""
+        return os.path.join(self.objects_dir, digest[:2], digest[2:] + '.z')
+
+    def put(self, name: str, data: bytes, taken_at: Optional[float] = None,
+            flush: bool = True) -> Tuple[str, str]:
+        """
+        Store a configuration snapshot for a switch.
+
+        Args:
+            name: Switch name
+            data: Raw configuration
+            taken_at: Snapshot time (defaults to now)
+            flush: Write the index now; pass False when storing many snapshots
+                and call flush() afterwards
+
+        Returns:
+            Tuple of (digest, status) where status is 'changed' or 'unchanged'
+        """
+        taken_at = time.time() if taken_at is None else taken_at
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._object_path(digest)
+
+        # Identical content is stored only once, whichever switch it came from
+        if not os.path.exists(path):
+            write_atomic(path, zlib.compress(data, 9), sync=False)
+
+        with self._lock:
+            entry = self._index.setdefault(name, {'latest': None, 'history': []})
+            latest = entry['latest']
+            if latest and latest['digest'] == digest:
+                # Same content as last time: only remember that we checked
+                latest['checked_at'] = taken_at
+                status = 'unchanged'
+            else:
+                snapshot = {'digest': digest, 'size': len(data), 'taken_at': taken_at,
+                            'checked_at': taken_at}
+                entry['latest'] = snapshot
+                entry['history'].append({'digest': digest, 'taken_at': taken_at})
+                del entry['history'][:-MAX_HISTORY]
+                status = 'changed'
+            self._dirty = True
+        if flush:
+            self.flush()
+        return digest, status
+
+    def flush(self):
+        """Write the index if it has unsaved changes."""
+        with self._lock:
+            if self._dirty:
+                write_atomic(self.index_file, json.dumps(self._index), sync=False)
+                self._dirty = False
+
+    def read(self, digest: str) -> bytes:
+        """
+        Read a snapshot's content.
+
+        Args:
+            digest: Snapshot digest
+
+        Returns:
+            Raw configuration bytes
+        """
+        with open(self._object_path(digest), 'rb') as f:
+            return zlib.decompress(f.read())
+
+    def latest(self, name: str) -> Optional[Dict]:
+        """
+        Get the latest snapshot of a switch from the index.
+
+        Args:
+            name: Switch name
+
+        Returns:
+            Dict with 'digest', 'size', 'taken_at' and 'checked_at', or None
+        """
+        with self._lock:
+            entry = self._index.get(name)
+            return dict(entry['latest']) if entry and entry['latest'] else None
+
+    def latest_all(self) -> Dict[str, Dict]:
+        """
+        Get the latest snapshot of every switch from the index.
+
+        Returns:
+            Dictionary mapping switch names to their latest snapshot
+        """
+        with self._lock:
+            return {name: dict(entry['latest']) for name, entry in self._index.items()
+                    if entry.get('latest')}
+
+    def history(self, name: str) -> List[Dict]:
+        """
+        Get the snapshot history of a switch, oldest first.
+
+        Args:
+            name: Switch name
+
+        Returns:
+            List of dicts with 'digest' and 'taken_at'
+        """
+        with self._lock:
+            entry = self._index.get(name)
+            return [dict(item) for item in entry['history']] if entry else []
+
+
+class BackupEngine:
+    """Fetches configuration exports from many switches in parallel."""
+
+    def __init__(self, storage: SwitchStorage, store: BackupStore, vault=None,
+                 change_index=None, default_path: str = 'config.cfg', max_workers: int = 8,
+                 max_attempts: int = 4, timeout: float = 15.0):
+        """
+        Initialize the engine.
+
+        Args:
+            storage: Switch inventory
+            store: Snapshot store
+            vault: Optional CredentialVault; stored logins are sent as HTTP basic auth
+            change_index: Optional ChangeIndex; when set, a backup only counts as
+                changed if its normalized configuration differs
+            default_path: Export path used when a switch has no config_url/config_path
+            max_workers: Switches backed up at the same time
+            max_attempts: Attempts per switch before giving up
+            timeout: Request timeout in seconds
+        """
+        self.storage = storage
+        self.store = store
+        self.vault = vault
+        self.change_index = change_index
+        self.default_path = default_path
+        self.max_workers = max(1, int(max_workers))
+        self.max_attempts = max(1, int(max_attempts))
+        self.timeout = timeout
+        # Same settings as SwitchManager; retries and rate limits are handled here
+        self.session = create_session(retries=0, pool_maxsize=self.max_workers)
+
+    def config_url(self, switch: Dict) -> Optional[str]:
+        """
+        Get the configuration export URL of a switch.
+
+        Args:
+            switch: SwitchStorage entry
+
+        Returns:
+            URL to fetch, or None if the switch has no URL
+        """
+        if switch.get('config_url'):
+            return switch['config_url']
+        base = switch.get('url')
+        if not base:
+            return None
+        return urljoin(base if base.endswith('/') else base + '/',
+                       switch.get('config_path') or self.default_path)
+
+    def run(self, names: Optional[Iterable[str]] = None,
+            on_result: Optional[Callable[[BackupResult], None]] = None) -> List[BackupResult]:
+        """
+        Back up switches in parallel.
+
+        Args:
+            names: Switches to back up (defaults to the whole inventory)
+            on_result: Called with each BackupResult as it completes
+
+        Returns:
+            List of BackupResults
+        """
+        switches = self.storage.load_switches()
+        if names is not None:
+            switches = {name: switches[name] for name in names if name in switches}
+
+        results = []
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [executor.submit(self.backup_one, name, data) for name, data in switches.items()]
+            for future in as_completed(futures):
+                result = future.result()
+                results.append(result)
+                if on_result:
+                    try:
+                        on_result(result)
+                    except Exception as e:
+                        print(f"Backup callback error: {e}")
+        # One index write for the whole run
+        self.store.flush()
+        if self.change_index is not None:
+            self.change_index.flush()
+        return results
+
+    def backup_one(self, name: str, switch: Dict) -> BackupResult:
+        """
+        Fetch and store the configuration of one switch.
+
+        Args:
+            name: Switch name
+            switch: SwitchStorage entry
+
+        Returns:
+            BackupResult
+        """
+        started = time.monotonic()
+        url = self.config_url(switch)
+        if not url:
+            return BackupResult(name, 'skipped', None, 0, 'No URL configured', 0.0)
+
+        auth = None
+        if self.vault is not None:
+            credentials = self.vault.get_credentials(name)
+            if credentials:
+                auth = (credentials['username'], credentials['password'])
+
+        try:
+            data = self._fetch(url, auth)
+            digest, status = self.store.put(name, data, flush=False)
+            if self.change_index is not None:
+                record = self.change_index.record(name, data, digest, flush=False)
+                status = 'changed' if record.changed else 'unchanged'
+            result = BackupResult(name, status, digest, len(data), None, time.monotonic() - started)
+        except Exception as e:
+            result = BackupResult(name, 'failed', None, 0, str(e), time.monotonic() - started)
+        return result
+
+    def _fetch(self, url: str, auth) -> bytes:
+        """Download a configuration, retrying with backoff and honouring Retry-After."""
+        last_error = None
+        for attempt in range(self.max_attempts):
+            delay = min(30.0, 0.5 * (2 ** attempt)) * random.uniform(0.5, 1.0)
+            try:
+                response = self.session.get(url, auth=auth, timeout=self.timeout)
+                if response.status_code in (429, 503):
+                    delay = max(delay, self._retry_after(response))
+                    last_error = requests.HTTPError(f"{response.status_code} from switch", response=response)
+                elif response.status_code >= 500:
+                    last_error = requests.HTTPError(f"{response.status_code} from switch", response=response)
+                else:
+                    # Client errors (wrong path, bad login) will not fix themselves
+                    response.raise_for_status()
+                    return response.content
+            except (requests.ConnectionError, requests.Timeout) as e:
+                last_error = e
+            if attempt + 1 < self.max_attempts:
+                time.sleep(delay)
+        raise last_error
+
+    @staticmethod
+    def _retry_after(response) -> float:
+        """Get the server-requested delay from a Retry-After header."""
+        value = response.headers.get('Retry-After')
+        if not value:
+            return 0.0
+        try:
+            return min(120.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, min(120.0, parsedate_to_datetime(value).timestamp() - time.time()))
+        except (TypeError, ValueError):
+            return 0.0
+
+
+def main(argv=None):
+    """Back up switch configurations from the command line."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Back up switch configurations")
+    parser.add_argument("names", nargs="*", help="switches to back up (default: all)")
+    parser.add_argument("--storage", default=None, help="switches.json to back up (default: the saved switches)")
+    parser.add_argument("--workers", type=int, default=8, help="parallel downloads")
+    parser.add_argument("--path", default="config.cfg",
+                        help="export path for switches without config_url/config_path")
+    args = parser.parse_args(argv)
+
+    try:
+        from credential_vault import CredentialVault
+        vault = CredentialVault()
+    except Exception:
+        vault = None
+
+    from config_diff import ChangeIndex
+
+    store = BackupStore()
+    engine = BackupEngine(SwitchStorage(args.storage), store, vault=vault, change_index=ChangeIndex(store),
+                          default_path=args.path, max_workers=args.workers)
+
+    def report(result):
+        if result.status == 'failed':
+            print(f"✗ {result.name}: {result.error}")
+        elif result.status == 'skipped':
+            print(f"- {result.name}: {result.error}")
+        else:
+            print(f"✓ {result.name}: {result.status} ({result.size} bytes, {result.seconds:.1f}s)")
+
+    results = engine.run(args.names or None, on_result=report)
+    failed = sum(1 for r in results if r.status == 'failed')
+    print(f"Backed up {len(results) - failed}/{len(results)} switch(es)")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
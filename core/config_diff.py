@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""
+Configuration change detection - per-section fingerprints and a change index.
+
+Backed-up configurations are normalized (volatile lines such as timestamps are
+dropped) and split into sections: a non-indented line starts a section and
+the indented lines below it belong to it. Each section is hashed, and the
+hash of all section hashes fingerprints the whole configuration, so an
+unchanged backup is recognized with one comparison. Line diffs are computed
+only for the sections whose hash changed.
+
+The change index remembers, per switch, the current section hashes and a
+list of change events, so questions like "which switches changed this week"
+are answered from the index without diffing any snapshots.
+"""
+import difflib
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from typing import Dict, List, Optional
+
+from switch_storage import write_atomic
+
+
+# Lines that change without a configuration change
+VOLATILE_PATTERNS = [
+    re.compile(r'^\s*[!#]+\s*(last configuration change|nvram config last updated|generated)', re.IGNORECASE),
+    re.compile(r'^\s*[!#]*\s*(current configuration\s*:|uptime|system up ?time|ntp clock-period)', re.IGNORECASE),
+    re.compile(r'^\s*[!#]*\s*(time|date|timestamp)\s*[:=]', re.IGNORECASE),
+]
+
+# Events kept per switch
+MAX_EVENTS = 200
+
+# Result of recording one snapshot.
+#   changed: False if the normalized configuration is identical
+#   sections: {'changed': [...], 'added': [...], 'removed': [...]} section names
+#   diffs: {section name: unified diff text} for changed/added/removed sections
+ChangeRecord = namedtuple('ChangeRecord', ['name', 'changed', 'fingerprint', 'sections', 'diffs'])
+
+
+def normalize(data) -> List[str]:
+    """
+    Normalize a configuration for comparison.
+
+    Args:
+        data: Configuration as bytes or str
+
+    Returns:
+        List of significant lines
+    """
+    if isinstance(data, bytes):
+        data = data.decode('utf-8', errors='replace')
+    lines = []
+    for line in data.splitlines():
+        line = line.rstrip()
+        if not line.strip():
+            continue
+        if any(pattern.search(line) for pattern in VOLATILE_PATTERNS):
+            continue
+        lines.append(line)
+    return lines
+
+
+def split_sections(lines: List[str]) -> 'OrderedDict[str, List[str]]':
+    """
+    Split normalized lines into sections.
+
+    Args:
+        lines: Normalized configuration lines
+
+    Returns:
+        Ordered mapping of section name (its first line) to its lines
+    """
+    sections = OrderedDict()
+    current = None
+    for line in lines:
+        stripped = line.strip()
+        if stripped in ('!', '#', 'exit', 'end'):
+            # Separator lines close the current section
+            current = None
+            continue
+        if current is None or not line[:1].isspace():
+            name = stripped
+            # Repeated top-level lines (e.g. several 'vlan database') stay distinct
+            count = 2
+            while name in sections:
+                name = f"{stripped} #{count}"
+                count += 1
+            current = sections[name] = []
+        current.append(line)
+    return sections
+
+
+def section_hashes(sections) -> Dict[str, str]:
+    """Hash every section."""
+    return {name: hashlib.sha1('\n'.join(body).encode('utf-8')).hexdigest()
+            for name, body in sections.items()}
+
+
+def fingerprint(hashes: Dict[str, str]) -> str:
+    """Hash a configuration's section hashes into one fingerprint."""
+    digest = hashlib.sha256()
+    for name in sorted(hashes):
+        digest.update(name.encode('utf-8'))
+        digest.update(hashes[name].encode('ascii'))
+    return digest.hexdigest()
+
+
+class ChangeIndex:
+    """Per-switch section fingerprints and change history."""
+
+    def __init__(self, store, index_file: Optional[str] = None):
+        """
+        Initialize the index.
+
+        Args:
+            store: BackupStore holding the snapshots (used to diff against
+                the previous snapshot when something changed)
+            index_file: Path to the index. If None, uses 'changes.json' in the backup store.
+        """
+        self.store = store
+        self.index_file = index_file or os.path.join(store.root, 'changes.json')
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._index = self._load()
+
+    def _load(self) -> Dict[str, Dict]:
+        """Read the change index."""
+        if not os.path.exists(self.index_file):
+            return {}
+        try:
+            with open(self.index_file, 'r') as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except Exception as e:
+            print(f"Error loading change index: {e}")
+            return {}
+
+    def flush(self):
+        """Write the index if it has unsaved changes."""
+        with self._lock:
+            if not self._dirty:
+                return
+            write_atomic(self.index_file, json.dumps(self._index), sync=False)
+            self._dirty = False
+
+    def record(self, name: str, data: bytes, digest: str, taken_at: Optional[float] = None,
+               flush: bool = True) -> ChangeRecord:
+        """
+        Record a new snapshot of a switch and detect what changed.
+
+        Args:
+            name: Switch name
+            data: Raw configuration
+            digest: Snapshot digest in the backup store
+            taken_at: Snapshot time (defaults to now)
+            flush: Write the index now
+
+        Returns:
+            ChangeRecord
+        """
+        taken_at = time.time() if taken_at is None else taken_at
+        sections = split_sections(normalize(data))
+        hashes = section_hashes(sections)
+        overall = fingerprint(hashes)
+
+        with self._lock:
+            entry = self._index.get(name)
+            if entry is not None and entry['fingerprint'] == overall:
+                # Unchanged: one comparison, no diffing
+                entry['digest'] = digest
+                entry['checked_at'] = taken_at
+                self._dirty = True
+                return ChangeRecord(name, False, overall, {'changed': [], 'added': [], 'removed': []}, {})
+            previous = entry
+
+        old_hashes = previous['sections'] if previous else {}
+        changed = [s for s in hashes if s in old_hashes and old_hashes[s] != hashes[s]]
+        added = [s for s in hashes if s not in old_hashes]
+        removed = [s for s in old_hashes if s not in hashes]
+
+        diffs = {}
+        if previous is not None:
+            old_sections = self._previous_sections(previous['digest'])
+            for section in changed + added + removed:
+                diffs[section] = '\n'.join(difflib.unified_diff(
+                    old_sections.get(section, []), sections.get(section, []),
+                    fromfile=f"{name} (before)", tofile=f"{name} (after)", lineterm=''
+                ))
+
+        summary = {'changed': changed, 'added': added, 'removed': removed}
+        event = {'taken_at': taken_at, 'digest': digest,
+                 'from_digest': previous['digest'] if previous else None}
+        event.update(summary)
+
+        with self._lock:
+            events = previous['events'] if previous else []
+            events.append(event)
+            del events[:-MAX_EVENTS]
+            self._index[name] = {
+                'fingerprint': overall,
+                'sections': hashes,
+                'digest': digest,
+                'checked_at': taken_at,
+                # The first snapshot is a baseline, not a change
+                'changed_at': taken_at if previous is not None else None,
+                'events': events,
+            }
+            self._dirty = True
+        if flush:
+            self.flush()
+        return ChangeRecord(name, True, overall, summary, diffs)
+
+    def _previous_sections(self, digest: str):
+        """Load and split the previous snapshot; empty if it is gone."""
+        try:
+            return split_sections(normalize(self.store.read(digest)))
+        except OSError:
+            return OrderedDict()
+
+    def changed_since(self, since: float) -> Dict[str, float]:
+        """
+        Get the switches whose configuration changed after a point in time.
+
+        Args:
+            since: Unix timestamp
+
+        Returns:
+            Dictionary mapping switch names to their last change time
+        """
+        with self._lock:
+            return {name: entry['changed_at'] for name, entry in self._index.items()
+                    if (entry.get('changed_at') or 0) >= since}
+
+    def events(self, name: str) -> List[Dict]:
+        """
+        Get the change events of a switch, oldest first.
+
+        Args:
+            name: Switch name
+
+        Returns:
+            List of event dicts
+        """
+        with self._lock:
+            entry = self._index.get(name)
+            return [dict(event) for event in entry['events']] if entry else []
+
+    def diff(self, from_digest: str, to_digest: str) -> Dict[str, str]:
+        """
+        Diff two snapshots section by section.
+
+        Args:
+            from_digest: Older snapshot
+            to_digest: Newer snapshot
+
+        Returns:
+            Dictionary mapping section names to unified diffs (changed sections only)
+        """
+        old_sections = split_sections(normalize(self.store.read(from_digest)))
+        new_sections = split_sections(normalize(self.store.read(to_digest)))
+        old_hashes = section_hashes(old_sections)
+        new_hashes = section_hashes(new_sections)
+        diffs = {}
+        for section in list(new_hashes) + [s for s in old_hashes if s not in new_hashes]:
+            if old_hashes.get(section) != new_hashes.get(section):
+                diffs[section] = '\n'.join(difflib.unified_diff(
+                    old_sections.get(section, []), new_sections.get(section, []),
+                    fromfile='before', tofile='after', lineterm=''
+                ))
+        return diffs
+
+
+def main(argv=None):
+    """Report configuration changes from the command line."""
+    import argparse
+    from config_backup import BackupStore
+
+    parser = argparse.ArgumentParser(description="Show switch configuration changes")
+    parser.add_argument("--days", type=float, default=7.0,
+                        help="list switches changed in the last N days (default: 7)")
+    parser.add_argument("--show", metavar="NAME", help="print the latest change of a switch")
+    args = parser.parse_args(argv)
+
+    index = ChangeIndex(BackupStore())
+    if args.show:
+        events = [e for e in index.events(args.show) if e.get('from_digest')]
+        if not events:
+            print(f"No recorded changes for {args.show}")
+            return 1
+        for section, diff in index.diff(events[-1]['from_digest'], events[-1]['digest']).items():
+            print(diff)
+        return 0
+
+    changed = index.changed_since(time.time() - args.days * 86400)
+    for name, changed_at in sorted(changed.items(), key=lambda item: item[1], reverse=True):
+        print(f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(changed_at))}  {name}")
+    print(f"{len(changed)} switch(es) changed in the last {args.days:g} day(s)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
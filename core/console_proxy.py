@@ -0,0 +1,406 @@
+#!/usr/bin/env python3
+"""
+Console proxy - optional local caching reverse proxy for switch web consoles.
+
+Every switch origin gets its own listener on 127.0.0.1 so the console's
+absolute paths keep working. Static assets are cached and revalidated with
+ETag/Last-Modified, concurrent identical requests share one upstream fetch,
+and upstream connections are pooled and capped to protect the device.
+"""
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+from urllib.parse import urlparse, urlunparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from tls_sessions import TLSAdapter
+
+
+# Paths that are treated as static assets and cached
+_STATIC_RE = re.compile(
+    r'\.(?:js|css|png|jpe?g|gif|svg|ico|woff2?|ttf|eot|map|bmp|webp)$', re.IGNORECASE
+)
+
+# Headers that apply to a single connection and must not be forwarded
+_HOP_BY_HOP = {
+    'connection', 'keep-alive', 'proxy-authenticate', 'proxy-authorization',
+    'te', 'trailers', 'transfer-encoding', 'upgrade', 'proxy-connection',
+}
+
+# Range of local ports picked (deterministically per origin) so a switch's
+# proxied console keeps the same origin, and thus its cookies, across runs
+_PORT_BASE = 20000
+_PORT_SPAN = 10000
+
+
+def _max_age(headers) -> Optional[int]:
+    """Get the freshness lifetime from Cache-Control, 0 for no-cache, None if unset."""
+    cache_control = headers.get('Cache-Control', '').lower()
+    if 'no-cache' in cache_control or 'must-revalidate' in cache_control:
+        return 0
+    match = re.search(r'max-age=(\d+)', cache_control)
+    if match:
+        return int(match.group(1))
+    return None
+
+
+class _CacheEntry:
+    """A stored upstream response."""
+
+    __slots__ = ('status', 'headers', 'body', 'etag', 'last_modified', 'ttl', 'fresh_until')
+
+    def __init__(self, status, headers, body, ttl):
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.etag = dict(headers).get('ETag')
+        self.last_modified = dict(headers).get('Last-Modified')
+        self.ttl = ttl
+        self.fresh_until = time.monotonic() + ttl
+
+
+class _Flight:
+    """An upstream fetch that concurrent identical requests wait on."""
+
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class _OriginProxy:
+    """Reverse proxy for a single upstream switch origin."""
+
+    def __init__(self, origin: str, session: requests.Session, cache_bytes: int,
+                 default_ttl: float, timeout: float):
+        self.origin = origin
+        self.session = session
+        self.cache_bytes = cache_bytes
+        self.default_ttl = default_ttl
+        self.timeout = timeout
+        self.local_origin = None
+        self.server = None
+
+        self._cache = OrderedDict()
+        self._cache_size = 0
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'revalidated': 0, 'misses': 0, 'coalesced': 0, 'passthrough': 0}
+
+    def start(self, host: str = '127.0.0.1'):
+        """Bind a listener (preferring a stable port for this origin) and serve it."""
+        handler = type('ProxyHandler', (_ProxyHandler,), {'proxy': self})
+        digest = int(hashlib.sha1(self.origin.encode('utf-8')).hexdigest(), 16)
+        preferred = _PORT_BASE + digest % _PORT_SPAN
+        try:
+            self.server = ThreadingHTTPServer((host, preferred), handler)
+        except OSError:
+            self.server = ThreadingHTTPServer((host, 0), handler)
+        self.server.daemon_threads = True
+        self.local_origin = f"http://{host}:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        """Stop the listener."""
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def handle(self, handler):
+        """Serve one client request."""
+        method = handler.command
+        upstream_url = self.origin + handler.path
+        headers = self._forward_headers(handler.headers)
+
+        body = None
+        length = int(handler.headers.get('Content-Length') or 0)
+        if length:
+            body = handler.rfile.read(length)
+
+        path = urlparse(handler.path).path
+        try:
+            if method in ('GET', 'HEAD') and _STATIC_RE.search(path):
+                key = (handler.path, handler.headers.get('Accept-Encoding', ''))
+                entry = self._fetch_static(key, upstream_url, headers)
+                client_etag = handler.headers.get('If-None-Match')
+                if client_etag and entry.etag and client_etag == entry.etag:
+                    self._send(handler, 304, entry.headers, b'', head_only=True)
+                else:
+                    self._send(handler, entry.status, entry.headers, entry.body,
+                               head_only=(method == 'HEAD'))
+            else:
+                self._passthrough(handler, method, upstream_url, headers, body)
+        except Exception as e:
+            self._send_error(handler, e)
+
+    def _forward_headers(self, incoming) -> Dict[str, str]:
+        """Copy client headers for the upstream request."""
+        headers = {}
+        for name, value in incoming.items():
+            lowered = name.lower()
+            if lowered in _HOP_BY_HOP or lowered in ('host', 'content-length'):
+                continue
+            if lowered in ('origin', 'referer'):
+                value = value.replace(self.local_origin, self.origin.rstrip('/'), 1)
+            headers[name] = value
+        return headers
+
+    def _fetch_static(self, key, upstream_url, headers) -> _CacheEntry:
+        """Return a cached asset, fetching or revalidating it at most once at a time."""
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None and entry.fresh_until > time.monotonic():
+                self._cache.move_to_end(key)
+                self.stats['hits'] += 1
+                return entry
+
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = _Flight()
+                self._inflight[key] = flight
+            else:
+                self.stats['coalesced'] += 1
+
+        if not leader:
+            flight.done.wait(self.timeout * 2)
+            if flight.error is not None:
+                raise flight.error
+            if flight.result is None:
+                raise TimeoutError("Upstream fetch did not complete")
+            return flight.result
+
+        try:
+            flight.result = self._revalidate_or_fetch(key, entry, upstream_url, headers)
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.done.set()
+
+    def _revalidate_or_fetch(self, key, entry, upstream_url, headers) -> _CacheEntry:
+        """Fetch an asset upstream, conditionally if a stale copy exists."""
+        request_headers = {k: v for k, v in headers.items()
+                           if k.lower() not in ('if-none-match', 'if-modified-since')}
+        if entry is not None:
+            if entry.etag:
+                request_headers['If-None-Match'] = entry.etag
+            if entry.last_modified:
+                request_headers['If-Modified-Since'] = entry.last_modified
+
+        response = self.session.get(upstream_url, headers=request_headers, stream=True,
+                                    allow_redirects=False, timeout=self.timeout)
+        try:
+            if response.status_code == 304 and entry is not None:
+                # A 304 without Cache-Control keeps the stored freshness policy
+                ttl = _max_age(response.headers)
+                with self._lock:
+                    if ttl is not None:
+                        entry.ttl = ttl
+                    entry.fresh_until = time.monotonic() + entry.ttl
+                    if key in self._cache:
+                        self._cache.move_to_end(key)
+                    self.stats['revalidated'] += 1
+                return entry
+
+            body = response.raw.read(decode_content=False)
+            response_headers = self._response_headers(response)
+        finally:
+            response.close()
+
+        ttl = _max_age(response.headers)
+        new_entry = _CacheEntry(
+            response.status_code, response_headers, body,
+            self.default_ttl if ttl is None else ttl
+        )
+        with self._lock:
+            self.stats['misses'] += 1
+            cacheable = (
+                response.status_code == 200
+                and 'no-store' not in response.headers.get('Cache-Control', '').lower()
+                and len(body) <= self.cache_bytes // 4
+            )
+            if cacheable:
+                self._store(key, new_entry)
+        return new_entry
+
+    def _store(self, key, entry):
+        """Insert an entry, evicting the least recently used ones over budget."""
+        old = self._cache.pop(key, None)
+        if old is not None:
+            self._cache_size -= len(old.body)
+        self._cache[key] = entry
+        self._cache_size += len(entry.body)
+        while self._cache_size > self.cache_bytes and self._cache:
+            _key, evicted = self._cache.popitem(last=False)
+            self._cache_size -= len(evicted.body)
+
+    def _passthrough(self, handler, method, upstream_url, headers, body):
+        """Forward a non-cacheable request and stream the response back."""
+        with self._lock:
+            self.stats['passthrough'] += 1
+        response = self.session.request(method, upstream_url, headers=headers, data=body,
+                                        stream=True, allow_redirects=False, timeout=self.timeout)
+        try:
+            response_headers = self._response_headers(response)
+            known_length = any(k.lower() == 'content-length' for k, _v in response_headers)
+            handler.send_response(response.status_code)
+            for name, value in response_headers:
+                handler.send_header(name, value)
+            if not known_length:
+                handler.send_header('Connection', 'close')
+                handler.close_connection = True
+            handler.end_headers()
+            if method != 'HEAD':
+                for chunk in response.raw.stream(64 * 1024, decode_content=False):
+                    handler.wfile.write(chunk)
+        finally:
+            response.close()
+
+    def _response_headers(self, response):
+        """Copy upstream response headers, rewriting them for the local origin."""
+        upstream = self.origin.rstrip('/')
+        headers = []
+        for name, value in response.raw.headers.items():
+            lowered = name.lower()
+            if lowered in _HOP_BY_HOP:
+                continue
+            if lowered == 'location' and value.startswith(upstream):
+                value = self.local_origin + value[len(upstream):]
+            elif lowered == 'set-cookie':
+                # The browser sees 127.0.0.1 over plain HTTP
+                value = re.sub(r';\s*domain=[^;]*', '', value, flags=re.IGNORECASE)
+                value = re.sub(r';\s*secure(?=;|$)', '', value, flags=re.IGNORECASE)
+            headers.append((name, value))
+        return headers
+
+    def _send(self, handler, status, headers, body, head_only=False):
+        """Write a complete response to the client."""
+        handler.send_response(status)
+        for name, value in headers:
+            if name.lower() != 'content-length':
+                handler.send_header(name, value)
+        handler.send_header('Content-Length', str(len(body)))
+        handler.end_headers()
+        if not head_only and body:
+            handler.wfile.write(body)
+
+    def _send_error(self, handler, error):
+        """Report an upstream failure to the client."""
+        try:
+            message = f"Switch unreachable through proxy: {error}".encode('utf-8')
+            handler.send_response(502)
+            handler.send_header('Content-Type', 'text/plain; charset=utf-8')
+            handler.send_header('Content-Length', str(len(message)))
+            handler.end_headers()
+            handler.wfile.write(message)
+        except Exception:
+            pass
+
+
+class _ProxyHandler(BaseHTTPRequestHandler):
+    """Request handler bound to an _OriginProxy via a subclass attribute."""
+
+    protocol_version = 'HTTP/1.1'
+    proxy = None
+
+    def do_GET(self):
+        self.proxy.handle(self)
+
+    do_HEAD = do_POST = do_PUT = do_DELETE = do_PATCH = do_OPTIONS = do_GET
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ConsoleProxy:
+    """Local caching reverse proxy shared by all switch consoles."""
+
+    def __init__(self, cache_bytes: int = 64 * 1024 * 1024, max_upstream_connections: int = 4,
+                 default_ttl: float = 60.0, timeout: float = 10.0, verify=True, tls=None):
+        """
+        Initialize the proxy.
+
+        Args:
+            cache_bytes: Memory budget for cached assets, per switch
+            max_upstream_connections: Connections opened to each switch at most
+            default_ttl: Seconds a cached asset is served without revalidation
+                when the switch sends no max-age
+            timeout: Upstream request timeout in seconds
+            verify: TLS verification setting passed to requests
+            tls: Optional TLSSessionCache for resumed handshakes and pinned certificates
+                (not used when verify is False)
+        """
+        self.cache_bytes = cache_bytes
+        self.max_upstream_connections = max_upstream_connections
+        self.default_ttl = default_ttl
+        self.timeout = timeout
+        self.verify = verify
+        self.tls = tls
+        self._origins = {}
+        self._lock = threading.Lock()
+
+    def _new_session(self) -> requests.Session:
+        """Create a pooled session; pool_block caps concurrent upstream connections."""
+        session = requests.Session()
+        session.verify = self.verify
+        options = {'pool_connections': 1, 'pool_maxsize': self.max_upstream_connections, 'pool_block': True}
+        adapter = HTTPAdapter(**options)
+        session.mount("http://", adapter)
+        if self.tls is not None and self.verify is not False:
+            session.mount("https://", TLSAdapter(self.tls, **options))
+        else:
+            session.mount("https://", adapter)
+        return session
+
+    def proxy_url(self, url: str) -> str:
+        """
+        Get the local proxied URL for a switch console URL.
+
+        Args:
+            url: Switch console URL
+
+        Returns:
+            Equivalent URL served through the local proxy
+        """
+        parsed = urlparse(url)
+        origin = f"{parsed.scheme}://{parsed.netloc}"
+        with self._lock:
+            proxy = self._origins.get(origin)
+            if proxy is None:
+                proxy = _OriginProxy(origin, self._new_session(), self.cache_bytes,
+                                     self.default_ttl, self.timeout)
+                proxy.start()
+                self._origins[origin] = proxy
+        local = urlparse(proxy.local_origin)
+        return urlunparse(parsed._replace(scheme=local.scheme, netloc=local.netloc))
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """
+        Get cache statistics.
+
+        Returns:
+            Dictionary mapping upstream origins to their counters
+        """
+        with self._lock:
+            return {origin: dict(proxy.stats) for origin, proxy in self._origins.items()}
+
+    def shutdown(self):
+        """Stop all listeners."""
+        with self._lock:
+            origins = list(self._origins.values())
+            self._origins = {}
+        for proxy in origins:
+            proxy.stop()
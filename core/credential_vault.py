@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Credential vault - encrypted local store for switch logins and session cookies.
+
+Entries are keyed by the switch name used in SwitchStorage. The whole vault is
+encrypted with a Fernet key kept in a private key file next to it.
+"""
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+from switch_storage import get_config_dir, write_atomic
+
+# Try to import cryptography for encryption support
+try:
+    from cryptography.fernet import Fernet, InvalidToken
+    HAS_CRYPTOGRAPHY = True
+except ImportError:
+    HAS_CRYPTOGRAPHY = False
+
+
+# How long a captured console session is trusted when its cookies carry no expiry
+DEFAULT_SESSION_TTL = 15 * 60
+
+
+class VaultUnreadableError(Exception):
+    """The vault exists but cannot be decrypted with the current key."""
+
+
+class CredentialVault:
+    """Encrypted storage of per-switch credentials and cached session cookies."""
+
+    def __init__(self, vault_file: Optional[str] = None, key_file: Optional[str] = None):
+        """
+        Initialize the vault.
+
+        Args:
+            vault_file: Path to the encrypted vault. If None, uses the config directory.
+            key_file: Path to the encryption key. If None, uses the config directory.
+        """
+        config_dir = None
+        if vault_file is None or key_file is None:
+            config_dir = get_config_dir()
+        self.vault_file = vault_file or os.path.join(config_dir, 'credentials.vault')
+        self.key_file = key_file or os.path.join(config_dir, 'vault.key')
+        self._fernet = None
+        self._lock = threading.Lock()
+
+    @property
+    def available(self) -> bool:
+        """True if encryption support is installed."""
+        return HAS_CRYPTOGRAPHY
+
+    def _get_fernet(self):
+        """Load the vault key, creating it on first use."""
+        if self._fernet is None:
+            if not os.path.exists(self.key_file):
+                # Concurrent first runs: whoever creates the file first decides the key
+                write_atomic(self.key_file, Fernet.generate_key(), exclusive=True)
+            with open(self.key_file, 'rb') as f:
+                key = f.read().strip()
+            self._fernet = Fernet(key)
+        return self._fernet
+
+    def _load(self, for_write: bool = False) -> Dict[str, Dict]:
+        """
+        Decrypt the vault contents.
+
+        A vault that cannot be decrypted (the key file was replaced) is never
+        overwritten: reading raises VaultUnreadableError, and before a write the
+        file is moved aside so it can still be recovered with the old key.
+
+        Args:
+            for_write: The caller is about to save the returned entries
+        """
+        if not os.path.exists(self.vault_file):
+            return {}
+        with open(self.vault_file, 'rb') as f:
+            token = f.read()
+        try:
+            data = json.loads(self._get_fernet().decrypt(token).decode('utf-8'))
+        except InvalidToken:
+            if not for_write:
+                raise VaultUnreadableError(f"{self.vault_file} does not match the key in {self.key_file}")
+            aside = f"{self.vault_file}.unreadable-{time.strftime('%Y%m%d-%H%M%S')}"
+            os.replace(self.vault_file, aside)
+            print(f"Credential vault does not match its key; moved it to {aside} and starting a new one")
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    def _save(self, entries: Dict[str, Dict]):
+        """Encrypt and write the vault contents."""
+        token = self._get_fernet().encrypt(json.dumps(entries).encode('utf-8'))
+        write_atomic(self.vault_file, token)
+
+    def set_credentials(self, name: str, username: str, password: str) -> bool:
+        """
+        Store the login for a switch.
+
+        Args:
+            name: Switch name as saved in SwitchStorage
+            username: Console username
+            password: Console password
+
+        Returns:
+            True if successful, False otherwise
+        """
+        if not HAS_CRYPTOGRAPHY:
+            print("Error saving credentials: cryptography is not installed")
+            return False
+        try:
+            with self._lock:
+                entries = self._load(for_write=True)
+                entry = entries.get(name, {})
+                if entry.get('username') != username or entry.get('password') != password:
+                    # A different login invalidates the cached session
+                    entry.pop('cookies', None)
+                    entry.pop('session_expires', None)
+                entry['username'] = username
+                entry['password'] = password
+                entries[name] = entry
+                self._save(entries)
+            return True
+        except Exception as e:
+            print(f"Error saving credentials: {e}")
+            return False
+
+    def get_credentials(self, name: str) -> Optional[Dict[str, str]]:
+        """
+        Get the login for a switch.
+
+        Args:
+            name: Switch name
+
+        Returns:
+            Dict with 'username' and 'password', or None if not stored
+        """
+        if not HAS_CRYPTOGRAPHY:
+            return None
+        try:
+            with self._lock:
+                entry = self._load().get(name)
+        except Exception as e:
+            print(f"Error loading credentials: {e}")
+            return None
+        if not entry or not entry.get('username'):
+            return None
+        return {'username': entry['username'], 'password': entry.get('password', '')}
+
+    def delete(self, name: str) -> bool:
+        """
+        Remove everything stored for a switch.
+
+        Args:
+            name: Switch name
+
+        Returns:
+            True if an entry was removed, False otherwise
+        """
+        if not HAS_CRYPTOGRAPHY:
+            return False
+        try:
+            with self._lock:
+                entries = self._load(for_write=True)
+                if name not in entries:
+                    return False
+                del entries[name]
+                self._save(entries)
+            return True
+        except Exception as e:
+            print(f"Error deleting credentials: {e}")
+            return False
+
+    def store_session(self, name: str, cookies: List[Dict], ttl: float = DEFAULT_SESSION_TTL) -> bool:
+        """
+        Cache the session cookies of a logged-in console.
+
+        The session is trusted until the earliest cookie expiry, or for ttl
+        seconds if the cookies are session cookies.
+
+        Args:
+            name: Switch name
+            cookies: List of dicts with 'name', 'value' and optional 'path'/'expires'
+            ttl: Fallback session lifetime in seconds
+
+        Returns:
+            True if successful, False otherwise
+        """
+        if not HAS_CRYPTOGRAPHY:
+            return False
+        now = time.time()
+        expires = now + ttl
+        for cookie in cookies:
+            if cookie.get('expires'):
+                expires = min(expires, float(cookie['expires']))
+        try:
+            with self._lock:
+                entries = self._load(for_write=True)
+                entry = entries.setdefault(name, {})
+                entry['cookies'] = cookies
+                entry['session_expires'] = expires
+                self._save(entries)
+            return True
+        except Exception as e:
+            print(f"Error saving session: {e}")
+            return False
+
+    def get_session(self, name: str) -> Optional[List[Dict]]:
+        """
+        Get cached session cookies if they are still valid.
+
+        Args:
+            name: Switch name
+
+        Returns:
+            List of cookie dicts, or None if there is no valid session
+        """
+        if not HAS_CRYPTOGRAPHY:
+            return None
+        try:
+            with self._lock:
+                entry = self._load().get(name) or {}
+        except Exception as e:
+            print(f"Error loading session: {e}")
+            return None
+        if entry.get('cookies') and entry.get('session_expires', 0) > time.time():
+            return entry['cookies']
+        return None
+
+    def clear_session(self, name: str):
+        """
+        Forget the cached session of a switch (e.g. after it was rejected).
+
+        Args:
+            name: Switch name
+        """
+        if not HAS_CRYPTOGRAPHY:
+            return
+        try:
+            with self._lock:
+                entries = self._load(for_write=True)
+                entry = entries.get(name)
+                if entry and entry.pop('cookies', None) is not None:
+                    entry.pop('session_expires', None)
+                    self._save(entries)
+        except Exception as e:
+            print(f"Error clearing session: {e}")
@@ -0,0 +1,536 @@
+#!/usr/bin/env python3
+"""
+Device facts - model, firmware, uptime and MAC address read from switch web pages.
+
+Every switch's pages are read by an extractor plugin for its vendor. The
+vendor is detected once from the switch's home page and remembered. The
+facts are kept in the switch's SwitchStorage entry ('facts'), together with
+each page's ETag/Last-Modified. Collecting again is cheap:
+
+- a page read less than its TTL ago is not requested at all (cache hit),
+- an older page is requested conditionally; an unchanged page is answered
+  304 Not Modified by the switch and its stored facts are reused.
+
+Uptime is stored as the boot time ('booted_at'), so the entry only changes
+when the switch reboots. The stored facts can be searched without any
+request to the devices (see matches() and the GUI's search field).
+
+Extractors for further vendors are registered with register_extractor(),
+e.g. from modules named in YAP_FACTS_PLUGINS (comma-separated, importable).
+"""
+import html
+import importlib
+import os
+import re
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urljoin
+
+from http_session import create_session
+
+# SwitchStorage field holding a switch's facts
+FACTS_FIELD = 'facts'
+
+# Facts shown and searched, in display order
+FACT_KEYS = ('model', 'firmware', 'mac', 'booted_at')
+
+# A boot time within this many seconds of the stored one is the same boot
+BOOT_TOLERANCE = 120
+
+# Outcome of collecting one switch's facts.
+#   status: 'changed' (facts differ from the stored ones), 'unchanged', 'skipped' or 'failed'
+#   requests, not_modified, cache_hits: pages requested, answered 304, and not requested (TTL)
+FactsResult = namedtuple('FactsResult', ['name', 'status', 'requests', 'not_modified', 'cache_hits', 'error'])
+
+
+def parse_mac(value: str) -> Optional[str]:
+    """Find a MAC address (any common notation) and return it as aa:bb:cc:dd:ee:ff."""
+    match = re.search(r'\b([0-9A-Fa-f]{2})[:-]([0-9A-Fa-f]{2})[:-]([0-9A-Fa-f]{2})[:-]'
+                      r'([0-9A-Fa-f]{2})[:-]([0-9A-Fa-f]{2})[:-]([0-9A-Fa-f]{2})\b', value)
+    if match:
+        return ':'.join(match.groups()).lower()
+    match = re.search(r'\b([0-9A-Fa-f]{4})\.([0-9A-Fa-f]{4})\.([0-9A-Fa-f]{4})\b', value)
+    if match:
+        digits = ''.join(match.groups()).lower()
+        return ':'.join(digits[i:i + 2] for i in range(0, 12, 2))
+    return None
+
+
+# Uptime units and their seconds (months and years as 30 and 365 days)
+_UPTIME_UNITS = (
+    (r'y|yrs?|years?', 365 * 86400),
+    (r'mos?|mons?|months?', 30 * 86400),
+    (r'w|wks?|weeks?', 7 * 86400),
+    (r'd|days?', 86400),
+    (r'h|hrs?|hours?', 3600),
+    (r'm|mins?|minutes?', 60),
+    (r's|secs?|seconds?', 1),
+)
+_UPTIME_PART = re.compile(r'(\d+)\s*(' + '|'.join(unit for unit, _seconds in _UPTIME_UNITS) + r')\b')
+
+
+def parse_uptime(value: str) -> Optional[int]:
+    """
+    Parse an uptime as shown by switches.
+
+    Understands plain seconds ("123456", "123456 s"), unit lists ("1 week,
+    3 days, 4 hours, 5 mins", "3d 4h 5m 6s") and clock notation ("3 days,
+    04:05:06").
+
+    Returns:
+        Seconds, or None if nothing was recognized or the text holds words
+        that are not uptime units (rather than an uptime missing that part)
+    """
+    text = value.strip().lower()
+    plain = re.match(r'^(\d+)(?:\.\d+)?\s*(?:s|secs?|seconds?)?$', text)
+    if plain:
+        return int(plain.group(1))
+    total = 0
+    found = False
+    clock = re.search(r'(\d+):(\d{2})(?::(\d{2}))?', text)
+    if clock:
+        total += int(clock.group(1)) * 3600 + int(clock.group(2)) * 60 + int(clock.group(3) or 0)
+        text = text[:clock.start()] + ' ' + text[clock.end():]
+        found = True
+    for amount, unit in _UPTIME_PART.findall(text):
+        total += int(amount) * next(seconds for pattern, seconds in _UPTIME_UNITS if re.fullmatch(pattern, unit))
+        found = True
+    if re.sub(r'\b(?:and|up)\b|[\s,;.]', '', _UPTIME_PART.sub(' ', text)):
+        return None
+    return total if found else None
+
+
+def html_to_lines(text: str) -> List[str]:
+    """Turn an HTML page into text lines, with table cells separated by tabs."""
+    text = re.sub(r'(?is)<(script|style)\b.*?</\1>', ' ', text)
+    text = re.sub(r'(?i)</t[dh]>\s*<t[dh]\b[^>]*>', '\t', text)
+    text = re.sub(r'(?i)<(br|/?tr|/?p|/?li|/?div|/?h\d|/?table|/?dt|/?dd)\b[^>]*>', '\n', text)
+    text = html.unescape(re.sub(r'<[^>]+>', ' ', text))
+    lines = []
+    for line in text.split('\n'):
+        line = '\t'.join(re.sub(r'[ \r\xa0]+', ' ', cell).strip() for cell in line.split('\t'))
+        if line.strip('\t '):
+            lines.append(line.strip('\t'))
+    return lines
+
+
+# Labels switches use for each fact (lowercase, without the colon)
+_LABELS = {
+    'model': ('model', 'model name', 'product name', 'device model', 'hardware version', 'system description'),
+    'firmware': ('firmware version', 'firmware', 'software version', 'sw version', 'os version', 'firmware release'),
+    'mac': ('mac address', 'base mac address', 'system mac address', 'system mac', 'mac'),
+    'uptime': ('system up time', 'system uptime', 'uptime', 'up time'),
+}
+
+
+def extract_labeled(text: str) -> Dict[str, str]:
+    """
+    Read facts from "Label: value" lines or two-column tables.
+
+    Args:
+        text: HTML or plain text page
+
+    Returns:
+        Raw facts found ('model', 'firmware', 'mac', 'uptime')
+    """
+    facts = {}
+    for line in html_to_lines(text):
+        label, separator, value = re.split(r'(:|\t)', line, maxsplit=1) if re.search(r'[:\t]', line) \
+            else (line, '', '')
+        label = label.strip().lower()
+        value = value.strip(' \t:')
+        if not separator or not value:
+            continue
+        for key, labels in _LABELS.items():
+            if key not in facts and label in labels:
+                facts[key] = value.split('\t')[0].strip()
+    return facts
+
+
+class FactsExtractor:
+    """Reads device facts from one vendor's web pages."""
+
+    # Name stored with the facts
+    vendor = 'generic'
+    # Pages to read, relative to the switch URL ('' is the URL itself), and
+    # the seconds each is cached before it is requested again
+    pages = {'': 900}
+
+    def matches(self, home: str) -> bool:
+        """Whether the switch's home page (HTML) belongs to this vendor."""
+        return True
+
+    def extract(self, path: str, text: str) -> Dict[str, str]:
+        """
+        Read facts from one page.
+
+        Returns:
+            Raw facts: any of 'model', 'firmware', 'mac' and 'uptime' (as shown)
+        """
+        return extract_labeled(text)
+
+
+class TPLinkEasySmartExtractor(FactsExtractor):
+    """TP-Link Easy Smart switches (TL-SG105E/108E/116E...), system info page."""
+
+    vendor = 'tplink-easy-smart'
+    pages = {'SystemInfoRpm.htm': 86400}
+
+    def matches(self, home: str) -> bool:
+        return bool(re.search(r'tp-?link', home, re.IGNORECASE))
+
+    def extract(self, path: str, text: str) -> Dict[str, str]:
+        # var info_ds = {descriStr:["TL-SG108E"], macStr:["..."], firmwareStr:["..."], hardwareStr:["..."]};
+        values = dict(re.findall(r'(\w+Str)\s*:\s*\[\s*"([^"]*)"', text))
+        facts = {}
+        if values.get('hardwareStr') or values.get('descriStr'):
+            facts['model'] = values.get('hardwareStr') or values['descriStr']
+        if values.get('firmwareStr'):
+            facts['firmware'] = values['firmwareStr']
+        if values.get('macStr'):
+            facts['mac'] = values['macStr']
+        return facts
+
+
+class FleetSimExtractor(FactsExtractor):
+    """Switches served by fleet_sim.py (static system page, uptime on the console page)."""
+
+    vendor = 'yap-fleet-sim'
+    pages = {'': 900, 'sysinfo.htm': 86400}
+
+    def matches(self, home: str) -> bool:
+        return 'yap-fleet-sim' in home
+
+    def extract(self, path: str, text: str) -> Dict[str, str]:
+        if path == '':
+            match = re.search(r'\bup (\d+) s\b', text)
+            return {'uptime': match.group(1)} if match else {}
+        return extract_labeled(text)
+
+
+_extractors = [TPLinkEasySmartExtractor(), FleetSimExtractor()]
+_generic = FactsExtractor()
+_plugins_loaded = False
+
+
+def register_extractor(extractor: FactsExtractor):
+    """Add an extractor; it is tried before the built-in ones."""
+    _extractors.insert(0, extractor)
+
+
+def extractors() -> List[FactsExtractor]:
+    """Get all extractors in the order they are tried (the generic one last)."""
+    global _plugins_loaded
+    if not _plugins_loaded:
+        _plugins_loaded = True
+        for module in os.environ.get('YAP_FACTS_PLUGINS', '').split(','):
+            if module.strip():
+                try:
+                    importlib.import_module(module.strip())
+                except Exception as e:
+                    print(f"Error loading facts plugin {module.strip()}: {e}")
+    return _extractors + [_generic]
+
+
+def _extractor_for(vendor: Optional[str]) -> Optional[FactsExtractor]:
+    for extractor in extractors():
+        if extractor.vendor == vendor:
+            return extractor
+    return None
+
+
+def switch_facts(switch: Dict) -> Dict:
+    """Get the stored facts of a switch entry (empty dict if none were collected)."""
+    facts = switch.get(FACTS_FIELD)
+    return facts if isinstance(facts, dict) else {}
+
+
+def format_uptime(seconds: float) -> str:
+    """Format an uptime like '12d 3h' / '3h 25m' / '4m'."""
+    seconds = max(0, int(seconds))
+    days, rest = divmod(seconds, 86400)
+    hours, rest = divmod(rest, 3600)
+    minutes = rest // 60
+    if days:
+        return f"{days}d {hours}h"
+    if hours:
+        return f"{hours}h {minutes}m"
+    return f"{minutes}m"
+
+
+def summary(switch: Dict) -> str:
+    """Short facts text for the switch list ('model, firmware'), empty without facts."""
+    facts = switch_facts(switch)
+    return ', '.join(facts[key] for key in ('model', 'firmware') if facts.get(key))
+
+
+def describe(switch: Dict, now: Optional[float] = None) -> str:
+    """All facts of a switch in one line, with the current uptime."""
+    facts = switch_facts(switch)
+    parts = []
+    if facts.get('model'):
+        parts.append(facts['model'])
+    if facts.get('firmware'):
+        parts.append(f"firmware {facts['firmware']}")
+    if facts.get('mac'):
+        parts.append(facts['mac'])
+    if facts.get('booted_at'):
+        parts.append(f"up {format_uptime((now or time.time()) - facts['booted_at'])}")
+    return ' · '.join(parts)
+
+
+def search_text(name: str, switch: Dict) -> str:
+    """Lowercase text a switch is found by: name, URL, vendor and facts."""
+    facts = switch_facts(switch)
+    parts = [name, switch.get('url') or '', facts.get('vendor') or '']
+    parts += [facts.get(key) or '' for key in ('model', 'firmware', 'mac')]
+    if facts.get('mac'):
+        # Also match MACs typed without separators or in dotted notation
+        digits = facts['mac'].replace(':', '')
+        parts += [digits, '.'.join(digits[i:i + 4] for i in range(0, 12, 4))]
+    return ' '.join(parts).lower()
+
+
+def matches(name: str, switch: Dict, query: str) -> bool:
+    """Whether a switch matches every word of a search query (case-insensitive)."""
+    terms = query.lower().split()
+    if not terms:
+        return True
+    text = search_text(name, switch)
+    return all(term in text for term in terms)
+
+
+def _stable(facts: Dict) -> Dict:
+    """Facts without the fetch times (which alone are no reason to write the inventory)."""
+    pages = {path: {key: value for key, value in page.items() if key != 'fetched_at'}
+             for path, page in facts.get('pages', {}).items()}
+    return dict(facts, pages=pages)
+
+
+class FactsCollector:
+    """Collects device facts from many switches concurrently into SwitchStorage."""
+
+    def __init__(self, storage, vault=None, tls=None, max_workers: int = 16, timeout: float = 5.0):
+        """
+        Initialize the collector.
+
+        Args:
+            storage: SwitchStorage inventory (facts are read from and written to it)
+            vault: Optional CredentialVault; stored logins are sent as HTTP basic auth
+            tls: Optional TLSSessionCache for resumed handshakes and pinned certificates
+            max_workers: Switches collected at the same time
+            timeout: Request timeout in seconds
+        """
+        self.storage = storage
+        self.vault = vault
+        self.max_workers = max(1, int(max_workers))
+        self.timeout = timeout
+        self.session = create_session(retries=0, pool_maxsize=self.max_workers, tls=tls)
+        # (switch name, page URL) -> when the page was last checked by this collector
+        self._checked = {}
+        self._lock = threading.Lock()
+
+    def run(self, names: Optional[Iterable[str]] = None, force: bool = False,
+            on_result: Optional[Callable[[FactsResult], None]] = None) -> List[FactsResult]:
+        """
+        Collect facts and store the ones that changed in one write.
+
+        Args:
+            names: Switches to collect (defaults to the whole inventory)
+            force: Detect the vendor again and request every page unconditionally
+            on_result: Called with each FactsResult as it completes
+
+        Returns:
+            List of FactsResults
+        """
+        switches = self.storage.load_switches()
+        if names is not None:
+            switches = {name: switches[name] for name in names if name in switches}
+
+        results = []
+        updates = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [executor.submit(self.collect_one, name, data, force) for name, data in switches.items()]
+            for future in as_completed(futures):
+                result, facts = future.result()
+                results.append(result)
+                if facts is not None:
+                    updates[result.name] = {FACTS_FIELD: facts}
+                if on_result:
+                    try:
+                        on_result(result)
+                    except Exception as e:
+                        print(f"Facts callback error: {e}")
+        if updates:
+            self.storage.update_switches(updates)
+        return results
+
+    def collect_one(self, name: str, switch: Dict, force: bool = False) -> Tuple[FactsResult, Optional[Dict]]:
+        """
+        Collect the facts of one switch (without storing them).
+
+        Args:
+            name: Switch name
+            switch: SwitchStorage entry
+            force: Detect the vendor again and request every page unconditionally
+
+        Returns:
+            Tuple of (FactsResult, facts to store or None if nothing needs writing)
+        """
+        base = switch.get('url')
+        if not base:
+            return FactsResult(name, 'skipped', 0, 0, 0, 'No URL configured'), None
+        base = base if base.endswith('/') else base + '/'
+        old = switch_facts(switch)
+        old_pages = old.get('pages', {})
+        counts = {'requests': 0, 'not_modified': 0, 'cache_hits': 0}
+
+        auth = None
+        if self.vault is not None:
+            credentials = self.vault.get_credentials(name)
+            if credentials:
+                auth = (credentials['username'], credentials['password'])
+
+        try:
+            fetched = {}
+            extractor = None if force else _extractor_for(old.get('vendor'))
+            if extractor is None:
+                # Unknown vendor: the home page decides (and is reused if the vendor reads it anyway)
+                record, text = self._fetch(name, base, {}, 0, auth, True, counts)
+                fetched[''] = (record, text)
+                extractor = next(e for e in extractors() if e.matches(text or ''))
+
+            pages = {}
+            merged = {}
+            for path, ttl in extractor.pages.items():
+                if path in fetched and extractor.vendor != old.get('vendor'):
+                    record, text = fetched[path]
+                else:
+                    old_page = old_pages.get(path, {}) if extractor.vendor == old.get('vendor') else {}
+                    record, text = self._fetch(name, urljoin(base, path), old_page, ttl, auth, force, counts)
+                if text is not None:
+                    page_facts = self._normalize(extractor.extract(path, text), record['fetched_at'])
+                    previous = old_pages.get(path, {}).get('facts', {})
+                    if ('booted_at' in page_facts and 'booted_at' in previous
+                            and abs(page_facts['booted_at'] - previous['booted_at']) <= BOOT_TOLERANCE):
+                        # Same boot; keep the stored time so the entry does not change
+                        page_facts['booted_at'] = previous['booted_at']
+                    record['facts'] = page_facts
+                pages[path] = record
+                merged.update({key: value for key, value in record.get('facts', {}).items() if value})
+        except Exception as e:
+            return FactsResult(name, 'failed', counts['requests'], counts['not_modified'],
+                               counts['cache_hits'], str(e)), None
+
+        facts = {'vendor': extractor.vendor}
+        facts.update({key: merged[key] for key in FACT_KEYS if key in merged})
+        facts['pages'] = pages
+        visible = {key: value for key, value in facts.items() if key != 'pages'}
+        old_visible = {key: value for key, value in old.items() if key != 'pages'}
+        status = 'changed' if visible != old_visible else 'unchanged'
+        result = FactsResult(name, status, counts['requests'], counts['not_modified'], counts['cache_hits'], None)
+        return result, (facts if _stable(facts) != _stable(old) else None)
+
+    def _fetch(self, name: str, url: str, record: Dict, ttl: float, auth, force: bool,
+               counts: Dict[str, int]) -> Tuple[Dict, Optional[str]]:
+        """
+        Get a page unless it is cached.
+
+        Returns:
+            Tuple of (page record, page text or None if the stored facts still apply)
+        """
+        now = time.time()
+        with self._lock:
+            last = max(record.get('fetched_at', 0), self._checked.get((name, url), 0))
+        if record.get('facts') is not None and not force and now - last < ttl:
+            counts['cache_hits'] += 1
+            return record, None
+
+        headers = {}
+        if record.get('facts') is not None and not force:
+            if record.get('etag'):
+                headers['If-None-Match'] = record['etag']
+            if record.get('last_modified'):
+                headers['If-Modified-Since'] = record['last_modified']
+        counts['requests'] += 1
+        response = self.session.get(url, headers=headers, auth=auth, timeout=self.timeout)
+        with self._lock:
+            self._checked[(name, url)] = now
+        if response.status_code == 304 and headers:
+            counts['not_modified'] += 1
+            return record, None
+        response.raise_for_status()
+        new = {'fetched_at': int(now)}
+        if response.headers.get('ETag'):
+            new['etag'] = response.headers['ETag']
+        if response.headers.get('Last-Modified'):
+            new['last_modified'] = response.headers['Last-Modified']
+        return new, response.text
+
+    @staticmethod
+    def _normalize(raw: Dict[str, str], fetched_at: float) -> Dict:
+        """Clean up raw extractor output; uptime becomes the boot time."""
+        facts = {}
+        for key in ('model', 'firmware'):
+            if raw.get(key):
+                facts[key] = re.sub(r'\s+', ' ', raw[key]).strip()[:80]
+        if raw.get('mac'):
+            mac = parse_mac(raw['mac'])
+            if mac:
+                facts['mac'] = mac
+        if raw.get('uptime'):
+            uptime = parse_uptime(raw['uptime'])
+            if uptime is not None:
+                facts['booted_at'] = int(fetched_at - uptime)
+        return facts
+
+
+def main(argv=None):
+    """Collect or search device facts from the command line."""
+    import argparse
+    from switch_storage import SwitchStorage
+
+    parser = argparse.ArgumentParser(description="Collect model, firmware, uptime and MAC of saved switches")
+    parser.add_argument("names", nargs="*", help="switches to collect (default: all)")
+    parser.add_argument("--storage", default=None, help="switches.json (default: the saved switches)")
+    parser.add_argument("--workers", type=int, default=16, help="switches collected at the same time")
+    parser.add_argument("--timeout", type=float, default=5.0, help="request timeout in seconds")
+    parser.add_argument("--force", action="store_true", help="ignore cached pages and detect vendors again")
+    parser.add_argument("--search", metavar="QUERY",
+                        help="only search the stored facts (no requests), e.g. --search 'sg108e 1.0.2'")
+    args = parser.parse_args(argv)
+    storage = SwitchStorage(args.storage)
+
+    if args.search is not None:
+        switches = storage.load_switches()
+        found = [name for name in sorted(switches) if matches(name, switches[name], args.search)]
+        for name in found:
+            print(f"{name}: {describe(switches[name]) or 'no facts collected'}")
+        print(f"{len(found)} switch(es) found")
+        return 0 if found else 1
+
+    from credential_vault import CredentialVault
+
+    collector = FactsCollector(storage, vault=CredentialVault(), max_workers=args.workers, timeout=args.timeout)
+
+    def report(result):
+        if result.status == 'failed':
+            print(f"✗ {result.name}: {result.error}")
+
+    started = time.monotonic()
+    results = collector.run(args.names or None, force=args.force, on_result=report)
+    elapsed = time.monotonic() - started
+    statuses = {status: sum(1 for r in results if r.status == status)
+                for status in ('changed', 'unchanged', 'failed', 'skipped')}
+    requests_sent = sum(r.requests for r in results)
+    print(f"{statuses['changed']} changed, {statuses['unchanged']} unchanged, {statuses['failed']} failed, "
+          f"{statuses['skipped']} skipped in {elapsed:.1f}s; {requests_sent} request(s), "
+          f"{sum(r.not_modified for r in results)} not modified, {sum(r.cache_hits for r in results)} cache hit(s)")
+    return 1 if statuses['failed'] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
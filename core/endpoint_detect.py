@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Endpoint detection - finds the scheme and port a switch's web console answers on.
+
+When a switch address is entered without a scheme, HTTP, HTTPS and the
+common alternative management ports are tried concurrently, happy-eyeballs
+style: the preferred candidate starts first, each further candidate starts
+after a short delay (or as soon as an earlier one fails), and the first
+one to answer wins. A redirect to another scheme or port on the same host
+(e.g. HTTP -> HTTPS) resolves to its target, so later opens skip it.
+"""
+import http.client
+import queue
+import ssl
+import threading
+import time
+from typing import List, Optional
+from urllib.parse import urljoin, urlparse
+
+# (scheme, port) pairs tried when the address has no port, in order of preference
+DEFAULT_CANDIDATES = [('http', 80), ('https', 443), ('https', 8443), ('http', 8080)]
+
+
+def has_scheme(address: str) -> bool:
+    """Check whether an address already names its scheme."""
+    return address.strip().lower().startswith(('http://', 'https://'))
+
+
+def _format_url(scheme: str, host: str, port: int, path: str) -> str:
+    default = 443 if scheme == 'https' else 80
+    if ':' in host and not host.startswith('['):
+        host = f"[{host}]"
+    netloc = host if port == default else f"{host}:{port}"
+    return f"{scheme}://{netloc}{path or '/'}"
+
+
+def candidate_urls(address: str) -> List[str]:
+    """
+    Get the URLs to try for an address without a scheme.
+
+    Args:
+        address: Host, host:port or host/path as typed by the user
+
+    Returns:
+        Candidate URLs in order of preference
+    """
+    parsed = urlparse('http://' + address.strip())
+    host = parsed.hostname
+    if not host:
+        return []
+    path = parsed.path or '/'
+    if not path.endswith('/') and '.' not in path.rsplit('/', 1)[-1]:
+        path += '/'
+    if parsed.port:
+        # An explicit port only leaves the scheme open
+        return [_format_url(scheme, host, parsed.port, path) for scheme in ('http', 'https')]
+    return [_format_url(scheme, host, port, path) for scheme, port in DEFAULT_CANDIDATES]
+
+
+class EndpointDetector:
+    """Races candidate endpoints and remembers the winners."""
+
+    def __init__(self, timeout: float = 3.0, stagger: float = 0.25, cache_ttl: float = 3600.0):
+        """
+        Initialize the detector.
+
+        Args:
+            timeout: Seconds before the whole detection gives up
+            stagger: Head start of each candidate over the next one
+            cache_ttl: Seconds a detected endpoint is remembered
+        """
+        self.timeout = timeout
+        self.stagger = stagger
+        self.cache_ttl = cache_ttl
+        self._lock = threading.Lock()
+        self._cache = {}  # address -> (url, detected_at)
+
+    def cached(self, address: str) -> Optional[str]:
+        """
+        Get a previously detected endpoint.
+
+        Args:
+            address: Address as typed by the user
+
+        Returns:
+            Detected URL, or None if unknown or expired
+        """
+        key = address.strip().lower()
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                return None
+            if time.monotonic() - entry[1] > self.cache_ttl:
+                del self._cache[key]
+                return None
+            return entry[0]
+
+    def detect(self, address: str) -> Optional[str]:
+        """
+        Find the endpoint a switch answers on (blocking).
+
+        Args:
+            address: Host, host:port or host/path without a scheme
+
+        Returns:
+            Console URL, or None if no candidate answered
+        """
+        cached = self.cached(address)
+        if cached:
+            return cached
+
+        pending = candidate_urls(address)
+        results = queue.Queue()
+        deadline = time.monotonic() + self.timeout
+        in_flight = 0
+        winner = None
+
+        while pending or in_flight:
+            if pending and not in_flight:
+                # Nothing running (first attempt, or all earlier ones failed): start the next now
+                self._start(pending.pop(0), results, deadline)
+                in_flight += 1
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                result = results.get(timeout=min(remaining, self.stagger) if pending else remaining)
+            except queue.Empty:
+                # Head start over: race the next candidate too
+                if pending:
+                    self._start(pending.pop(0), results, deadline)
+                    in_flight += 1
+                continue
+            in_flight -= 1
+            if result:
+                winner = result
+                break
+
+        if winner:
+            with self._lock:
+                self._cache[address.strip().lower()] = (winner, time.monotonic())
+        return winner or None
+
+    def _start(self, url: str, results: queue.Queue, deadline: float):
+        """Probe one candidate in a background thread; puts its URL, a redirect target or None."""
+        def _run():
+            try:
+                results.put(self._probe(url, max(0.1, deadline - time.monotonic())))
+            except Exception:
+                results.put(None)
+
+        threading.Thread(target=_run, daemon=True).start()
+
+    def _probe(self, url: str, timeout: float) -> Optional[str]:
+        """Send one request; any HTTP response counts as the console answering."""
+        parsed = urlparse(url)
+        if parsed.scheme == 'https':
+            # Switches almost always use self-signed certificates; this only
+            # finds out whether TLS is spoken here, nothing is trusted
+            context = ssl.create_default_context()
+            context.check_hostname = False
+            context.verify_mode = ssl.CERT_NONE
+            connection = http.client.HTTPSConnection(parsed.hostname, parsed.port, timeout=timeout,
+                                                     context=context)
+        else:
+            connection = http.client.HTTPConnection(parsed.hostname, parsed.port, timeout=timeout)
+        try:
+            connection.request('GET', parsed.path or '/', headers={'Connection': 'close'})
+            response = connection.getresponse()
+            location = response.getheader('Location')
+            status = response.status
+        finally:
+            connection.close()
+
+        if 300 <= status < 400 and location:
+            target = urlparse(urljoin(url, location))
+            # Follow scheme/port redirects on the same host; a redirect to a
+            # login page or another host keeps the original endpoint
+            if target.hostname == parsed.hostname and target.scheme in ('http', 'https') \
+                    and (target.scheme, target.port) != (parsed.scheme, parsed.port):
+                port = target.port or (443 if target.scheme == 'https' else 80)
+                return _format_url(target.scheme, target.hostname, port, parsed.path or '/')
+        return url
+
+    def forget(self, address: str):
+        """Drop a cached endpoint (e.g. after the switch moved)."""
+        with self._lock:
+            self._cache.pop(address.strip().lower(), None)
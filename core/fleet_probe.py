@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+"""
+Fleet probe - reachability checks for the whole inventory, sharded across processes.
+
+One process spends most of a large probe run holding the GIL for TLS
+handshakes, response parsing and bookkeeping. The inventory is therefore
+split into shards, each probed by its own worker process running a thread
+pool, and the results are merged in the parent through one shared queue.
+Small inventories are probed in-process, where spawning workers would cost
+more than it saves.
+
+Timeouts adapt per host and known-dead hosts are skipped (see host_health);
+workers receive the host states of their shard and hand them back updated.
+"""
+import multiprocessing
+import os
+import queue
+import time
+import zlib
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import requests
+
+from host_health import HostHealth
+from http_session import create_session
+from result_sinks import pipeline_from_specs
+from tls_sessions import TLSSessionCache, pins_from_switches, request_timing
+
+
+# Outcome of one reachability check.
+#   reachable: True if the switch answered 200 (same rule as SwitchManager.check_connection)
+#   latency: seconds until the response headers arrived, or None
+#   handshake: seconds of it spent in a TLS handshake (None on pooled or plain HTTP connections)
+#   ttfb: seconds from the end of the handshake (or the start) until the headers arrived
+ProbeResult = namedtuple('ProbeResult', ['name', 'reachable', 'status_code', 'latency', 'error', 'checked_at',
+                                         'handshake', 'ttfb'], defaults=(None, None))
+
+# Below this many switches per worker process, probing stays in-process
+MIN_SWITCHES_PER_PROCESS = 200
+
+# Results sent from a worker per queue message
+RESULT_BATCH = 100
+
+
+def probe_switch(session, name: str, url: str, timeout: float = 1.5,
+                 health: Optional[HostHealth] = None, tls: Optional[TLSSessionCache] = None) -> ProbeResult:
+    """
+    Check whether one switch answers.
+
+    Args:
+        session: requests session
+        name: Switch name
+        url: Switch URL
+        timeout: Request timeout in seconds (ignored when health is given)
+        health: Optional HostHealth supplying the timeout and circuit breaker
+        tls: TLSSessionCache the session was created with, for the handshake timing
+
+    Returns:
+        ProbeResult
+    """
+    host = urlparse(url).netloc
+    if health is not None:
+        if not health.allow(host):
+            return ProbeResult(name, False, None, None, 'Host down (circuit open)', time.time())
+        timeout = health.timeout(host)
+    if tls is not None:
+        tls.begin()
+    started = time.monotonic()
+    try:
+        # Only the headers are needed
+        response = session.get(url, timeout=timeout, stream=True)
+        finished = time.monotonic()
+        latency = finished - started
+        handshake, ttfb = request_timing(tls, started, finished)
+        status_code = response.status_code
+        response.close()
+    except Exception as e:
+        # Only a host that does not answer counts against its circuit
+        if health is not None and isinstance(e, (requests.ConnectionError, requests.Timeout)):
+            health.record_failure(host)
+        return ProbeResult(name, False, None, None, str(e), time.time())
+    if health is not None:
+        health.record_success(host, latency)
+    return ProbeResult(name, status_code == 200, status_code, latency, None, time.time(), handshake, ttfb)
+
+
+def probe_switches(targets: Iterable[Tuple[str, str]], max_workers: int = 64, timeout: float = 1.5,
+                   on_result: Optional[Callable[[ProbeResult], None]] = None,
+                   health: Optional[HostHealth] = None,
+                   tls: Optional[TLSSessionCache] = None) -> List[ProbeResult]:
+    """
+    Probe switches concurrently in this process.
+
+    Args:
+        targets: (name, url) pairs
+        max_workers: Switches probed at the same time
+        timeout: Request timeout in seconds (ignored when health is given)
+        on_result: Called with each ProbeResult as it completes
+        health: Optional HostHealth for adaptive timeouts and skipping dead hosts
+        tls: Optional TLSSessionCache; keep it across runs to resume TLS sessions
+
+    Returns:
+        List of ProbeResults
+    """
+    targets = list(targets)
+    if not targets:
+        return []
+    workers = max(1, min(int(max_workers), len(targets)))
+    session = create_session(retries=0, pool_maxsize=workers, tls=tls)
+    results = []
+
+    def probe(target):
+        return probe_switch(session, target[0], target[1], timeout, health, tls)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for result in executor.map(probe, targets):
+            results.append(result)
+            if on_result:
+                on_result(result)
+    session.close()
+    return results
+
+
+def _probe_shard(shard_id: int, targets: List[Tuple[str, str]], results, max_workers: int,
+                 timeout: float, health_state=None, pins=None):
+    """Worker process: probe one shard and send the results back in batches."""
+    batch = []
+    health = HostHealth(initial_timeout=timeout)
+    health.update(health_state)
+    tls = TLSSessionCache()
+    tls.set_pins(pins or {})
+
+    def collect(result):
+        batch.append(tuple(result))
+        if len(batch) >= RESULT_BATCH:
+            results.put((shard_id, 'results', batch[:]))
+            del batch[:]
+
+    try:
+        probe_switches(targets, max_workers, timeout, collect, health, tls)
+    finally:
+        if batch:
+            results.put((shard_id, 'results', batch))
+        results.put((shard_id, 'health', health.export()))
+        # Marks the shard as finished
+        results.put((shard_id, 'done', None))
+
+
+def shard_targets(targets: Iterable[Tuple[str, str]], shards: int) -> List[List[Tuple[str, str]]]:
+    """
+    Split (name, url) pairs into shards.
+
+    A switch always lands in the same shard for the same shard count, so its
+    connections are kept by the same worker from run to run.
+
+    Args:
+        targets: (name, url) pairs
+        shards: Number of shards
+
+    Returns:
+        List of shards
+    """
+    buckets = [[] for _ in range(max(1, shards))]
+    for name, url in targets:
+        buckets[zlib.crc32(name.encode('utf-8')) % len(buckets)].append((name, url))
+    return [bucket for bucket in buckets if bucket]
+
+
+class ShardedProber:
+    """Probes the SwitchStorage inventory across several worker processes."""
+
+    def __init__(self, storage, processes: Optional[int] = None, threads_per_process: int = 64,
+                 timeout: float = 1.5, min_per_process: int = MIN_SWITCHES_PER_PROCESS,
+                 health: Optional[HostHealth] = None, tls: Optional[TLSSessionCache] = None):
+        """
+        Initialize the prober.
+
+        Args:
+            storage: SwitchStorage inventory
+            processes: Worker processes (defaults to the number of CPUs)
+            threads_per_process: Concurrent probes inside each worker
+            timeout: Timeout for hosts without RTT history, in seconds
+            min_per_process: Smallest shard worth a process of its own
+            health: HostHealth kept across runs (created if None)
+            tls: TLSSessionCache kept across in-process runs (created if None); worker
+                processes start with their own and only receive the certificate pins
+        """
+        self.storage = storage
+        self.processes = max(1, int(processes or os.cpu_count() or 1))
+        self.threads_per_process = max(1, int(threads_per_process))
+        self.timeout = timeout
+        self.min_per_process = max(1, int(min_per_process))
+        self.health = health or HostHealth(initial_timeout=timeout)
+        self.tls = tls or TLSSessionCache()
+        # 'spawn' so workers never inherit the GUI's threads or Tk state
+        self._context = multiprocessing.get_context('spawn')
+
+    def run(self, names: Optional[Iterable[str]] = None,
+            on_result: Optional[Callable[[ProbeResult], None]] = None) -> List[ProbeResult]:
+        """
+        Probe switches and wait for all results.
+
+        Args:
+            names: Switches to probe (defaults to the whole inventory)
+            on_result: Called in this process with each ProbeResult as it arrives
+
+        Returns:
+            List of ProbeResults
+        """
+        switches = self.storage.load_switches()
+        if names is not None:
+            switches = {name: switches[name] for name in names if name in switches}
+        targets = [(name, data['url']) for name, data in switches.items() if data.get('url')]
+        pins = pins_from_switches(switches)
+        self.tls.set_pins(pins)
+
+        processes = min(self.processes, len(targets) // self.min_per_process)
+        if processes <= 1:
+            return probe_switches(targets, self.threads_per_process, self.timeout, on_result, self.health,
+                                  self.tls)
+        return self._run_sharded(shard_targets(targets, processes), on_result, pins)
+
+    def _run_sharded(self, shards: List[List[Tuple[str, str]]],
+                     on_result: Optional[Callable[[ProbeResult], None]],
+                     pins: Optional[dict] = None) -> List[ProbeResult]:
+        """Start one worker per shard and merge their results."""
+        results_queue = self._context.Queue()
+        workers = {}
+        for shard_id, shard in enumerate(shards):
+            hosts = {urlparse(url).netloc for _name, url in shard}
+            shard_pins = {host: pin for host, pin in (pins or {}).items() if host in hosts}
+            process = self._context.Process(
+                target=_probe_shard,
+                args=(shard_id, shard, results_queue, self.threads_per_process, self.timeout,
+                      self.health.export(hosts), shard_pins),
+                daemon=True,
+            )
+            process.start()
+            workers[shard_id] = process
+
+        pending = {shard_id: {name for name, _url in shard} for shard_id, shard in enumerate(shards)}
+        results = []
+
+        def deliver(result):
+            results.append(result)
+            if on_result:
+                try:
+                    on_result(result)
+                except Exception as e:
+                    print(f"Probe callback error: {e}")
+
+        while pending:
+            try:
+                shard_id, kind, payload = results_queue.get(timeout=0.5)
+            except queue.Empty:
+                # A worker that died without finishing its shard leaves its switches unanswered
+                for shard_id in [s for s in pending if not workers[s].is_alive()]:
+                    for name in sorted(pending.pop(shard_id)):
+                        deliver(ProbeResult(name, False, None, None, 'Probe worker exited', time.time()))
+                continue
+            if kind == 'health':
+                self.health.update(payload)
+                continue
+            if kind == 'done':
+                # Whatever the worker did not report is lost
+                for name in sorted(pending.pop(shard_id, ())):
+                    deliver(ProbeResult(name, False, None, None, 'Probe worker exited', time.time()))
+                continue
+            for item in payload:
+                result = ProbeResult(*item)
+                if shard_id in pending:
+                    pending[shard_id].discard(result.name)
+                deliver(result)
+
+        for process in workers.values():
+            process.join(timeout=1.0)
+        results_queue.close()
+        return results
+
+
+def main(argv=None):
+    """Probe all saved switches from the command line."""
+    import argparse
+    from switch_storage import SwitchStorage
+
+    parser = argparse.ArgumentParser(description="Check which saved switches are reachable")
+    parser.add_argument("names", nargs="*", help="switches to probe (default: all)")
+    parser.add_argument("--storage", default=None, help="switches.json to probe (default: the saved switches)")
+    parser.add_argument("--processes", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--threads", type=int, default=64, help="concurrent probes per process")
+    parser.add_argument("--timeout", type=float, default=1.5,
+                        help="timeout for switches without response time history, in seconds")
+    parser.add_argument("--quiet", action="store_true", help="only print the summary")
+    parser.add_argument("--sink", action="append", default=[], metavar="SPEC",
+                        help="also stream results to a sink, e.g. jsonl:probes.jsonl, syslog:, "
+                             "unix:/path or http://host/hook (repeatable)")
+    parser.add_argument("--sink-policy", choices=["drop", "block"], default="drop",
+                        help="what to do when a sink falls behind")
+    args = parser.parse_args(argv)
+    sinks = pipeline_from_specs(args.sink, policy=args.sink_policy)
+
+    prober = ShardedProber(SwitchStorage(args.storage), processes=args.processes,
+                           threads_per_process=args.threads, timeout=args.timeout)
+
+    def report(result):
+        if sinks:
+            sinks.emit(result, 'sweep')
+        if args.quiet:
+            return
+        if result.reachable:
+            tls = f" (TLS handshake {result.handshake * 1000:.0f} ms)" if result.handshake is not None else ""
+            print(f"✓ {result.name}: {result.latency * 1000:.0f} ms{tls}")
+        else:
+            print(f"✗ {result.name}: {result.error or result.status_code}")
+
+    started = time.monotonic()
+    results = prober.run(args.names or None, on_result=report)
+    elapsed = time.monotonic() - started
+    if sinks:
+        sinks.close()
+        for name, counts in sinks.stats().items():
+            if counts['dropped'] or counts['failed']:
+                print(f"{name}: {counts['dropped']} result(s) dropped, {counts['failed']} failed to write")
+    reachable = sum(1 for r in results if r.reachable)
+    rate = len(results) / elapsed if elapsed > 0 else 0.0
+    print(f"{reachable}/{len(results)} switch(es) reachable in {elapsed:.1f}s ({rate:.0f} probes/s)")
+    return 0 if reachable == len(results) else 1
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    raise SystemExit(main())
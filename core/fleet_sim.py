@@ -0,0 +1,523 @@
+#!/usr/bin/env python3
+"""
+Fleet simulator - thousands of fake switch web consoles served from one asyncio process.
+
+Each simulated switch listens on its own loopback port (or its own 127.x.y.z
+address) and answers like a small managed switch: a console page, optionally
+behind a login form, a configuration export ('config.cfg'), interface
+counters ('counters.json') and a public system information page
+('sysinfo.htm', with ETag/Last-Modified for conditional requests). Per switch, the simulator can add response
+latency, fail a share of requests (connection reset or HTTP 500), never
+answer at all, redirect HTTP to HTTPS, or speak TLS with a self-signed
+certificate.
+
+The simulator writes a switches.json inventory for the fleet, so the GUI,
+fleet_probe, config_backup and port_stats can be pointed at it unchanged.
+Behaviour is drawn from a seeded random generator: the same options give
+the same fleet.
+"""
+import asyncio
+import json
+import os
+import random
+import resource
+import shutil
+import socket
+import ssl
+import struct
+import subprocess
+import tempfile
+import threading
+import time
+import zlib
+from collections import namedtuple
+from email.utils import formatdate
+from typing import Dict, List, Optional
+
+# Try to import cryptography for generating the TLS certificate
+try:
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import ec
+    from cryptography.x509.oid import NameOID
+    HAS_CRYPTOGRAPHY = True
+except ImportError:
+    HAS_CRYPTOGRAPHY = False
+
+
+# Behaviour of one simulated switch.
+#   latency, jitter: seconds added before each response (jitter is uniform +/-)
+#   failure_rate: share of requests answered with a connection reset
+#   error_rate: share of requests answered with HTTP 500
+#   down: accepts connections but never answers
+#   tls: console served over HTTPS
+#   redirect: plain HTTP port that redirects to the HTTPS console (implies tls)
+#   login: console behind a login form (credentials admin/admin)
+SimProfile = namedtuple('SimProfile', ['latency', 'jitter', 'failure_rate', 'error_rate',
+                                       'down', 'tls', 'redirect', 'login'])
+
+# A simulated switch and the URL its console is reached at
+SimSwitch = namedtuple('SimSwitch', ['name', 'url', 'profile'])
+
+USERNAME = 'admin'
+PASSWORD = 'admin'
+
+_LOGIN_PAGE = """<!DOCTYPE html>
+<html><head><title>{name} - Login</title><meta name="generator" content="yap-fleet-sim">
+<link rel="stylesheet" href="/style.css"></head>
+<body><form method="post" action="/login">
+<input type="text" name="username" placeholder="User">
+<input type="password" name="password" placeholder="Password">
+<button type="submit">Login</button>
+</form></body></html>
+"""
+
+_CONSOLE_PAGE = """<!DOCTYPE html>
+<html><head><title>{name}</title><meta name="generator" content="yap-fleet-sim">
+<link rel="stylesheet" href="/style.css"></head>
+<body><h1>{name}</h1><p>Simulated switch, {ports} ports, up {uptime} s</p>
+<ul><li><a href="/config.cfg">Configuration</a></li><li><a href="/counters.json">Counters</a></li>
+<li><a href="/sysinfo.htm">System Information</a></li></ul>
+</body></html>
+"""
+
+# Static system information (public, like the status page of many switches)
+_SYSINFO_PAGE = """<!DOCTYPE html>
+<html><head><title>{name} - System Information</title><meta name="generator" content="yap-fleet-sim"></head>
+<body><table>
+<tr><td>Model</td><td>{model}</td></tr>
+<tr><td>Firmware Version</td><td>{firmware}</td></tr>
+<tr><td>MAC Address</td><td>{mac}</td></tr>
+</table></body></html>
+"""
+
+_STYLESHEET = "body { font-family: sans-serif; margin: 2em; } form input { display: block; margin: .5em 0; }\n"
+
+_REASONS = {200: 'OK', 301: 'Moved Permanently', 302: 'Found', 304: 'Not Modified', 400: 'Bad Request',
+            404: 'Not Found', 500: 'Internal Server Error'}
+
+
+def _raise_fd_limit(needed: int):
+    """Raise the open file limit towards what the fleet needs (best effort)."""
+    try:
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        wanted = min(hard, max(soft, needed)) if hard != resource.RLIM_INFINITY else max(soft, needed)
+        if wanted > soft:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (wanted, hard))
+    except (ValueError, OSError):
+        pass
+
+
+def _create_certificate(directory: str, addresses: List[str]):
+    """
+    Write a self-signed certificate and key (or reuse the existing one if it covers the addresses).
+
+    Args:
+        directory: Directory for the certificate, key and the list of addresses they cover
+        addresses: IP addresses of the HTTPS switches; localhost and 127.0.0.1 are always included
+
+    Returns:
+        Tuple of (certificate path, key path)
+    """
+    cert_path = os.path.join(directory, 'sim-cert.pem')
+    key_path = os.path.join(directory, 'sim-key.pem')
+    # Addresses in the certificate's subjectAltName (certificates without the list cover 127.0.0.1 only)
+    san_path = os.path.join(directory, 'sim-cert-addresses.txt')
+    addresses = sorted(set(addresses) | {'127.0.0.1'}, key=socket.inet_aton)
+    if os.path.exists(cert_path) and os.path.exists(key_path):
+        covered = {'127.0.0.1'}
+        if os.path.exists(san_path):
+            with open(san_path) as f:
+                covered = set(f.read().split())
+        if covered.issuperset(addresses):
+            return cert_path, key_path
+    os.makedirs(directory, exist_ok=True)
+    if HAS_CRYPTOGRAPHY:
+        import datetime
+        import ipaddress
+        key = ec.generate_private_key(ec.SECP256R1())
+        name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, 'yap-fleet-sim')])
+        now = datetime.datetime.utcnow()
+        alt_names = [x509.DNSName('localhost')]
+        alt_names += [x509.IPAddress(ipaddress.ip_address(address)) for address in addresses]
+        cert = (x509.CertificateBuilder()
+                .subject_name(name).issuer_name(name)
+                .public_key(key.public_key())
+                .serial_number(x509.random_serial_number())
+                .not_valid_before(now - datetime.timedelta(days=1))
+                .not_valid_after(now + datetime.timedelta(days=365))
+                .add_extension(x509.SubjectAlternativeName(alt_names), critical=False)
+                .sign(key, hashes.SHA256()))
+        with open(cert_path, 'wb') as f:
+            f.write(cert.public_bytes(serialization.Encoding.PEM))
+        with open(key_path, 'wb') as f:
+            f.write(key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                      serialization.NoEncryption()))
+    elif shutil.which('openssl'):
+        # The addresses go into a config file: thousands of them exceed the command line limit
+        config = ['[req]', 'distinguished_name = dn', 'x509_extensions = v3', '[dn]',
+                  '[v3]', 'subjectAltName = @alt', '[alt]', 'DNS.1 = localhost']
+        config += [f"IP.{number} = {address}" for number, address in enumerate(addresses, 1)]
+        config_path = os.path.join(directory, 'sim-cert.cnf')
+        with open(config_path, 'w') as f:
+            f.write('\n'.join(config) + '\n')
+        try:
+            subprocess.run(['openssl', 'req', '-x509', '-newkey', 'ec', '-pkeyopt', 'ec_paramgen_curve:prime256v1',
+                            '-nodes', '-keyout', key_path, '-out', cert_path, '-days', '365',
+                            '-subj', '/CN=yap-fleet-sim', '-config', config_path],
+                           check=True, capture_output=True)
+        finally:
+            os.unlink(config_path)
+    else:
+        raise RuntimeError("TLS needs the 'cryptography' package or the openssl command")
+    with open(san_path, 'w') as f:
+        f.write('\n'.join(addresses) + '\n')
+    return cert_path, key_path
+
+
+class FleetSimulator:
+    """Serves a fleet of simulated switches from one event loop in a background thread."""
+
+    def __init__(self, count: int = 100, latency: float = 0.0, jitter: float = 0.0,
+                 failure_rate: float = 0.0, error_rate: float = 0.0, down_rate: float = 0.0,
+                 tls_rate: float = 0.0, redirect_rate: float = 0.0, login_rate: float = 0.0,
+                 base_address: Optional[str] = None, port: int = 8080, seed: int = 1,
+                 cert_dir: Optional[str] = None):
+        """
+        Initialize the simulator.
+
+        Args:
+            count: Number of simulated switches
+            latency: Mean response latency in seconds
+            jitter: Uniform latency jitter in seconds (+/-)
+            failure_rate: Share of requests answered with a connection reset
+            error_rate: Share of requests answered with HTTP 500
+            down_rate: Share of switches that accept connections but never answer
+            tls_rate: Share of switches served over HTTPS
+            redirect_rate: Share of switches whose HTTP port redirects to HTTPS
+            login_rate: Share of switches with a login form in front of the console
+            base_address: First loopback address to give each switch its own address
+                (e.g. 127.1.0.1); None serves every switch on 127.0.0.1 with its own port
+            port: Port used with base_address
+            seed: Seed for assigning behaviour to switches
+            cert_dir: Directory keeping the TLS certificate between runs (so clients
+                can trust it); None uses a temporary one
+        """
+        self.count = max(0, int(count))
+        self.base_address = base_address
+        self.port = port
+        self.switches = []
+        self.requests = 0
+        self.started_at = None
+        self._rng = random.Random(seed)
+        self._profiles = []
+        for _ in range(self.count):
+            redirect = self._rng.random() < redirect_rate
+            self._profiles.append(SimProfile(
+                latency=latency, jitter=jitter, failure_rate=failure_rate, error_rate=error_rate,
+                down=self._rng.random() < down_rate,
+                tls=redirect or self._rng.random() < tls_rate,
+                redirect=redirect,
+                login=self._rng.random() < login_rate,
+            ))
+        self._loop = None
+        self._thread = None
+        self._servers = []
+        self.cert_dir = cert_dir
+        # Certificate of the HTTPS switches (trust it with REQUESTS_CA_BUNDLE)
+        self.cert_file = None
+        self._temp_cert_dir = None
+        self._ready = threading.Event()
+        self._error = None
+
+    def _address(self, index: int) -> str:
+        if self.base_address is None:
+            return '127.0.0.1'
+        base = struct.unpack('!I', socket.inet_aton(self.base_address))[0]
+        return socket.inet_ntoa(struct.pack('!I', base + index))
+
+    def start(self, timeout: float = 60.0) -> List[SimSwitch]:
+        """
+        Start serving in a background thread.
+
+        Args:
+            timeout: Seconds to wait for all listeners to be up
+
+        Returns:
+            The simulated switches
+        """
+        # Every switch needs a listening socket, redirecting ones two, plus client connections
+        _raise_fd_limit(3 * self.count + 256)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        if not self._ready.wait(timeout):
+            raise RuntimeError("Fleet simulator did not start in time")
+        if self._error:
+            raise self._error
+        return self.switches
+
+    def stop(self):
+        """Stop serving and remove the temporary certificate."""
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(10)
+            self._loop = None
+        if self._temp_cert_dir:
+            shutil.rmtree(self._temp_cert_dir, ignore_errors=True)
+            self._temp_cert_dir = None
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._loop.run_until_complete(self._listen())
+        except Exception as e:
+            self._error = e
+        finally:
+            self._ready.set()
+        if self._error is None:
+            self._loop.run_forever()
+        for server in self._servers:
+            server.close()
+        # Drop the connections still being served (e.g. held open by "down" switches)
+        tasks = asyncio.all_tasks(self._loop)
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            self._loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+        self._loop.close()
+
+    async def _listen(self):
+        """Open the listeners of every switch."""
+        ssl_context = None
+        if any(profile.tls for profile in self._profiles):
+            directory = self.cert_dir
+            if directory is None:
+                directory = self._temp_cert_dir = tempfile.mkdtemp(prefix='yap-fleet-sim-')
+            # Every HTTPS switch's own address has to be in the certificate
+            addresses = [self._address(index) for index, profile in enumerate(self._profiles) if profile.tls]
+            self.cert_file, key_file = _create_certificate(directory, addresses)
+            ssl_context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            ssl_context.load_cert_chain(self.cert_file, key_file)
+
+        self.started_at = time.time()
+        for index, profile in enumerate(self._profiles):
+            name = f"sim-{index + 1:05d}"
+            host = self._address(index)
+            port = self.port if self.base_address else 0
+            state = {'name': name, 'profile': profile, 'sessions': set(), 'ports': 8 + 8 * (index % 6)}
+            state['sysinfo'] = _SYSINFO_PAGE.format(
+                name=name, model=f"YaP-SIM-{state['ports']}P", firmware=f"1.{index % 3}.{index % 7}",
+                mac=':'.join(f"{byte:02X}" for byte in struct.pack('!HI', 0x02fa, index + 1))).encode()
+
+            server = await asyncio.start_server(
+                lambda r, w, s=state: self._serve(r, w, s), host, port,
+                ssl=ssl_context if profile.tls else None, backlog=128)
+            self._servers.append(server)
+            console_port = server.sockets[0].getsockname()[1]
+            scheme = 'https' if profile.tls else 'http'
+            url = self._url(scheme, host, console_port)
+
+            if profile.redirect:
+                # Plain HTTP listener in front of the HTTPS console, like a switch with "HTTPS only"
+                state_redirect = dict(state, redirect_to=url)
+                server = await asyncio.start_server(
+                    lambda r, w, s=state_redirect: self._serve(r, w, s), host,
+                    self.port + 1 if self.base_address else 0, backlog=128)
+                self._servers.append(server)
+                url = self._url('http', host, server.sockets[0].getsockname()[1])
+            self.switches.append(SimSwitch(name, url, profile))
+
+    @staticmethod
+    def _url(scheme: str, host: str, port: int) -> str:
+        return f"{scheme}://{host}:{port}/"
+
+    async def _serve(self, reader, writer, state):
+        """Answer the requests of one connection (HTTP/1.1 keep-alive)."""
+        profile = state['profile']
+        try:
+            while True:
+                try:
+                    request_line = await reader.readline()
+                except (ConnectionError, ssl.SSLError):
+                    return
+                if not request_line:
+                    return
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    key, _, value = line.decode('latin-1').partition(':')
+                    headers[key.strip().lower()] = value.strip()
+                body = b''
+                length = int(headers.get('content-length') or 0)
+                if length:
+                    body = await reader.readexactly(length)
+                try:
+                    method, target, _ = request_line.decode('latin-1').split(' ', 2)
+                except ValueError:
+                    await self._respond(writer, 400, b'', close=True)
+                    return
+                self.requests += 1
+
+                if profile.down:
+                    # Hold the connection open without ever answering
+                    await asyncio.sleep(3600)
+                    return
+                delay = profile.latency + (self._rng.uniform(-profile.jitter, profile.jitter) if profile.jitter else 0)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                if profile.failure_rate and self._rng.random() < profile.failure_rate:
+                    # Abortive close: the client sees a connection reset
+                    sock = writer.get_extra_info('socket')
+                    if sock is not None:
+                        sock.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack('ii', 1, 0))
+                    writer.transport.abort()
+                    return
+                if profile.error_rate and self._rng.random() < profile.error_rate:
+                    await self._respond(writer, 500, b'Internal error\n')
+                    continue
+
+                status, response_headers, payload = self._handle(state, method, target, headers, body)
+                close = headers.get('connection', '').lower() == 'close'
+                await self._respond(writer, status, payload, response_headers, close)
+                if close:
+                    return
+        except (ConnectionError, asyncio.IncompleteReadError, ssl.SSLError):
+            pass
+        except asyncio.CancelledError:
+            # Simulator stopping
+            pass
+        finally:
+            try:
+                writer.close()
+            except Exception:
+                pass
+
+    def _handle(self, state, method: str, target: str, headers: Dict[str, str], body: bytes):
+        """Build the response to one request: (status, headers, body)."""
+        if 'redirect_to' in state:
+            return 301, {'Location': state['redirect_to'].rstrip('/') + target}, b''
+
+        path = target.split('?', 1)[0]
+        profile = state['profile']
+        cookies = dict(part.strip().split('=', 1) for part in headers.get('cookie', '').split(';') if '=' in part)
+        logged_in = not profile.login or cookies.get('SID') in state['sessions']
+        uptime = int(time.time() - self.started_at)
+
+        if path == '/style.css':
+            return 200, {'Content-Type': 'text/css', 'Cache-Control': 'max-age=86400'}, _STYLESHEET.encode()
+        if path == '/login' and method == 'POST':
+            form = dict(part.split('=', 1) for part in body.decode('utf-8', 'replace').split('&') if '=' in part)
+            if form.get('username') == USERNAME and form.get('password') == PASSWORD:
+                session_id = '%016x' % self._rng.getrandbits(64)
+                state['sessions'].add(session_id)
+                return 302, {'Location': '/', 'Set-Cookie': f'SID={session_id}; Path=/; HttpOnly'}, b''
+            return 200, {'Content-Type': 'text/html'}, _LOGIN_PAGE.format(name=state['name']).encode()
+        if path in ('/', '/index.html'):
+            if not logged_in:
+                return 200, {'Content-Type': 'text/html'}, _LOGIN_PAGE.format(name=state['name']).encode()
+            page = _CONSOLE_PAGE.format(name=state['name'], ports=state['ports'], uptime=uptime)
+            return 200, {'Content-Type': 'text/html'}, page.encode()
+        if path == '/sysinfo.htm':
+            # Unchanged since start: answers conditional requests with 304
+            validators = {'ETag': '"%08x"' % zlib.crc32(state['sysinfo']),
+                          'Last-Modified': formatdate(self.started_at, usegmt=True)}
+            if (headers.get('if-none-match') == validators['ETag']
+                    or ('if-none-match' not in headers
+                        and headers.get('if-modified-since') == validators['Last-Modified'])):
+                return 304, validators, b''
+            return 200, dict(validators, **{'Content-Type': 'text/html'}), state['sysinfo']
+        if path == '/config.cfg':
+            lines = [f"hostname {state['name']}", f"! uptime {uptime}"]
+            lines += [f"interface {port}\n  description port-{port}\n  no shutdown"
+                      for port in range(1, state['ports'] + 1)]
+            return 200, {'Content-Type': 'text/plain'}, ('\n'.join(lines) + '\n').encode()
+        if path == '/counters.json':
+            # Counters grow with uptime, at a per-port rate
+            ports = [{'port': port, 'in_octets': uptime * 1000 * port, 'out_octets': uptime * 800 * port,
+                      'in_errors': uptime // 600, 'out_errors': 0}
+                     for port in range(1, state['ports'] + 1)]
+            return 200, {'Content-Type': 'application/json'}, json.dumps({'ports': ports}).encode()
+        return 404, {'Content-Type': 'text/plain'}, b'Not found\n'
+
+    @staticmethod
+    async def _respond(writer, status: int, body: bytes, headers: Optional[Dict[str, str]] = None,
+                       close: bool = False):
+        lines = [f"HTTP/1.1 {status} {_REASONS.get(status, 'OK')}", f"Content-Length: {len(body)}",
+                 'Server: yap-fleet-sim']
+        if close:
+            lines.append('Connection: close')
+        lines += [f"{key}: {value}" for key, value in (headers or {}).items()]
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body)
+        await writer.drain()
+
+    def write_inventory(self, storage) -> int:
+        """
+        Save the simulated switches into a SwitchStorage.
+
+        Args:
+            storage: SwitchStorage to write the fleet into
+
+        Returns:
+            Number of switches written
+        """
+        entries = {switch.name: {'url': switch.url} for switch in self.switches}
+        storage.apply_changes(entries, [])
+        return len(entries)
+
+
+def main(argv=None):
+    """Run a simulated fleet until interrupted."""
+    import argparse
+    from switch_storage import SwitchStorage
+
+    parser = argparse.ArgumentParser(description="Serve a fleet of simulated switch web consoles")
+    parser.add_argument("--switches", type=int, default=1000, help="number of simulated switches")
+    parser.add_argument("--latency", type=float, default=20.0, help="mean response latency in ms")
+    parser.add_argument("--jitter", type=float, default=10.0, help="latency jitter in ms (+/-)")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="share of requests reset")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with HTTP 500")
+    parser.add_argument("--down-rate", type=float, default=0.0, help="share of switches that never answer")
+    parser.add_argument("--tls-rate", type=float, default=0.0, help="share of switches served over HTTPS")
+    parser.add_argument("--redirect-rate", type=float, default=0.0, help="share of switches redirecting HTTP to HTTPS")
+    parser.add_argument("--login-rate", type=float, default=0.0, help="share of switches with a login form")
+    parser.add_argument("--base-address", default=None,
+                        help="give each switch its own loopback address starting here (e.g. 127.1.0.1)")
+    parser.add_argument("--port", type=int, default=8080, help="port used with --base-address")
+    parser.add_argument("--seed", type=int, default=1, help="seed for assigning behaviour")
+    parser.add_argument("--inventory", default=None, help="write the fleet into this switches.json")
+    parser.add_argument("--cert-dir", default=None,
+                        help="keep the HTTPS certificate here between runs (default: temporary)")
+    args = parser.parse_args(argv)
+
+    simulator = FleetSimulator(args.switches, latency=args.latency / 1000, jitter=args.jitter / 1000,
+                               failure_rate=args.failure_rate, error_rate=args.error_rate,
+                               down_rate=args.down_rate, tls_rate=args.tls_rate,
+                               redirect_rate=args.redirect_rate, login_rate=args.login_rate,
+                               base_address=args.base_address, port=args.port, seed=args.seed,
+                               cert_dir=args.cert_dir)
+    started = time.monotonic()
+    try:
+        switches = simulator.start()
+    except Exception as e:
+        print(f"Error starting fleet simulator: {e}")
+        return 1
+    print(f"Serving {len(switches)} simulated switch(es) in {time.monotonic() - started:.1f}s")
+    if args.inventory:
+        count = simulator.write_inventory(SwitchStorage(args.inventory))
+        print(f"Wrote {count} switch(es) to {args.inventory}")
+    if simulator.cert_file:
+        print(f"HTTPS switches use a self-signed certificate; to trust it: "
+              f"export REQUESTS_CA_BUNDLE={simulator.cert_file}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        simulator.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
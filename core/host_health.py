@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Host health - per-host adaptive probe timeouts and a circuit breaker.
+
+Response times of every host are tracked the way TCP does (RFC 6298): a
+smoothed RTT and its variance give the timeout for the next probe, so a
+switch on a slow WAN link gets a longer timeout than one on the local
+segment. A timeout doubles the host's next timeout (up to a cap), and after
+a few consecutive failures the host's circuit opens: probes are answered
+"down" immediately until a cooldown has passed, then a single trial probe
+decides whether the circuit closes again or the cooldown grows.
+"""
+import threading
+import time
+from typing import Dict, Optional
+
+# RFC 6298 smoothing factors and clock granularity
+ALPHA = 0.125
+BETA = 0.25
+GRANULARITY = 0.1
+
+
+class _HostState:
+    """Timing and failure state of one host."""
+
+    __slots__ = ('srtt', 'rttvar', 'rto', 'failures', 'open_until', 'trial_started')
+
+    def __init__(self, rto: float):
+        self.srtt = None
+        self.rttvar = None
+        self.rto = rto
+        self.failures = 0
+        self.open_until = 0.0
+        self.trial_started = 0.0
+
+
+class HostHealth:
+    """Thread-safe registry of per-host timeouts and circuit breakers."""
+
+    def __init__(self, initial_timeout: float = 1.5, min_timeout: float = 0.5,
+                 max_timeout: float = 10.0, failure_threshold: int = 3,
+                 cooldown: float = 30.0, max_cooldown: float = 300.0):
+        """
+        Initialize the registry.
+
+        Args:
+            initial_timeout: Timeout for hosts without RTT samples
+            min_timeout: Lower bound of the adaptive timeout
+            max_timeout: Upper bound of the adaptive timeout
+            failure_threshold: Consecutive failures that open a host's circuit
+            cooldown: Seconds an opened circuit stays open
+            max_cooldown: Cap for the cooldown, which doubles on every failed trial
+        """
+        self.initial_timeout = initial_timeout
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self._lock = threading.Lock()
+        self._hosts = {}
+
+    def _state(self, host: str) -> _HostState:
+        state = self._hosts.get(host)
+        if state is None:
+            state = self._hosts[host] = _HostState(self.initial_timeout)
+        return state
+
+    def timeout(self, host: str) -> float:
+        """
+        Get the timeout for the next probe of a host.
+
+        Args:
+            host: Host (netloc of the switch URL)
+
+        Returns:
+            Timeout in seconds
+        """
+        with self._lock:
+            state = self._hosts.get(host)
+            return state.rto if state is not None else self.initial_timeout
+
+    def allow(self, host: str) -> bool:
+        """
+        Check whether a host may be probed now.
+
+        While the circuit is open this returns False. Once the cooldown has
+        passed, exactly one caller gets True (the trial probe) until its
+        outcome is recorded.
+
+        Args:
+            host: Host (netloc of the switch URL)
+
+        Returns:
+            True if the probe should be sent
+        """
+        now = time.monotonic()
+        with self._lock:
+            state = self._hosts.get(host)
+            if state is None or state.failures < self.failure_threshold:
+                return True
+            if now < state.open_until:
+                return False
+            # Half-open: one trial at a time (a lost trial expires after max_timeout)
+            if state.trial_started and now - state.trial_started < 2 * self.max_timeout:
+                return False
+            state.trial_started = now
+            return True
+
+    def is_open(self, host: str) -> bool:
+        """Check whether a host's circuit is currently open."""
+        with self._lock:
+            state = self._hosts.get(host)
+            return (state is not None and state.failures >= self.failure_threshold
+                    and time.monotonic() < state.open_until)
+
+    def record_success(self, host: str, rtt: float):
+        """
+        Record a response from a host (any HTTP status counts: the host is alive).
+
+        Args:
+            host: Host (netloc of the switch URL)
+            rtt: Seconds until the response headers arrived
+        """
+        with self._lock:
+            state = self._state(host)
+            if state.srtt is None:
+                state.srtt = rtt
+                state.rttvar = rtt / 2
+            else:
+                state.rttvar = (1 - BETA) * state.rttvar + BETA * abs(state.srtt - rtt)
+                state.srtt = (1 - ALPHA) * state.srtt + ALPHA * rtt
+            rto = state.srtt + max(GRANULARITY, 4 * state.rttvar)
+            state.rto = min(self.max_timeout, max(self.min_timeout, rto))
+            state.failures = 0
+            state.open_until = 0.0
+            state.trial_started = 0.0
+
+    def record_failure(self, host: str):
+        """
+        Record a probe that got no response (timeout or connection error).
+
+        Args:
+            host: Host (netloc of the switch URL)
+        """
+        with self._lock:
+            state = self._state(host)
+            # Back off like a TCP retransmission timer
+            state.rto = min(self.max_timeout, state.rto * 2)
+            state.failures += 1
+            state.trial_started = 0.0
+            if state.failures >= self.failure_threshold:
+                extra = state.failures - self.failure_threshold
+                state.open_until = time.monotonic() + min(self.max_cooldown, self.cooldown * (2 ** min(extra, 16)))
+
+    def export(self, hosts=None) -> Dict[str, list]:
+        """
+        Export host states, e.g. to hand them to a probe worker process.
+
+        Args:
+            hosts: Hosts to export (defaults to all)
+
+        Returns:
+            Dictionary mapping hosts to [srtt, rttvar, rto, failures, seconds the circuit stays open]
+        """
+        now = time.monotonic()
+        with self._lock:
+            names = self._hosts.keys() if hosts is None else [h for h in hosts if h in self._hosts]
+            return {host: [self._hosts[host].srtt, self._hosts[host].rttvar, self._hosts[host].rto,
+                           self._hosts[host].failures, max(0.0, self._hosts[host].open_until - now)]
+                    for host in names}
+
+    def update(self, exported: Optional[Dict[str, list]]):
+        """
+        Load host states produced by export() (in this or another process).
+
+        Args:
+            exported: Result of export()
+        """
+        if not exported:
+            return
+        now = time.monotonic()
+        with self._lock:
+            for host, (srtt, rttvar, rto, failures, open_for) in exported.items():
+                state = self._state(host)
+                state.srtt = srtt
+                state.rttvar = rttvar
+                state.rto = rto
+                state.failures = failures
+                state.open_until = now + open_for if open_for else 0.0
+                state.trial_started = 0.0
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+HTTP session factory - the requests settings shared by everything that talks to switches.
+"""
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from tls_sessions import TLSAdapter, TLSSessionCache
+
+# Try to import Retry - handle different urllib3 versions
+try:
+    from urllib3.util.retry import Retry
+except ImportError:
+    try:
+        from requests.packages.urllib3.util.retry import Retry
+    except ImportError:
+        # Fallback: define a simple retry strategy
+        Retry = None
+
+
+def create_session(retries: int = 1, pool_maxsize: int = 10,
+                   tls: Optional[TLSSessionCache] = None) -> requests.Session:
+    """
+    Create a requests session tuned for slow embedded switch web servers.
+
+    Args:
+        retries: Automatic retries for connection errors and 429/5xx responses; once
+            they are used up (or with 0), the last 429/5xx is returned as the response
+        pool_maxsize: Connections kept per host
+        tls: Optional TLSSessionCache for resumed handshakes and pinned certificates
+
+    Returns:
+        Configured session
+    """
+    session = requests.Session()
+    if Retry is not None:
+        # Without retries a 429/5xx must come back as a response (not a
+        # RetryError), so callers can read Retry-After and tell a live but
+        # struggling switch from an unreachable one
+        retry_strategy = Retry(
+            total=retries,
+            backoff_factor=0.1,
+            status_forcelist=[429, 500, 502, 503, 504] if retries > 0 else [],
+            raise_on_status=False,
+        )
+        options = {'max_retries': retry_strategy, 'pool_maxsize': pool_maxsize}
+    else:
+        options = {'pool_maxsize': pool_maxsize}
+    adapter = HTTPAdapter(**options)
+    session.mount("http://", adapter)
+    session.mount("https://", TLSAdapter(tls, **options) if tls is not None else adapter)
+    return session
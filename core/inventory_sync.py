@@ -0,0 +1,622 @@
+#!/usr/bin/env python3
+"""
+Inventory sync - shares switch inventories across a team, exchanging only changed entries.
+
+A small sync server keeps the team inventory as a change log: every accepted
+entry change gets the next global sequence number, so a client asks for
+"everything after N" and receives only the entries changed since its last
+pull. Clients long-poll that endpoint, so connected GUIs are pushed changes
+within a moment of them being made.
+
+Every entry carries a version stamp [counter, origin]: a Lamport counter and
+the id of the client that made the change. The higher stamp wins, compared
+the same way on the server and on every client, so concurrent edits resolve
+to the same entry everywhere regardless of the order they arrive in. Deleted
+entries are kept as tombstones so clients that were offline learn about them.
+
+The client side keeps its stamps, sequence number and an entry digest per
+switch in a small state file next to switches.json, so local changes are
+found by comparing digests and only those entries are pushed.
+"""
+import gzip
+import hashlib
+import hmac
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional, Set, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from http_session import create_session
+from switch_storage import write_atomic
+
+
+DEFAULT_PORT = 8766
+
+# Header carrying the shared secret between sync clients and the server
+TOKEN_HEADER = 'X-Sync-Token'
+
+# Longest a pull waits for changes on the server (seconds)
+MAX_WAIT = 60.0
+
+
+def _digest(entry: Optional[Dict]) -> Optional[str]:
+    """Short digest of an entry (None for a deleted one)."""
+    if entry is None:
+        return None
+    data = json.dumps(entry, sort_keys=True, separators=(',', ':')).encode('utf-8')
+    return hashlib.sha1(data).hexdigest()[:16]
+
+
+class SyncServer:
+    """Change log of the team inventory with last-writer-wins entries."""
+
+    def __init__(self, journal_file: Optional[str] = None, token: Optional[str] = None):
+        """
+        Initialize the server.
+
+        Args:
+            journal_file: Append-only file the change log is kept in (None keeps it in memory only)
+            token: Shared secret required from clients (None disables the check)
+        """
+        self.journal_file = journal_file
+        self.token = token
+        self.server = None
+        self.epoch = uuid.uuid4().hex
+        self._seq = 0
+        # name -> [seq, counter, origin, data or None], ordered by seq
+        self._entries = OrderedDict()
+        self._journal_lines = 0
+        self._cond = threading.Condition()
+        if journal_file:
+            self._load_journal()
+
+    def authorized(self, headers) -> bool:
+        """Check the shared secret of a request."""
+        if not self.token:
+            return True
+        return hmac.compare_digest(headers.get(TOKEN_HEADER, ''), self.token)
+
+    def _load_journal(self):
+        """Replay the journal (a torn last line from a crash is ignored)."""
+        try:
+            with open(self.journal_file, 'r') as f:
+                lines = f.readlines()
+        except OSError:
+            lines = []
+        if lines:
+            try:
+                self.epoch = json.loads(lines[0])['epoch']
+                for line in lines[1:]:
+                    seq, name, counter, origin, data = json.loads(line)
+                    self._entries.pop(name, None)
+                    self._entries[name] = [seq, counter, origin, data]
+                    self._seq = max(self._seq, seq)
+                    self._journal_lines += 1
+            except (KeyError, TypeError, ValueError) as e:
+                print(f"Sync journal truncated at a damaged line: {e}")
+        self._compact()
+
+    def _compact(self):
+        """Rewrite the journal with only the latest record of every entry."""
+        lines = [json.dumps({'epoch': self.epoch})]
+        lines += [json.dumps([record[0], name] + record[1:], separators=(',', ':'))
+                  for name, record in self._entries.items()]
+        write_atomic(self.journal_file, '\n'.join(lines) + '\n')
+        self._journal_lines = len(self._entries)
+
+    def _append_journal(self, records):
+        """Append accepted changes to the journal (caller holds the lock)."""
+        if not self.journal_file or not records:
+            return
+        if self._journal_lines + len(records) > 2 * len(self._entries) + 1000:
+            self._compact()
+            return
+        with open(self.journal_file, 'a') as f:
+            for name, record in records:
+                f.write(json.dumps([record[0], name] + record[1:], separators=(',', ':')) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        self._journal_lines += len(records)
+
+    def push(self, changes: Dict[str, Dict]) -> Tuple[int, Dict[str, Dict]]:
+        """
+        Apply entry changes sent by a client.
+
+        Args:
+            changes: {name: {'stamp': [counter, origin], 'data': entry or None}}
+
+        Returns:
+            Tuple of (current sequence number, {name: winning change} for every
+            change that lost against a newer stamp)
+        """
+        parsed = []
+        for name, change in changes.items():
+            data = change.get('data')
+            if data is not None and not isinstance(data, dict):
+                raise ValueError(f"Invalid entry for {name}")
+            parsed.append((str(name), int(change['stamp'][0]), str(change['stamp'][1]), data))
+
+        rejected = {}
+        accepted = []
+        with self._cond:
+            for name, counter, origin, data in parsed:
+                current = self._entries.get(name)
+                if current is not None and (current[1], current[2]) >= (counter, origin):
+                    rejected[name] = {'stamp': current[1:3], 'data': current[3]}
+                    continue
+                self._seq += 1
+                record = [self._seq, counter, origin, data]
+                self._entries.pop(name, None)
+                self._entries[name] = record
+                accepted.append((name, record))
+            self._append_journal(accepted)
+            if accepted:
+                self._cond.notify_all()
+            return self._seq, rejected
+
+    def changes(self, since: int = 0, epoch: Optional[str] = None, wait: float = 0.0,
+                origin: Optional[str] = None) -> Dict:
+        """
+        Get the entries changed after a sequence number.
+
+        Args:
+            since: Sequence number of the client's previous pull
+            epoch: Epoch of that pull; a different one gets the whole inventory
+            wait: Seconds to wait for a change if there is none yet
+            origin: Client id; its own changes are left out
+
+        Returns:
+            Dict with 'epoch', 'seq', 'full' and 'changes'
+            ({name: {'stamp': [counter, origin], 'data': entry or None}})
+        """
+        with self._cond:
+            full = epoch != self.epoch or since > self._seq
+            if full:
+                since = 0
+            elif wait > 0:
+                self._cond.wait_for(lambda: self._seq > since, timeout=min(wait, MAX_WAIT))
+            # Entries are ordered by seq: walk back from the newest to the first already seen
+            changed = []
+            for name in reversed(self._entries):
+                record = self._entries[name]
+                if record[0] <= since:
+                    break
+                if record[2] != origin or full:
+                    changed.append((name, {'stamp': record[1:3], 'data': record[3]}))
+            changed.reverse()
+            return {'epoch': self.epoch, 'seq': self._seq, 'full': full, 'changes': dict(changed)}
+
+    def start(self, host: str = '0.0.0.0', port: int = DEFAULT_PORT):
+        """Serve the sync API in a background thread."""
+        handler = type('SyncHandler', (_SyncHandler,), {'sync_server': self})
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        """Stop serving."""
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+
+class _SyncHandler(BaseHTTPRequestHandler):
+    """HTTP front end of a SyncServer (bound via a subclass attribute)."""
+
+    sync_server = None
+
+    def _reply(self, status: int, payload: Optional[Dict] = None):
+        body = json.dumps(payload or {}, separators=(',', ':')).encode('utf-8')
+        gzipped = len(body) > 1024 and 'gzip' in self.headers.get('Accept-Encoding', '')
+        if gzipped:
+            body = gzip.compress(body)
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        if gzipped:
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        if not self.sync_server.authorized(self.headers):
+            self._reply(403, {'error': 'forbidden'})
+            return
+        if urlparse(self.path).path != '/v1/push':
+            self._reply(404, {'error': 'not found'})
+            return
+        try:
+            body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            if self.headers.get('Content-Encoding') == 'gzip':
+                body = gzip.decompress(body)
+            seq, rejected = self.sync_server.push(json.loads(body)['changes'])
+        except (KeyError, IndexError, TypeError, ValueError, OSError) as e:
+            self._reply(400, {'error': str(e)})
+            return
+        self._reply(200, {'epoch': self.sync_server.epoch, 'seq': seq, 'rejected': rejected})
+
+    def do_GET(self):
+        if not self.sync_server.authorized(self.headers):
+            self._reply(403, {'error': 'forbidden'})
+            return
+        parsed = urlparse(self.path)
+        if parsed.path != '/v1/changes':
+            self._reply(404, {'error': 'not found'})
+            return
+        query = parse_qs(parsed.query)
+        try:
+            since = int(query.get('since', ['0'])[0])
+            wait = float(query.get('wait', ['0'])[0])
+        except ValueError:
+            self._reply(400, {'error': 'invalid since or wait'})
+            return
+        epoch = query.get('epoch', [None])[0]
+        origin = query.get('origin', [None])[0]
+        self._reply(200, self.sync_server.changes(since, epoch, wait, origin))
+
+    def log_message(self, format, *args):
+        pass
+
+
+class SyncClient:
+    """Keeps a SwitchStorage in sync with a sync server."""
+
+    def __init__(self, storage, server_url: str, token: Optional[str] = None,
+                 state_file: Optional[str] = None, wait: float = 25.0, timeout: float = 10.0):
+        """
+        Initialize the client.
+
+        Args:
+            storage: SwitchStorage to keep in sync
+            server_url: Base URL of the sync server (e.g. http://nms:8766/)
+            token: Shared secret
+            state_file: Sync state file. If None, uses the storage file plus '.sync'.
+            wait: Seconds a pull waits on the server for changes (long poll)
+            timeout: Request timeout in seconds, on top of the wait
+        """
+        self.storage = storage
+        self.push_url = server_url.rstrip('/') + '/v1/push'
+        self.changes_url = server_url.rstrip('/') + '/v1/changes'
+        self.headers = {TOKEN_HEADER: token} if token else {}
+        self.state_file = state_file or storage.storage_file + '.sync'
+        self.wait = wait
+        self.timeout = timeout
+        self.session = create_session(retries=0, pool_maxsize=2)
+        self._lock = threading.RLock()
+        self._pending = set()
+        self._push_event = threading.Event()
+        self._stop = threading.Event()
+        self._threads = []
+        self._callback = None
+        self._load_state()
+
+    def _load_state(self):
+        """Read the sync state, starting fresh if there is none."""
+        try:
+            with open(self.state_file, 'r') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            state = {}
+        self.origin = state.get('origin') or uuid.uuid4().hex[:12]
+        self.epoch = state.get('epoch')
+        self.since = int(state.get('since', 0))
+        self.clock = int(state.get('clock', 0))
+        # name -> [counter, origin, digest] (digest None for deleted entries)
+        self.stamps = state.get('stamps') or {}
+        self._pending = set(state.get('pending') or [])
+
+    def _save_state(self):
+        """Write the sync state (caller holds the lock)."""
+        state = {
+            'origin': self.origin,
+            'epoch': self.epoch,
+            'since': self.since,
+            'clock': self.clock,
+            'stamps': self.stamps,
+            'pending': sorted(self._pending),
+        }
+        try:
+            write_atomic(self.state_file, json.dumps(state, separators=(',', ':')))
+        except Exception as e:
+            print(f"Error saving sync state: {e}")
+
+    def note_local_changes(self, names, entries: Optional[Dict[str, Dict]] = None) -> int:
+        """
+        Stamp entries that differ from their last synced version and queue them for pushing.
+
+        Args:
+            names: Switch names that may have changed locally
+            entries: Current entries, if already loaded (otherwise read from storage)
+
+        Returns:
+            Number of entries queued
+        """
+        queued = 0
+        with self._lock:
+            for name in names:
+                entry = entries.get(name) if entries is not None else self.storage.get_switch(name)
+                digest = _digest(entry)
+                stamp = self.stamps.get(name)
+                if (stamp[2] if stamp else None) == digest:
+                    continue
+                self.clock += 1
+                self.stamps[name] = [self.clock, self.origin, digest]
+                self._pending.add(name)
+                queued += 1
+            if queued:
+                self._save_state()
+        if queued:
+            self._push_event.set()
+        return queued
+
+    def scan(self) -> int:
+        """
+        Compare the whole inventory with the sync state (at startup).
+
+        Returns:
+            Number of local changes found
+        """
+        entries = self.storage.load_switches()
+        with self._lock:
+            names = set(entries) | {name for name, stamp in self.stamps.items() if stamp[2] is not None}
+        return self.note_local_changes(names, entries)
+
+    def push(self) -> bool:
+        """
+        Send the queued local changes.
+
+        Returns:
+            True if the server answered
+        """
+        entries = {}
+        with self._lock:
+            if not self._pending:
+                return True
+            sent = {name: list(self.stamps[name][:2]) for name in self._pending}
+        for name in sent:
+            entries[name] = self.storage.get_switch(name)
+        payload = {'changes': {name: {'stamp': stamp, 'data': entries[name]} for name, stamp in sent.items()}}
+        body = gzip.compress(json.dumps(payload, separators=(',', ':')).encode('utf-8'))
+        headers = dict(self.headers, **{'Content-Type': 'application/json', 'Content-Encoding': 'gzip'})
+        response = self.session.post(self.push_url, data=body, headers=headers, timeout=self.timeout)
+        response.raise_for_status()
+        data = response.json()
+
+        with self._lock:
+            for name, stamp in sent.items():
+                # Changed again while the push was in flight: keep it queued
+                if self.stamps.get(name, [None, None])[:2] == stamp:
+                    self._pending.discard(name)
+            self._save_state()
+        if data.get('rejected'):
+            # Someone else's newer change won: take it over
+            self._apply_remote(data['rejected'])
+        return True
+
+    def pull(self, wait: float = 0.0) -> bool:
+        """
+        Fetch and apply the changes made by others since the last pull.
+
+        Args:
+            wait: Seconds to wait on the server if nothing changed yet
+
+        Returns:
+            True if anything was applied locally
+        """
+        params = {'since': self.since, 'wait': wait, 'origin': self.origin}
+        if self.epoch:
+            params['epoch'] = self.epoch
+        response = self.session.get(self.changes_url, params=params, headers=self.headers,
+                                    timeout=self.timeout + wait)
+        response.raise_for_status()
+        data = response.json()
+
+        with self._lock:
+            if data['full']:
+                # New or reset server: everything we have must be offered again
+                # (entries the server already knows just lose or tie on the stamp)
+                self._pending |= {name for name, stamp in self.stamps.items()}
+            applied = self._apply_remote(data['changes'], save=False)
+            self.epoch = data['epoch']
+            self.since = data['seq']
+            self._save_state()
+        if self._pending:
+            self._push_event.set()
+        return applied
+
+    def _apply_remote(self, changes: Dict[str, Dict], save: bool = True) -> bool:
+        """Write the remote changes that win against the local stamps into the storage."""
+        updated = {}
+        removed = []
+        # Digest each winning entry's local version had when its stamps were compared
+        previous = {}
+        conflicts = set()
+
+        def unchanged(name, current):
+            # A local edit saved since then is newer than the remote change: keep it
+            if _digest(current) == previous[name]:
+                return True
+            conflicts.add(name)
+            return False
+
+        with self._lock:
+            for name, change in changes.items():
+                counter, origin = int(change['stamp'][0]), str(change['stamp'][1])
+                self.clock = max(self.clock, counter)
+                local = self.stamps.get(name)
+                if local is not None and (local[0], local[1]) >= (counter, origin):
+                    if (local[0], local[1]) == (counter, origin):
+                        self._pending.discard(name)
+                    continue
+                data = change.get('data')
+                entry = dict(data, name=name) if data is not None else None
+                previous[name] = local[2] if local is not None else None
+                self.stamps[name] = [counter, origin, _digest(entry)]
+                self._pending.discard(name)
+                if entry is None:
+                    removed.append(name)
+                else:
+                    updated[name] = entry
+
+            # Recorded digests match, so the storage listener sees no local change.
+            # The digests are compared again under the storage lock, so a local
+            # save racing this write is not overwritten
+            applied = bool(updated or removed) and self.storage.apply_changes(updated, removed, unchanged)
+            if conflicts:
+                # Stamped after the remote change, so the local edit wins everywhere
+                self.note_local_changes(conflicts)
+            if save:
+                self._save_state()
+        if applied and self._callback:
+            try:
+                self._callback(set(updated) - conflicts, set(removed) - conflicts)
+            except Exception as e:
+                print(f"Sync callback error: {e}")
+        return applied
+
+    def run_once(self) -> bool:
+        """
+        Push local changes and pull remote ones once.
+
+        Returns:
+            True if anything was applied locally
+        """
+        self.scan()
+        self.push()
+        applied = self.pull()
+        # A reset server asks for everything again
+        self.push()
+        return applied
+
+    def start(self, callback: Optional[Callable[[Set[str], Set[str]], None]] = None):
+        """
+        Keep the storage in sync in the background.
+
+        Also takes over SwitchStorage.watch(): changes by other processes are
+        pushed and, like remote changes, reported to callback.
+
+        Args:
+            callback: Called from a background thread with (changed, removed) names
+        """
+        if self._threads:
+            return
+        self._callback = callback
+        self._stop.clear()
+        self.storage.add_listener(self._on_local_write)
+        self.storage.watch(self._on_external_change)
+        self.scan()
+        self._threads = [threading.Thread(target=self._push_loop, daemon=True),
+                         threading.Thread(target=self._pull_loop, daemon=True)]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        """Stop syncing."""
+        self._stop.set()
+        self._push_event.set()
+        self.storage.remove_listener(self._on_local_write)
+        self.storage.stop_watching()
+        self._threads = []
+
+    def _on_local_write(self, changed, removed):
+        """Storage listener: this process saved or deleted switches."""
+        self.note_local_changes(set(changed) | set(removed))
+
+    def _on_external_change(self, changed, removed):
+        """Storage watch: another process changed the file."""
+        self.note_local_changes(set(changed) | set(removed))
+        if self._callback:
+            self._callback(changed, removed)
+
+    def _push_loop(self):
+        delay = 1.0
+        while not self._stop.is_set():
+            self._push_event.wait(30.0)
+            self._push_event.clear()
+            if self._stop.is_set():
+                break
+            try:
+                self.push()
+                delay = 1.0
+            except Exception as e:
+                print(f"Error pushing switch changes: {e}")
+                self._push_event.set()
+                self._stop.wait(delay)
+                delay = min(60.0, delay * 2)
+
+    def _pull_loop(self):
+        delay = 1.0
+        while not self._stop.is_set():
+            try:
+                self.pull(self.wait)
+                delay = 1.0
+            except Exception as e:
+                print(f"Error pulling switch changes: {e}")
+                self._stop.wait(delay)
+                delay = min(60.0, delay * 2)
+
+
+def main(argv=None):
+    """Run the sync server or a headless sync client."""
+    import argparse
+    from switch_storage import SwitchStorage, get_config_dir
+
+    parser = argparse.ArgumentParser(description="Team inventory sync")
+    subparsers = parser.add_subparsers(dest="mode")
+    subparsers.required = True
+
+    server_parser = subparsers.add_parser("server", help="serve the team inventory")
+    server_parser.add_argument("--bind", default="0.0.0.0", help="listen address")
+    server_parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="listen port")
+    server_parser.add_argument("--journal", default=os.path.join(get_config_dir(), 'sync-journal.jsonl'),
+                               help="change log file")
+
+    client_parser = subparsers.add_parser("client", help="sync a switches.json with a server")
+    client_parser.add_argument("--server", required=True, help="sync server URL, e.g. http://nms:8766/")
+    client_parser.add_argument("--storage", help="switches.json to sync")
+    client_parser.add_argument("--once", action="store_true", help="sync once, then exit")
+
+    args = parser.parse_args(argv)
+    # The shared secret comes from the environment so it never shows up in ps
+    token = os.environ.get('YAP_SYNC_TOKEN') or None
+
+    if args.mode == "server":
+        server = SyncServer(args.journal, token=token)
+        server.start(args.bind, args.port)
+        print(f"Sync server listening on {args.bind}:{args.port}")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            server.stop()
+        return 0
+
+    client = SyncClient(SwitchStorage(args.storage), args.server, token=token)
+    if args.once:
+        try:
+            client.run_once()
+            return 0
+        except Exception as e:
+            print(f"Error syncing switches: {e}")
+            return 1
+
+    def report(changed, removed):
+        print(f"Synced: {len(changed)} changed, {len(removed)} removed")
+
+    client.start(report)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        client.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
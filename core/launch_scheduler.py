@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Launch scheduler - opens many switch consoles without forking them all at once.
+"""
+import threading
+import time
+from collections import namedtuple
+from typing import Callable, Iterable, Optional
+
+
+# Outcome of one console launch.
+#   status: 'opened', 'timeout', 'failed' or 'skipped' (already open; brought to the front)
+#   seconds: time from spawn to first page load, or None
+LaunchResult = namedtuple('LaunchResult', ['name', 'status', 'seconds', 'error'])
+
+
+class LaunchScheduler:
+    """Opens consoles for several switches with a cap on concurrent spawns."""
+
+    def __init__(self, max_concurrent: int = 3, stagger: float = 0.5, ready_timeout: float = 30.0):
+        """
+        Initialize the scheduler.
+
+        Args:
+            max_concurrent: Maximum number of consoles starting up at the same time
+            stagger: Minimum delay in seconds between two process spawns
+            ready_timeout: Seconds to wait for a console to load before giving up on it
+        """
+        self.max_concurrent = max(1, int(max_concurrent))
+        self.stagger = max(0.0, float(stagger))
+        self.ready_timeout = ready_timeout
+        self._slots = threading.BoundedSemaphore(self.max_concurrent)
+        self._last_spawn = 0.0
+        self._cancelled = threading.Event()
+
+    def open_all(self, managers: Iterable, on_result: Optional[Callable] = None,
+                 on_done: Optional[Callable] = None) -> threading.Thread:
+        """
+        Open consoles for all managers in the background.
+
+        Args:
+            managers: SwitchManager instances to open, in launch order
+            on_result: Called with a LaunchResult as each console finishes starting
+            on_done: Called with the list of all LaunchResults when the batch ends
+
+        Returns:
+            The scheduler thread
+        """
+        managers = list(managers)
+        # Queued managers are not idle (see SwitchManager.is_idle) until the batch has spawned them
+        for manager in managers:
+            manager.launch_pending = True
+        self._cancelled.clear()
+        thread = threading.Thread(
+            target=self._run, args=(managers, on_result, on_done), daemon=True
+        )
+        thread.start()
+        return thread
+
+    def cancel(self):
+        """Stop launching consoles that have not been spawned yet."""
+        self._cancelled.set()
+
+    def _run(self, managers, on_result, on_done):
+        """Spawn consoles one by one, respecting the concurrency cap and stagger."""
+        results = []
+        lock = threading.Lock()
+        waiters = []
+
+        def report(result):
+            with lock:
+                results.append(result)
+            if on_result:
+                try:
+                    on_result(result)
+                except Exception as e:
+                    print(f"Launch callback error: {e}")
+
+        for manager in managers:
+            if self._cancelled.is_set():
+                break
+
+            # Switches whose console window is still running are only brought to the front
+            if manager.is_console_open():
+                manager.focus_console()
+                report(LaunchResult(manager.switch_name, 'skipped', None, None))
+                continue
+
+            self._slots.acquire()
+            if self._cancelled.is_set():
+                self._slots.release()
+                break
+
+            # Keep a minimum gap between spawns so start-up work is spread out
+            delay = self._last_spawn + self.stagger - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            self._last_spawn = time.monotonic()
+
+            try:
+                manager.open_console(skip_check=True)
+            except Exception as e:
+                self._slots.release()
+                report(LaunchResult(manager.switch_name, 'failed', None, str(e)))
+                continue
+
+            waiter = threading.Thread(target=self._wait_ready, args=(manager, report), daemon=True)
+            waiter.start()
+            waiters.append(waiter)
+
+        # Spawned, failed, or left out by cancel()
+        for manager in managers:
+            manager.launch_pending = False
+
+        for waiter in waiters:
+            waiter.join()
+
+        if on_done:
+            try:
+                on_done(results)
+            except Exception as e:
+                print(f"Launch callback error: {e}")
+
+    def _wait_ready(self, manager, report):
+        """Wait for one console to load, then free its launch slot."""
+        try:
+            seconds = manager.wait_until_ready(self.ready_timeout)
+            if seconds is not None:
+                report(LaunchResult(manager.switch_name, 'opened', seconds, None))
+            elif manager.is_console_open():
+                report(LaunchResult(manager.switch_name, 'timeout', None, None))
+            else:
+                report(LaunchResult(manager.switch_name, 'failed', None, 'Console exited before loading'))
+        finally:
+            self._slots.release()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Manager registry - SwitchManager instances created on demand and evicted when idle.
+
+The GUI only needs a full SwitchManager (HTTP session, console process
+handle, launch timing) for switches that are actually being opened or
+tested. The registry keeps a small record per switch in use, holding its
+manager and when it was last used; managers that have been idle for a
+while and have no console open (or queued to open, see LaunchScheduler)
+are closed and dropped again, so clicking through thousands of switches
+does not keep thousands of sessions alive.
+"""
+import threading
+import time
+from typing import Callable, Iterator, Optional, Tuple
+
+
+class _ManagerRecord:
+    """A live manager and when it was last used."""
+
+    __slots__ = ('manager', 'last_used')
+
+    def __init__(self, manager):
+        self.manager = manager
+        self.last_used = time.monotonic()
+
+
+class ManagerRegistry:
+    """Name -> SwitchManager mapping with lazy creation and idle eviction."""
+
+    def __init__(self, factory: Callable[[str, str], object], max_idle: float = 300.0,
+                 max_live: int = 64, sweep_interval: float = 30.0):
+        """
+        Initialize the registry.
+
+        Args:
+            factory: Called as factory(name, url) to create a SwitchManager
+            max_idle: Seconds after which an unused manager without an open console is evicted
+            max_live: Managers kept alive at most (least recently used evicted first)
+            sweep_interval: Minimum seconds between automatic eviction sweeps
+        """
+        self.factory = factory
+        self.max_idle = max_idle
+        self.max_live = max(1, int(max_live))
+        self.sweep_interval = sweep_interval
+        self._lock = threading.RLock()
+        self._records = {}
+        self._last_sweep = time.monotonic()
+
+    def get(self, name: str, url: str):
+        """
+        Get the manager of a switch, creating it if needed.
+
+        Args:
+            name: Switch name
+            url: Switch URL (used when the manager is created)
+
+        Returns:
+            SwitchManager
+        """
+        with self._lock:
+            record = self._records.get(name)
+            if record is None:
+                record = self._records[name] = _ManagerRecord(self.factory(name, url))
+            else:
+                record.last_used = time.monotonic()
+            if len(self._records) > self.max_live or record.last_used - self._last_sweep > self.sweep_interval:
+                self.evict_idle(keep=name)
+            return record.manager
+
+    def peek(self, name: str):
+        """Get the live manager of a switch without creating one (None if there is none)."""
+        with self._lock:
+            record = self._records.get(name)
+            return record.manager if record is not None else None
+
+    def remove(self, name: str, force: bool = False) -> bool:
+        """
+        Close and drop the manager of a switch.
+
+        Args:
+            name: Switch name
+            force: Also drop the manager if its console is still open
+
+        Returns:
+            True if a manager was removed
+        """
+        with self._lock:
+            record = self._records.get(name)
+            if record is None:
+                return False
+            if not force and not record.manager.is_idle():
+                return False
+            del self._records[name]
+            self._close(record.manager)
+            return True
+
+    def evict_idle(self, keep: Optional[str] = None) -> int:
+        """
+        Close managers that are idle (no console open or queued to open).
+
+        Managers idle longer than max_idle go first; if more than max_live
+        are still alive afterwards, the least recently used ones follow.
+
+        Args:
+            keep: Switch whose manager must stay (e.g. the one just requested)
+
+        Returns:
+            Number of managers evicted
+        """
+        now = time.monotonic()
+        evicted = 0
+        with self._lock:
+            self._last_sweep = now
+            candidates = sorted(
+                ((record.last_used, name, record) for name, record in self._records.items() if name != keep),
+                key=lambda item: item[0]
+            )
+            for last_used, name, record in candidates:
+                if len(self._records) <= self.max_live and now - last_used < self.max_idle:
+                    break
+                if not record.manager.is_idle():
+                    continue
+                del self._records[name]
+                self._close(record.manager)
+                evicted += 1
+        return evicted
+
+    @staticmethod
+    def _close(manager):
+        try:
+            manager.close()
+        except Exception as e:
+            print(f"Error closing switch manager: {e}")
+
+    def items(self) -> Iterator[Tuple[str, object]]:
+        """Iterate over (name, manager) pairs."""
+        with self._lock:
+            live = [(name, record.manager) for name, record in self._records.items()]
+        return iter(live)
+
+    def __contains__(self, name: str) -> bool:
+        with self._lock:
+            return name in self._records
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._records)
@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+Port statistics - bulk polling of interface counters across the inventory.
+
+Counters are read with SNMP GETBULK (switches with an 'snmp_community' field)
+or from the switch's HTTP status page ('counters_path', JSON or CSV). Each
+switch's counters live in NumPy arrays, so deltas, 32/64-bit wrap handling
+and rates are computed for all its ports at once, and the busiest ports of
+the whole fleet come out of a single argpartition.
+"""
+import csv
+import io
+import json
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urljoin, urlparse
+
+from http_session import create_session
+from snmp_client import SnmpClient, END_OF_VIEW
+
+# Try to import numpy for vectorized counter math
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+
+# Counters tracked for every port, in array column order
+METRICS = ('in_octets', 'out_octets', 'in_errors', 'out_errors')
+
+# IF-MIB columns for each metric and their counter width in bits
+SNMP_COLUMNS = {
+    'in_octets': ('1.3.6.1.2.1.31.1.1.1.6', 64),    # ifHCInOctets
+    'out_octets': ('1.3.6.1.2.1.31.1.1.1.10', 64),  # ifHCOutOctets
+    'in_errors': ('1.3.6.1.2.1.2.2.1.14', 32),      # ifInErrors
+    'out_errors': ('1.3.6.1.2.1.2.2.1.20', 32),     # ifOutErrors
+}
+
+# One sample: port ids (ifIndex or port number) and a uint64 matrix of
+# shape (ports, len(METRICS)); widths gives each metric's counter width
+CounterSample = namedtuple('CounterSample', ['ports', 'values', 'widths', 'timestamp'])
+
+# A row of the fleet-wide top-N report
+PortRate = namedtuple('PortRate', ['switch', 'port', 'metric', 'rate'])
+
+
+def _require_numpy():
+    if not HAS_NUMPY:
+        raise RuntimeError("Port statistics require numpy (pip install numpy)")
+
+
+class CounterStore:
+    """Latest counters, deltas and rates of every polled switch."""
+
+    def __init__(self):
+        _require_numpy()
+        self._lock = threading.Lock()
+        # switch -> (ports, values, timestamp) of the previous sample
+        self._last = {}
+        # switch -> (ports, rates float64 matrix, deltas uint64 matrix, timestamp)
+        self._rates = {}
+
+    def update(self, switch: str, sample: CounterSample):
+        """
+        Add a counter sample and recompute the switch's rates.
+
+        Args:
+            switch: Switch name
+            sample: New counters
+        """
+        ports = np.asarray(sample.ports, dtype=np.int64)
+        values = np.asarray(sample.values, dtype=np.uint64).reshape(len(ports), len(METRICS))
+        widths = np.asarray(sample.widths, dtype=np.uint64)
+
+        with self._lock:
+            previous = self._last.get(switch)
+            self._last[switch] = (ports, values, sample.timestamp)
+        if previous is None:
+            return
+
+        prev_ports, prev_values, prev_time = previous
+        elapsed = sample.timestamp - prev_time
+        if elapsed <= 0:
+            return
+
+        # Line up ports present in both samples
+        common, idx_new, idx_old = np.intersect1d(ports, prev_ports, assume_unique=True,
+                                                  return_indices=True)
+        current = values[idx_new]
+        before = prev_values[idx_old]
+
+        # uint64 subtraction wraps modulo 2**64; mask down to each counter's width
+        raw = current - before
+        mask = np.where(widths >= 64, np.uint64(0xFFFFFFFFFFFFFFFF),
+                        (np.uint64(1) << np.minimum(widths, 63)) - np.uint64(1))
+        deltas = raw & mask
+
+        # A 64-bit counter going backwards is a reset (reboot), not a wrap
+        reset = (current < before) & (widths >= 64)
+        rates = deltas.astype(np.float64) / elapsed
+        rates[reset] = np.nan
+        # Octet counters are reported as bits per second
+        rates[:, 0:2] *= 8.0
+
+        with self._lock:
+            self._rates[switch] = (common, rates, deltas, sample.timestamp)
+
+    def rates(self, switch: str) -> Optional[Dict[int, Dict[str, float]]]:
+        """
+        Get the latest rates of a switch.
+
+        Args:
+            switch: Switch name
+
+        Returns:
+            Dictionary mapping port to {metric: rate}; octets are in bits/s,
+            errors in errors/s. None until two samples were seen.
+        """
+        with self._lock:
+            entry = self._rates.get(switch)
+        if entry is None:
+            return None
+        ports, rates, _deltas, _timestamp = entry
+        return {int(port): dict(zip(METRICS, (float(v) for v in row))) for port, row in zip(ports, rates)}
+
+    def forget(self, switch: str):
+        """Drop all data of a switch."""
+        with self._lock:
+            self._last.pop(switch, None)
+            self._rates.pop(switch, None)
+
+    def top_ports(self, n: int = 10, metric: str = 'in_octets') -> List[PortRate]:
+        """
+        Get the busiest ports across all switches.
+
+        Args:
+            n: Number of ports to return
+            metric: Metric to rank by
+
+        Returns:
+            List of PortRate, busiest first
+        """
+        column = METRICS.index(metric)
+        with self._lock:
+            entries = list(self._rates.items())
+        if not entries:
+            return []
+
+        names = [name for name, _entry in entries]
+        all_rates = np.concatenate([entry[1][:, column] for _name, entry in entries])
+        all_ports = np.concatenate([entry[0] for _name, entry in entries])
+        owners = np.repeat(np.arange(len(entries)), [len(entry[0]) for _name, entry in entries])
+
+        all_rates = np.nan_to_num(all_rates, nan=-1.0)
+        n = min(n, len(all_rates))
+        if n <= 0:
+            return []
+        top = np.argpartition(all_rates, -n)[-n:]
+        top = top[np.argsort(all_rates[top])[::-1]]
+        return [PortRate(names[owners[i]], int(all_ports[i]), metric, float(all_rates[i]))
+                for i in top if all_rates[i] >= 0]
+
+
+def parse_http_counters(body: bytes, content_type: str = '') -> Tuple[List[int], List[List[int]]]:
+    """
+    Parse a status page with port counters.
+
+    Accepts JSON (a list of objects with 'port' and the METRICS keys, or an
+    object with such a list under 'ports') or CSV with a header row.
+
+    Args:
+        body: Response body
+        content_type: Response Content-Type
+
+    Returns:
+        Tuple of (port ids, rows of counter values in METRICS order)
+    """
+    text = body.decode('utf-8', errors='replace').strip()
+    if 'json' in content_type or text[:1] in ('[', '{'):
+        data = json.loads(text)
+        rows = data.get('ports', []) if isinstance(data, dict) else data
+    else:
+        rows = list(csv.DictReader(io.StringIO(text)))
+
+    ports, values = [], []
+    for row in rows:
+        try:
+            port = int(row['port'])
+            counters = [int(row.get(metric) or 0) for metric in METRICS]
+        except (KeyError, TypeError, ValueError):
+            continue
+        ports.append(port)
+        values.append(counters)
+    return ports, values
+
+
+class PortStatsPoller:
+    """Polls interface counters from the whole inventory in parallel."""
+
+    def __init__(self, storage, store: Optional[CounterStore] = None, max_workers: int = 32,
+                 timeout: float = 3.0, default_path: str = 'counters.json'):
+        """
+        Initialize the poller.
+
+        Args:
+            storage: SwitchStorage inventory
+            store: CounterStore receiving the samples (created if None)
+            max_workers: Switches polled at the same time
+            timeout: Per-request timeout in seconds
+            default_path: HTTP status page for switches without 'counters_path'
+        """
+        self.storage = storage
+        self.store = store or CounterStore()
+        self.max_workers = max(1, int(max_workers))
+        self.timeout = timeout
+        self.default_path = default_path
+        self.session = create_session(retries=0, pool_maxsize=self.max_workers)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def fetch(self, switch: Dict) -> CounterSample:
+        """
+        Read the counters of one switch.
+
+        Args:
+            switch: SwitchStorage entry
+
+        Returns:
+            CounterSample
+        """
+        if switch.get('snmp_community'):
+            return self._fetch_snmp(switch)
+        return self._fetch_http(switch)
+
+    def _fetch_snmp(self, switch: Dict) -> CounterSample:
+        """Walk the IF-MIB counter columns with GETBULK."""
+        parsed = urlparse(switch['url'])
+        client = SnmpClient(switch.get('snmp_host') or parsed.hostname, switch['snmp_community'],
+                            port=int(switch.get('snmp_port', 161)), timeout=self.timeout)
+        columns = [SNMP_COLUMNS[metric][0] for metric in METRICS]
+        table = client.bulk_walk(columns)
+        ports = sorted(set().union(*(table[column].keys() for column in columns)))
+        values = [[table[column].get(port) or 0 for column in columns] for port in ports]
+        values = [[v if v is not END_OF_VIEW else 0 for v in row] for row in values]
+        widths = [SNMP_COLUMNS[metric][1] for metric in METRICS]
+        return CounterSample(ports, values, widths, time.monotonic())
+
+    def _fetch_http(self, switch: Dict) -> CounterSample:
+        """Read the counters from the switch's status page."""
+        base = switch['url'] if switch['url'].endswith('/') else switch['url'] + '/'
+        url = urljoin(base, switch.get('counters_path') or self.default_path)
+        response = self.session.get(url, timeout=self.timeout)
+        response.raise_for_status()
+        ports, values = parse_http_counters(response.content, response.headers.get('Content-Type', ''))
+        width = int(switch.get('counter_bits', 64))
+        return CounterSample(ports, values, [width] * len(METRICS), time.monotonic())
+
+    def poll_once(self) -> Dict[str, Optional[str]]:
+        """
+        Poll every switch once.
+
+        Returns:
+            Dictionary mapping switch names to None (success) or an error message
+        """
+        switches = self.storage.load_switches()
+        outcome = {}
+
+        def poll(name, switch):
+            try:
+                self.store.update(name, self.fetch(switch))
+                return name, None
+            except Exception as e:
+                return name, str(e)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for name, error in executor.map(lambda item: poll(*item), switches.items()):
+                outcome[name] = error
+        return outcome
+
+    def start(self, interval: float = 60.0):
+        """
+        Poll in the background every interval seconds.
+
+        Args:
+            interval: Seconds between polls
+        """
+        if self._thread is not None:
+            return
+        self._stop.clear()
+
+        def _run():
+            while not self._stop.is_set():
+                started = time.monotonic()
+                self.poll_once()
+                self._stop.wait(max(0.0, interval - (time.monotonic() - started)))
+
+        self._thread = threading.Thread(target=_run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop background polling."""
+        self._stop.set()
+        self._thread = None
@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+"""
+Result sinks - stream probe results to files, syslog, sockets or webhooks.
+
+Connection checks, connection tests and fleet sweeps hand every ProbeResult
+to a SinkPipeline. Each sink has its own bounded queue and writer thread, so
+a slow or unreachable destination never holds up the probes or the other
+sinks: results are written in batches, and when a queue is full the
+pipeline either drops the result (the default, counted in stats()) or
+blocks the producer for a bounded time, depending on its policy.
+
+Sinks are configured with short specs:
+
+    jsonl:/var/log/yap/probes.jsonl    JSON Lines file (appended)
+    syslog:                            local syslog (/dev/log)
+    syslog:loghost:514                 remote syslog over UDP
+    unix:/run/yap/probes.sock          JSON Lines over a Unix stream socket
+    http://collector:8080/probes       webhook, one JSON array per batch
+"""
+import json
+import os
+import queue
+import socket
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+from http_session import create_session
+
+# Backpressure policies for full queues
+DROP = 'drop'
+BLOCK = 'block'
+
+# syslog facility local0, severities info/warning
+SYSLOG_FACILITY = 16
+SYSLOG_INFO = 6
+SYSLOG_WARNING = 4
+
+_STOP = object()
+
+
+def result_record(result, source: str) -> Dict:
+    """
+    Turn a ProbeResult into the record written by the sinks.
+
+    Args:
+        result: ProbeResult (see fleet_probe)
+        source: What produced it ('check', 'test' or 'sweep')
+
+    Returns:
+        JSON-serializable dict
+    """
+    record = result._asdict()
+    record['source'] = source
+    for field in ('latency', 'handshake', 'ttfb'):
+        if record.get(field) is not None:
+            record[field] = round(record[field], 4)
+    return record
+
+
+class Sink:
+    """Destination for batches of result records."""
+
+    name = 'sink'
+
+    def write_batch(self, records: List[Dict]):
+        """Write records (called from the sink's writer thread only)."""
+        raise NotImplementedError
+
+    def close(self):
+        """Release the sink's resources."""
+
+
+class JsonLinesSink(Sink):
+    """Appends one JSON object per line to a file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.name = f"jsonl:{path}"
+        self._file = None
+
+    def write_batch(self, records: List[Dict]):
+        if self._file is None:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            self._file = open(self.path, 'a')
+        self._file.write(''.join(json.dumps(r, separators=(',', ':')) + '\n' for r in records))
+        self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class SyslogSink(Sink):
+    """Sends one syslog message per record (local socket or UDP)."""
+
+    def __init__(self, address=None, tag: str = 'yap-switch-manager'):
+        """
+        Args:
+            address: Path of the local syslog socket, or (host, port) for UDP
+            tag: Program name in the messages
+        """
+        self.address = address or '/dev/log'
+        self.tag = tag
+        self.name = "syslog:" + (':'.join(map(str, self.address)) if isinstance(self.address, tuple) else self.address)
+        self._socket = None
+
+    def _connect(self):
+        if isinstance(self.address, tuple):
+            self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self._socket.connect(self.address)
+        else:
+            self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            self._socket.connect(self.address)
+
+    def write_batch(self, records: List[Dict]):
+        if self._socket is None:
+            self._connect()
+        try:
+            for record in records:
+                severity = SYSLOG_INFO if record.get('reachable') else SYSLOG_WARNING
+                message = f"<{SYSLOG_FACILITY * 8 + severity}>{self.tag}: {json.dumps(record, separators=(',', ':'))}"
+                self._socket.send(message.encode('utf-8'))
+        except OSError:
+            self.close()
+            raise
+
+    def close(self):
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+
+
+class UnixSocketSink(Sink):
+    """Streams JSON Lines to a Unix socket, reconnecting after errors."""
+
+    def __init__(self, path: str, timeout: float = 5.0):
+        self.path = path
+        self.timeout = timeout
+        self.name = f"unix:{path}"
+        self._socket = None
+
+    def write_batch(self, records: List[Dict]):
+        if self._socket is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            try:
+                sock.connect(self.path)
+            except OSError:
+                sock.close()
+                raise
+            self._socket = sock
+        data = ''.join(json.dumps(r, separators=(',', ':')) + '\n' for r in records)
+        try:
+            self._socket.sendall(data.encode('utf-8'))
+        except OSError:
+            self.close()
+            raise
+
+    def close(self):
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+
+
+class WebhookSink(Sink):
+    """POSTs each batch as a JSON array."""
+
+    def __init__(self, url: str, headers: Optional[Dict[str, str]] = None, timeout: float = 5.0):
+        self.url = url
+        self.headers = dict(headers or {}, **{'Content-Type': 'application/json'})
+        self.timeout = timeout
+        self.name = url
+        self._session = create_session(retries=0, pool_maxsize=1)
+
+    def write_batch(self, records: List[Dict]):
+        body = json.dumps(records, separators=(',', ':')).encode('utf-8')
+        response = self._session.post(self.url, data=body, headers=self.headers, timeout=self.timeout)
+        response.close()
+        if response.status_code >= 300:
+            raise IOError(f"HTTP {response.status_code}")
+
+    def close(self):
+        self._session.close()
+
+
+def create_sink(spec: str) -> Sink:
+    """
+    Create a sink from its spec (see the module docstring).
+
+    Args:
+        spec: Sink spec
+
+    Returns:
+        Sink
+
+    Raises:
+        ValueError: If the spec is not understood
+    """
+    spec = spec.strip()
+    if spec.startswith(('http://', 'https://')):
+        return WebhookSink(spec)
+    kind, _, target = spec.partition(':')
+    if kind == 'jsonl' and target:
+        return JsonLinesSink(target)
+    if kind == 'unix' and target:
+        return UnixSocketSink(target)
+    if kind == 'syslog':
+        if not target or target.startswith('/'):
+            return SyslogSink(target or None)
+        host, _, port = target.rpartition(':')
+        if not host:
+            host, port = target, '514'
+        return SyslogSink((host, int(port)))
+    raise ValueError(f"Unknown result sink: {spec}")
+
+
+class _SinkWorker:
+    """Bounded queue and writer thread of one sink."""
+
+    def __init__(self, sink: Sink, max_queue: int, batch_size: int, flush_interval: float):
+        self.sink = sink
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            stopping = False
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._write(batch)
+            if stopping:
+                break
+        self.sink.close()
+
+    def _write(self, batch):
+        try:
+            self.sink.write_batch(batch)
+            self.written += len(batch)
+        except Exception as e:
+            # The batch is lost; the next one tries again (sinks reconnect on their own)
+            self.failed += len(batch)
+            print(f"Error writing results to {self.sink.name}: {e}")
+
+
+class SinkPipeline:
+    """Fans probe results out to several sinks without blocking the prober."""
+
+    def __init__(self, sinks: Iterable[Sink], batch_size: int = 200, flush_interval: float = 1.0,
+                 max_queue: int = 10000, policy: str = DROP, block_timeout: Optional[float] = 5.0):
+        """
+        Initialize the pipeline and start one writer thread per sink.
+
+        Args:
+            sinks: Destinations
+            batch_size: Records written per batch at most
+            flush_interval: Seconds a partial batch waits for more records
+            max_queue: Records queued per sink at most
+            policy: DROP to discard results for a full queue, BLOCK to make the producer wait
+            block_timeout: Seconds a BLOCK producer waits before dropping after all (None waits forever)
+        """
+        if policy not in (DROP, BLOCK):
+            raise ValueError(f"Unknown backpressure policy: {policy}")
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self._closed = False
+        self._workers = [_SinkWorker(sink, max(1, int(max_queue)), max(1, int(batch_size)), flush_interval)
+                         for sink in sinks]
+
+    def emit(self, result, source: str = 'sweep'):
+        """
+        Queue a ProbeResult for every sink (thread-safe).
+
+        Args:
+            result: ProbeResult
+            source: What produced it ('check', 'test' or 'sweep')
+        """
+        if self._closed:
+            return
+        record = result_record(result, source)
+        for worker in self._workers:
+            try:
+                if self.policy == BLOCK:
+                    worker.queue.put(record, timeout=self.block_timeout)
+                else:
+                    worker.queue.put_nowait(record)
+            except queue.Full:
+                worker.dropped += 1
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """
+        Get per-sink counters.
+
+        Returns:
+            {sink name: {'queued', 'written', 'dropped', 'failed'}}
+        """
+        return {worker.sink.name: {'queued': worker.queue.qsize(), 'written': worker.written,
+                                   'dropped': worker.dropped, 'failed': worker.failed}
+                for worker in self._workers}
+
+    def close(self, timeout: float = 5.0):
+        """
+        Write what is queued and stop the writer threads.
+
+        Args:
+            timeout: Seconds to wait for all sinks to finish
+        """
+        if self._closed:
+            return
+        self._closed = True
+        deadline = time.monotonic() + timeout
+        for worker in self._workers:
+            try:
+                worker.queue.put(_STOP, timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Full:
+                pass
+        for worker in self._workers:
+            worker.thread.join(max(0.0, deadline - time.monotonic()))
+
+
+def pipeline_from_specs(specs: Iterable[str], **kwargs) -> Optional[SinkPipeline]:
+    """
+    Create a pipeline from sink specs, skipping (and reporting) invalid ones.
+
+    Args:
+        specs: Sink specs
+        **kwargs: SinkPipeline options
+
+    Returns:
+        SinkPipeline, or None if no valid sink was given
+    """
+    sinks = []
+    for spec in specs:
+        if not spec.strip():
+            continue
+        try:
+            sinks.append(create_sink(spec))
+        except (ValueError, OSError) as e:
+            print(f"Error creating result sink: {e}")
+    return SinkPipeline(sinks, **kwargs) if sinks else None
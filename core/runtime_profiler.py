@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""
+Runtime profiler - CPU profiles and heap snapshots of the running application.
+
+When the application gets slow on an operator's machine, profiling can be
+switched on from the tray menu (or with a signal, see main()) without a
+restart:
+
+- CPU profile: cProfile records the Tk thread and every thread started while
+  it runs (connection checks, probe pools, console launches).
+- Heap tracing: tracemalloc records allocations; stopping it compares the
+  heap with the start, which shows what keeps growing.
+
+Every stop writes a timestamped directory under diagnostics/ in the config
+directory with the raw data (pstats file or tracemalloc snapshot) and a
+summary.txt with the top entries and the application's counters (e.g.
+number of switch managers) at start and stop.
+"""
+import cProfile
+import gc
+import io
+import os
+import pstats
+import signal
+import sys
+import threading
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+
+from switch_storage import get_config_dir
+
+# File holding the PID of the running application (for the command line)
+PID_FILE = 'switch-manager.pid'
+
+# Stack frames recorded per allocation while heap tracing
+HEAP_FRAMES = 10
+
+# Before 3.12, cProfile only sees the thread that enabled it; from 3.12 on it
+# uses sys.monitoring, which covers all threads and allows only one profiler
+_PER_THREAD = sys.version_info < (3, 12)
+
+
+class RuntimeProfiler:
+    """On-demand CPU profiling and heap tracing (start/stop from the Tk thread)."""
+
+    def __init__(self, output_dir: Optional[str] = None, top: int = 30,
+                 state: Optional[Callable[[], Dict[str, int]]] = None):
+        """
+        Initialize the profiler; nothing is recorded until started.
+
+        Args:
+            output_dir: Directory for the dumps (default: diagnostics/ in the config directory)
+            top: Entries per summary table
+            state: Returns application counters to record at start and stop
+        """
+        self.output_dir = output_dir or os.path.join(get_config_dir(), 'diagnostics')
+        self.top = max(1, int(top))
+        self.state = state
+        self._lock = threading.Lock()
+        # CPU profile: profiles of all threads, when and with what state it started
+        self._profiles = None
+        self._profile_started = None
+        self._profile_state = None
+        # Heap tracing: snapshot and state at the start
+        self._heap_baseline = None
+        self._heap_started = None
+        self._heap_state = None
+
+    @property
+    def profiling(self) -> bool:
+        """Whether a CPU profile is being recorded."""
+        return self._profiles is not None
+
+    @property
+    def tracing(self) -> bool:
+        """Whether heap tracing is on."""
+        return self._heap_baseline is not None
+
+    def _collect_state(self) -> Dict[str, int]:
+        state = {'threads': threading.active_count(), 'gc objects': len(gc.get_objects())}
+        if self.state is not None:
+            try:
+                state.update(self.state())
+            except Exception as e:
+                print(f"Error collecting application state: {e}")
+        return state
+
+    def _new_dump_dir(self, kind: str) -> str:
+        stamp = time.strftime('%Y%m%d-%H%M%S')
+        path = os.path.join(self.output_dir, f"{stamp}-{kind}")
+        suffix = 1
+        while os.path.exists(path):
+            suffix += 1
+            path = os.path.join(self.output_dir, f"{stamp}-{kind}-{suffix}")
+        os.makedirs(path)
+        return path
+
+    def _state_lines(self, before: Dict[str, int], after: Dict[str, int]) -> List[str]:
+        lines = ["Application state (start -> stop):"]
+        for key in sorted(set(before) | set(after)):
+            start, stop = before.get(key), after.get(key)
+            change = f" ({stop - start:+d})" if isinstance(start, int) and isinstance(stop, int) else ""
+            lines.append(f"  {key}: {start} -> {stop}{change}")
+        return lines
+
+    def _thread_profile_hook(self, frame, event, arg):
+        """threading.setprofile hook: give each new thread its own profile."""
+        profile = cProfile.Profile()
+        with self._lock:
+            if self._profiles is None:
+                sys.setprofile(None)
+                return
+            self._profiles.append((threading.current_thread().name, profile))
+        # Replaces this hook for the rest of the thread's life
+        profile.enable()
+
+    def start_profile(self):
+        """Start recording a CPU profile (no-op if already recording)."""
+        with self._lock:
+            if self._profiles is not None:
+                return
+            self._profile_state = self._collect_state()
+            profile = cProfile.Profile()
+            self._profiles = [(threading.current_thread().name, profile)]
+            self._profile_started = time.time()
+        if _PER_THREAD:
+            threading.setprofile(self._thread_profile_hook)
+        profile.enable()
+
+    def stop_profile(self) -> Optional[str]:
+        """
+        Stop the CPU profile and write it.
+
+        Threads that were started while recording and are still running keep
+        recording into their (already written) profile until they exit.
+
+        Returns:
+            Dump directory, or None if no profile was being recorded
+        """
+        with self._lock:
+            profiles, self._profiles = self._profiles, None
+        if profiles is None:
+            return None
+        if _PER_THREAD:
+            threading.setprofile(None)
+        for _name, profile in profiles:
+            profile.disable()
+        duration = time.time() - self._profile_started
+        state = self._collect_state()
+
+        path = self._new_dump_dir('profile')
+        stats = None
+        for _name, profile in profiles:
+            try:
+                if stats is None:
+                    stats = pstats.Stats(profile)
+                else:
+                    stats.add(profile)
+            except TypeError:
+                # A thread that did not make a single call
+                pass
+
+        lines = [f"CPU profile of {duration:.1f}s, {len(profiles)} thread(s): "
+                 + ', '.join(sorted({name for name, _profile in profiles})), ""]
+        lines += self._state_lines(self._profile_state, state)
+        if stats is not None:
+            stats.dump_stats(os.path.join(path, 'profile.pstats'))
+        for order, title in (('cumulative', 'cumulative time'), ('tottime', 'own time')):
+            if stats is None:
+                break
+            output = io.StringIO()
+            stats.stream = output
+            stats.sort_stats(order).print_stats(self.top)
+            lines += ["", f"Top {self.top} by {title}:", output.getvalue().strip()]
+        self._write_summary(path, lines)
+        return path
+
+    def toggle_profile(self) -> Optional[str]:
+        """Start or stop the CPU profile; returns the dump directory when stopping."""
+        if self.profiling:
+            return self.stop_profile()
+        self.start_profile()
+        return None
+
+    def start_heap(self):
+        """Start heap tracing (no-op if already tracing)."""
+        with self._lock:
+            if self._heap_baseline is not None:
+                return
+            self._heap_state = self._collect_state()
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(HEAP_FRAMES)
+            self._heap_started = time.time()
+            self._heap_baseline = tracemalloc.take_snapshot()
+
+    def stop_heap(self) -> Optional[str]:
+        """
+        Take a heap snapshot, compare it with the start, write both and stop tracing.
+
+        Returns:
+            Dump directory, or None if heap tracing was off
+        """
+        with self._lock:
+            baseline, self._heap_baseline = self._heap_baseline, None
+        if baseline is None:
+            return None
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        duration = time.time() - self._heap_started
+        state = self._collect_state()
+
+        path = self._new_dump_dir('heap')
+        snapshot.dump(os.path.join(path, 'heap.snapshot'))
+        # Allocations of tracemalloc itself would only add noise
+        ignore = [tracemalloc.Filter(False, tracemalloc.__file__)]
+        snapshot = snapshot.filter_traces(ignore)
+        baseline = baseline.filter_traces(ignore)
+
+        lines = [f"Heap traced for {duration:.1f}s: {current / 1048576:.1f} MiB traced now, "
+                 f"peak {peak / 1048576:.1f} MiB", ""]
+        lines += self._state_lines(self._heap_state, state)
+        lines += ["", f"Top {self.top} growth since start (by line):"]
+        for diff in snapshot.compare_to(baseline, 'lineno')[:self.top]:
+            lines.append(f"  {diff}")
+        lines += ["", f"Top {self.top} allocations (by line):"]
+        for stat in snapshot.statistics('lineno')[:self.top]:
+            lines.append(f"  {stat}")
+        growth = snapshot.compare_to(baseline, 'traceback')
+        if growth and growth[0].size_diff > 0:
+            lines += ["", "Largest growth, allocated at:"]
+            lines += [f"  {line}" for line in growth[0].traceback.format()]
+        self._write_summary(path, lines)
+        return path
+
+    def toggle_heap(self) -> Optional[str]:
+        """Start or stop heap tracing; returns the dump directory when stopping."""
+        if self.tracing:
+            return self.stop_heap()
+        self.start_heap()
+        return None
+
+    @staticmethod
+    def _write_summary(path: str, lines: List[str]):
+        with open(os.path.join(path, 'summary.txt'), 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+
+
+def install_signal_handlers(toggle_profile: Callable[[], None], toggle_heap: Callable[[], None],
+                            pid_file: Optional[str] = None) -> bool:
+    """
+    Toggle profiling with SIGUSR1 and heap tracing with SIGUSR2, and record this process's PID.
+
+    Must be called from the main thread. The handlers run on the main thread
+    between two Python bytecodes, so they should only hand the work off.
+
+    Args:
+        toggle_profile: Called on SIGUSR1
+        toggle_heap: Called on SIGUSR2
+        pid_file: Where to write the PID (default: PID_FILE in the config directory)
+
+    Returns:
+        True if installed, False where these signals do not exist (Windows)
+    """
+    if not hasattr(signal, 'SIGUSR1'):
+        return False
+    signal.signal(signal.SIGUSR1, lambda signum, frame: toggle_profile())
+    signal.signal(signal.SIGUSR2, lambda signum, frame: toggle_heap())
+    try:
+        with open(pid_file or os.path.join(get_config_dir(), PID_FILE), 'w') as f:
+            f.write(f"{os.getpid()}\n")
+    except OSError as e:
+        print(f"Error writing PID file: {e}")
+    return True
+
+
+def remove_pid_file(pid_file: Optional[str] = None):
+    """Remove the PID file if it still belongs to this process."""
+    pid_file = pid_file or os.path.join(get_config_dir(), PID_FILE)
+    try:
+        with open(pid_file) as f:
+            if int(f.read().strip() or 0) == os.getpid():
+                os.unlink(pid_file)
+    except (OSError, ValueError):
+        pass
+
+
+def main(argv=None):
+    """Toggle profiling or heap tracing in the running application."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Profile the running YaP Switch Manager")
+    parser.add_argument("action", choices=["profile", "heap"],
+                        help="toggle the CPU profile or heap tracing (run again to stop and write the dump)")
+    parser.add_argument("--pid", type=int, help="process to signal (default: from the PID file)")
+    args = parser.parse_args(argv)
+
+    if not hasattr(signal, 'SIGUSR1'):
+        print("Error: signals are not supported on this platform; use the tray menu")
+        return 1
+    pid = args.pid
+    if pid is None:
+        try:
+            with open(os.path.join(get_config_dir(), PID_FILE)) as f:
+                pid = int(f.read().strip())
+        except (OSError, ValueError):
+            print("Error: the application does not seem to be running (no PID file)")
+            return 1
+    try:
+        os.kill(pid, signal.SIGUSR1 if args.action == "profile" else signal.SIGUSR2)
+    except OSError as e:
+        print(f"Error signalling process {pid}: {e}")
+        return 1
+    print(f"Toggled {args.action} in process {pid}; dumps are written to "
+          f"{os.path.join(get_config_dir(), 'diagnostics')}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,527 @@
+#!/usr/bin/env python3
+"""
+Site agents - probe switches on isolated site networks and report to a central aggregator.
+
+A headless agent runs on a node at each site with that site's own switch
+inventory. It probes the switches (the same reachability rule as the GUI's
+connection check) and sends the aggregator only what changed since its last
+report, one gzip-compressed JSON batch per probe cycle. Each batch carries a
+sequence number; when the aggregator sees a gap (agent or aggregator
+restart, lost report) it answers 409 and the agent sends a full snapshot.
+
+The aggregator merges all sites and numbers every change with a global
+version, so the GUI polls it with ?since=<version> and only receives what
+changed since its previous poll. Each aggregator start has a new epoch; a
+reader from another epoch (or too far behind) gets the full status instead.
+"""
+import gzip
+import hmac
+import json
+import math
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional
+from urllib.parse import parse_qs, urlparse
+
+from fleet_probe import ShardedProber
+from http_session import create_session
+
+
+DEFAULT_PORT = 8765
+
+# A site that has not reported for this many probe intervals is stale
+STALE_INTERVALS = 3
+
+# Header carrying the shared secret between agents, aggregator and GUI
+TOKEN_HEADER = 'X-Agent-Token'
+
+# Removals remembered for incremental readers; older readers get a full status
+MAX_REMOVED = 10000
+
+
+def _latency_bucket(latency_ms: Optional[int]) -> Optional[int]:
+    """Power-of-two latency bucket, so jitter alone does not produce deltas."""
+    if latency_ms is None:
+        return None
+    # Everything under 16 ms is "fast"; LAN round trips jitter a lot in that range
+    return int(math.log2(max(16, latency_ms)))
+
+
+def _significant(old, new) -> bool:
+    """Whether a status [reachable, status_code, latency_ms] is worth reporting."""
+    if old is None:
+        return True
+    return (old[0] != new[0] or old[1] != new[1]
+            or _latency_bucket(old[2]) != _latency_bucket(new[2]))
+
+
+class SiteAgent:
+    """Probes one site's switches and streams status deltas to the aggregator."""
+
+    def __init__(self, storage, aggregator_url: str, site: str, token: Optional[str] = None,
+                 interval: float = 30.0, processes: Optional[int] = None,
+                 threads_per_process: int = 64, timeout: float = 1.5):
+        """
+        Initialize the agent.
+
+        Args:
+            storage: SwitchStorage with this site's switches
+            aggregator_url: Base URL of the aggregator (e.g. http://nms:8765/)
+            site: Site identifier
+            token: Shared secret sent to the aggregator
+            interval: Seconds between probe cycles
+            processes: Probe worker processes (see ShardedProber)
+            threads_per_process: Concurrent probes per worker
+            timeout: Probe timeout in seconds
+        """
+        self.storage = storage
+        self.report_url = aggregator_url.rstrip('/') + '/v1/report'
+        self.site = site
+        self.token = token
+        self.interval = interval
+        self.prober = ShardedProber(storage, processes=processes,
+                                    threads_per_process=threads_per_process, timeout=timeout)
+        self.session = create_session(retries=1, pool_maxsize=1)
+        self._reported = {}
+        self._seq = 0
+        self._need_full = True
+        self._stop = threading.Event()
+
+    def probe(self) -> Dict[str, list]:
+        """
+        Probe every switch of the site.
+
+        Returns:
+            Dictionary mapping switch names to [reachable, status_code, latency_ms]
+        """
+        status = {}
+        for result in self.prober.run():
+            latency_ms = int(result.latency * 1000) if result.latency is not None else None
+            status[result.name] = [int(result.reachable), result.status_code, latency_ms]
+        return status
+
+    def build_report(self, status: Dict[str, list]) -> Dict:
+        """
+        Build the report for a probe cycle: a full snapshot or only the changes.
+
+        Args:
+            status: Result of probe()
+
+        Returns:
+            Report dict
+        """
+        full = self._need_full
+        if full:
+            changes = dict(status)
+            removed = []
+        else:
+            changes = {name: value for name, value in status.items()
+                       if _significant(self._reported.get(name), value)}
+            removed = [name for name in self._reported if name not in status]
+        return {
+            'site': self.site,
+            'seq': self._seq + 1,
+            'full': full,
+            'interval': self.interval,
+            'changes': changes,
+            'removed': removed,
+        }
+
+    def send(self, report: Dict) -> bool:
+        """
+        Send a report to the aggregator.
+
+        Args:
+            report: Report from build_report()
+
+        Returns:
+            True if the aggregator accepted it
+        """
+        body = gzip.compress(json.dumps(report, separators=(',', ':')).encode('utf-8'))
+        headers = {'Content-Type': 'application/json', 'Content-Encoding': 'gzip'}
+        if self.token:
+            headers[TOKEN_HEADER] = self.token
+        try:
+            response = self.session.post(self.report_url, data=body, headers=headers, timeout=10)
+        except Exception as e:
+            print(f"Error reporting to aggregator: {e}")
+            self._need_full = True
+            return False
+
+        if response.status_code == 409:
+            # Aggregator lost track of this site: next report is a full snapshot
+            self._need_full = True
+            return False
+        if response.status_code != 200:
+            print(f"Aggregator rejected report: HTTP {response.status_code}")
+            self._need_full = True
+            return False
+
+        self._seq = report['seq']
+        if report['full']:
+            self._reported = dict(report['changes'])
+        else:
+            self._reported.update(report['changes'])
+            for name in report['removed']:
+                self._reported.pop(name, None)
+        self._need_full = False
+        return True
+
+    def run_once(self) -> bool:
+        """Probe the site and report; retries at once with a full snapshot on 409."""
+        status = self.probe()
+        if self.send(self.build_report(status)):
+            return True
+        if self._need_full:
+            return self.send(self.build_report(status))
+        return False
+
+    def run_forever(self):
+        """Probe and report every interval until stop() is called."""
+        while not self._stop.is_set():
+            started = time.monotonic()
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"Site agent error: {e}")
+            self._stop.wait(max(0.0, self.interval - (time.monotonic() - started)))
+
+    def stop(self):
+        """Stop run_forever()."""
+        self._stop.set()
+
+
+class Aggregator:
+    """Merges the reports of all site agents."""
+
+    def __init__(self, token: Optional[str] = None):
+        """
+        Initialize the aggregator.
+
+        Args:
+            token: Shared secret required from agents and readers (None disables the check)
+        """
+        self.token = token
+        self.server = None
+        # Changes on every start, so readers notice a restart even if the version catches up
+        self.epoch = uuid.uuid4().hex
+        self._lock = threading.Lock()
+        self._version = 0
+        # site -> {'seq', 'interval', 'last_seen', 'switches': {name: [r, code, ms, version]}}
+        self._sites = {}
+        # (site, name) -> version of removals, so incremental readers see them (oldest first)
+        self._removed = {}
+        # Newest version dropped from _removed; readers behind it need a full status
+        self._pruned = 0
+
+    def authorized(self, headers) -> bool:
+        """Check the shared secret of a request."""
+        if not self.token:
+            return True
+        return hmac.compare_digest(headers.get(TOKEN_HEADER, ''), self.token)
+
+    def apply(self, report: Dict) -> bool:
+        """
+        Apply an agent report.
+
+        Args:
+            report: Decoded report
+
+        Returns:
+            False if the report does not follow the previous one (send a full snapshot)
+        """
+        site = str(report['site'])
+        with self._lock:
+            state = self._sites.get(site)
+            if not report.get('full') and (state is None or report['seq'] != state['seq'] + 1):
+                return False
+            if state is None:
+                state = self._sites[site] = {'seq': 0, 'switches': {}}
+            state['seq'] = report['seq']
+            state['interval'] = float(report.get('interval') or 30.0)
+            state['last_seen'] = time.time()
+
+            switches = state['switches']
+            removed = list(report.get('removed', []))
+            if report.get('full'):
+                removed += [name for name in switches if name not in report['changes']]
+            for name in removed:
+                if switches.pop(name, None) is not None:
+                    self._version += 1
+                    self._removed.pop((site, name), None)
+                    self._removed[(site, name)] = self._version
+            for name, value in report['changes'].items():
+                current = switches.get(name)
+                if current is not None and current[:3] == list(value[:3]):
+                    continue
+                self._version += 1
+                switches[name] = list(value[:3]) + [self._version]
+                self._removed.pop((site, name), None)
+            while len(self._removed) > MAX_REMOVED:
+                oldest = next(iter(self._removed))
+                self._pruned = self._removed.pop(oldest)
+        return True
+
+    def status(self, since: int = 0, epoch: Optional[str] = None) -> Dict:
+        """
+        Get the merged status.
+
+        Args:
+            since: Version from a previous call; only later changes are returned
+            epoch: Epoch of that call; a different one gets the full status
+
+        Returns:
+            Dict with 'epoch', 'version', 'full' (the reader must replace its copy),
+            'sites' ({site: {'last_seen', 'stale'}}),
+            'switches' ({site: {name: [reachable, status_code, latency_ms]}})
+            and 'removed' ({site: [names]})
+        """
+        now = time.time()
+        with self._lock:
+            full = epoch != self.epoch or since > self._version or since < self._pruned
+            if full:
+                since = 0
+            sites = {}
+            switches = {}
+            for site, state in self._sites.items():
+                sites[site] = {
+                    'last_seen': state['last_seen'],
+                    'stale': now - state['last_seen'] > STALE_INTERVALS * state['interval'],
+                }
+                changed = {name: value[:3] for name, value in state['switches'].items() if value[3] > since}
+                if changed:
+                    switches[site] = changed
+            removed = {}
+            if not full:
+                for (site, name), version in self._removed.items():
+                    if version > since:
+                        removed.setdefault(site, []).append(name)
+            return {'epoch': self.epoch, 'version': self._version, 'full': full,
+                    'sites': sites, 'switches': switches, 'removed': removed}
+
+    def start(self, host: str = '0.0.0.0', port: int = DEFAULT_PORT):
+        """Serve the aggregator API in a background thread."""
+        handler = type('AggregatorHandler', (_AggregatorHandler,), {'aggregator': self})
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        """Stop serving."""
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+
+class _AggregatorHandler(BaseHTTPRequestHandler):
+    """HTTP front end of an Aggregator (bound via a subclass attribute)."""
+
+    aggregator = None
+
+    def _reply(self, status: int, payload: Optional[Dict] = None):
+        body = json.dumps(payload or {}, separators=(',', ':')).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        if not self.aggregator.authorized(self.headers):
+            self._reply(403, {'error': 'forbidden'})
+            return
+        if urlparse(self.path).path != '/v1/report':
+            self._reply(404, {'error': 'not found'})
+            return
+        try:
+            body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            if self.headers.get('Content-Encoding') == 'gzip':
+                body = gzip.decompress(body)
+            report = json.loads(body)
+            accepted = self.aggregator.apply(report)
+        except (KeyError, TypeError, ValueError, OSError) as e:
+            self._reply(400, {'error': str(e)})
+            return
+        if accepted:
+            self._reply(200, {'ok': True})
+        else:
+            self._reply(409, {'error': 'full snapshot required'})
+
+    def do_GET(self):
+        if not self.aggregator.authorized(self.headers):
+            self._reply(403, {'error': 'forbidden'})
+            return
+        parsed = urlparse(self.path)
+        if parsed.path != '/v1/status':
+            self._reply(404, {'error': 'not found'})
+            return
+        query = parse_qs(parsed.query)
+        try:
+            since = int(query.get('since', ['0'])[0])
+        except ValueError:
+            since = 0
+        self._reply(200, self.aggregator.status(since, query.get('epoch', [None])[0]))
+
+    def log_message(self, format, *args):
+        pass
+
+
+class AggregatorClient:
+    """Keeps a local copy of the aggregator's merged status (used by the GUI)."""
+
+    def __init__(self, aggregator_url: str, token: Optional[str] = None, timeout: float = 5.0):
+        """
+        Initialize the client.
+
+        Args:
+            aggregator_url: Base URL of the aggregator
+            token: Shared secret
+            timeout: Request timeout in seconds
+        """
+        self.status_url = aggregator_url.rstrip('/') + '/v1/status'
+        self.headers = {TOKEN_HEADER: token} if token else {}
+        self.timeout = timeout
+        self.session = create_session(retries=0, pool_maxsize=1)
+        self.epoch = None
+        self.version = 0
+        self.sites = {}
+        # site -> {name: [reachable, status_code, latency_ms]}
+        self.switches = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def poll(self) -> bool:
+        """
+        Fetch the changes since the last poll.
+
+        Returns:
+            True if anything changed
+        """
+        params = {'since': self.version}
+        if self.epoch:
+            params['epoch'] = self.epoch
+        response = self.session.get(self.status_url, params=params,
+                                    headers=self.headers, timeout=self.timeout)
+        response.raise_for_status()
+        data = response.json()
+
+        changed = (data['epoch'] != self.epoch or data['version'] != self.version
+                   or data['sites'] != self.sites)
+        if data['full']:
+            # First poll, aggregator restart or too far behind: replace everything
+            changed = changed or data['switches'] != self.switches
+            self.switches = {}
+        for site, names in data.get('removed', {}).items():
+            for name in names:
+                self.switches.get(site, {}).pop(name, None)
+        for site, entries in data.get('switches', {}).items():
+            self.switches.setdefault(site, {}).update(entries)
+        self.sites = data['sites']
+        self.epoch = data['epoch']
+        self.version = data['version']
+        return changed
+
+    def reachability(self) -> Dict[str, Optional[bool]]:
+        """
+        Get the reachability of every switch reported by any site.
+
+        Returns:
+            Dictionary mapping switch names to True/False, or None when their
+            site has stopped reporting
+        """
+        result = {}
+        for site, entries in self.switches.items():
+            stale = self.sites.get(site, {}).get('stale', True)
+            for name, value in entries.items():
+                result[name] = None if stale else bool(value[0])
+        return result
+
+    def switch_sites(self) -> Dict[str, str]:
+        """Get the site reporting each switch."""
+        return {name: site for site, entries in self.switches.items() for name in entries}
+
+    def watch(self, callback: Callable[[Dict[str, Optional[bool]]], None], interval: float = 5.0):
+        """
+        Poll in the background and call callback(reachability()) after each change.
+
+        Args:
+            callback: Called from the polling thread
+            interval: Seconds between polls
+        """
+        if self._thread is not None:
+            return
+        self._stop.clear()
+
+        def _run():
+            while not self._stop.is_set():
+                try:
+                    if self.poll():
+                        callback(self.reachability())
+                except Exception as e:
+                    print(f"Error polling aggregator: {e}")
+                self._stop.wait(interval)
+
+        self._thread = threading.Thread(target=_run, daemon=True)
+        self._thread.start()
+
+    def stop_watching(self):
+        """Stop background polling."""
+        self._stop.set()
+        self._thread = None
+
+
+def main(argv=None):
+    """Run a site agent or the aggregator."""
+    import argparse
+    import os
+    from switch_storage import SwitchStorage
+
+    parser = argparse.ArgumentParser(description="Site agent and status aggregator")
+    subparsers = parser.add_subparsers(dest="mode")
+    subparsers.required = True
+
+    agent_parser = subparsers.add_parser("agent", help="probe this site's switches and report them")
+    agent_parser.add_argument("--aggregator", required=True, help="aggregator URL, e.g. http://nms:8765/")
+    agent_parser.add_argument("--site", required=True, help="site identifier")
+    agent_parser.add_argument("--storage", help="switches.json with this site's switches")
+    agent_parser.add_argument("--interval", type=float, default=30.0, help="seconds between probes")
+    agent_parser.add_argument("--processes", type=int, default=None, help="probe worker processes")
+    agent_parser.add_argument("--once", action="store_true", help="probe and report once, then exit")
+
+    aggregator_parser = subparsers.add_parser("aggregator", help="collect the reports of all sites")
+    aggregator_parser.add_argument("--bind", default="0.0.0.0", help="listen address")
+    aggregator_parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="listen port")
+
+    args = parser.parse_args(argv)
+    # The shared secret comes from the environment so it never shows up in ps
+    token = os.environ.get('YAP_AGENT_TOKEN') or None
+
+    if args.mode == "aggregator":
+        aggregator = Aggregator(token=token)
+        aggregator.start(args.bind, args.port)
+        print(f"Aggregator listening on {args.bind}:{args.port}")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            aggregator.stop()
+        return 0
+
+    agent = SiteAgent(SwitchStorage(args.storage), args.aggregator, args.site, token=token,
+                      interval=args.interval, processes=args.processes)
+    if args.once:
+        return 0 if agent.run_once() else 1
+    try:
+        agent.run_forever()
+    except KeyboardInterrupt:
+        agent.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    import multiprocessing
+    multiprocessing.freeze_support()
+    raise SystemExit(main())
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Minimal SNMPv2c client - just enough BER and GETBULK to walk interface counters.
+
+Only what the port statistics poller needs is implemented: GET/GETBULK
+requests, responses with integer, counter, gauge, timeticks and string values,
+and table walks over a set of columns.
+"""
+import os
+import socket
+from typing import Dict, List, Tuple
+
+# BER / SNMP tags
+TAG_INTEGER = 0x02
+TAG_OCTET_STRING = 0x04
+TAG_NULL = 0x05
+TAG_OID = 0x06
+TAG_SEQUENCE = 0x30
+TAG_COUNTER32 = 0x41
+TAG_GAUGE32 = 0x42
+TAG_TIMETICKS = 0x43
+TAG_COUNTER64 = 0x46
+TAG_NO_SUCH_OBJECT = 0x80
+TAG_NO_SUCH_INSTANCE = 0x81
+TAG_END_OF_MIB_VIEW = 0x82
+PDU_GET = 0xA0
+PDU_GETNEXT = 0xA1
+PDU_RESPONSE = 0xA2
+PDU_GETBULK = 0xA5
+
+SNMP_V2C = 1
+
+# Value returned for noSuchObject/noSuchInstance/endOfMibView
+END_OF_VIEW = object()
+
+
+def _encode_length(length: int) -> bytes:
+    if length < 0x80:
+        return bytes([length])
+    raw = length.to_bytes((length.bit_length() + 7) // 8, 'big')
+    return bytes([0x80 | len(raw)]) + raw
+
+
+def encode_tlv(tag: int, payload: bytes) -> bytes:
+    """Encode one BER type-length-value."""
+    return bytes([tag]) + _encode_length(len(payload)) + payload
+
+
+def encode_integer(value: int, tag: int = TAG_INTEGER) -> bytes:
+    """Encode a signed (INTEGER) or unsigned (counter/gauge) number."""
+    if tag == TAG_INTEGER:
+        raw = value.to_bytes(max(1, (value.bit_length() + 8) // 8), 'big', signed=True)
+    else:
+        # Unsigned application types get a leading zero when the top bit is set
+        raw = value.to_bytes(max(1, (value.bit_length() + 7) // 8), 'big')
+        if raw[0] & 0x80:
+            raw = b'\x00' + raw
+    return encode_tlv(tag, raw)
+
+
+def encode_oid(oid: str) -> bytes:
+    """Encode a dotted OID string."""
+    parts = [int(part) for part in oid.strip('.').split('.')]
+    body = bytearray([parts[0] * 40 + parts[1]])
+    for part in parts[2:]:
+        chunk = [part & 0x7F]
+        part >>= 7
+        while part:
+            chunk.append(0x80 | (part & 0x7F))
+            part >>= 7
+        body.extend(reversed(chunk))
+    return encode_tlv(TAG_OID, bytes(body))
+
+
+def encode_value(value) -> bytes:
+    """Encode a varbind value: None, int, bytes/str or a (tag, int) tuple."""
+    if value is None:
+        return encode_tlv(TAG_NULL, b'')
+    if value is END_OF_VIEW:
+        return encode_tlv(TAG_END_OF_MIB_VIEW, b'')
+    if isinstance(value, tuple):
+        return encode_integer(value[1], value[0])
+    if isinstance(value, int):
+        return encode_integer(value)
+    if isinstance(value, str):
+        value = value.encode('utf-8')
+    return encode_tlv(TAG_OCTET_STRING, value)
+
+
+def encode_message(community: str, pdu_type: int, request_id: int,
+                   varbinds: List[Tuple[str, object]], field1: int = 0, field2: int = 0) -> bytes:
+    """
+    Encode a complete SNMPv2c message.
+
+    Args:
+        community: Community string
+        pdu_type: PDU tag (PDU_GET, PDU_GETBULK, PDU_RESPONSE, ...)
+        request_id: Request identifier
+        varbinds: List of (oid, value) pairs
+        field1: error-status, or non-repeaters for GETBULK
+        field2: error-index, or max-repetitions for GETBULK
+
+    Returns:
+        Encoded message
+    """
+    bindings = b''.join(
+        encode_tlv(TAG_SEQUENCE, encode_oid(oid) + encode_value(value)) for oid, value in varbinds
+    )
+    pdu = encode_tlv(pdu_type, encode_integer(request_id) + encode_integer(field1)
+                     + encode_integer(field2) + encode_tlv(TAG_SEQUENCE, bindings))
+    return encode_tlv(TAG_SEQUENCE, encode_integer(SNMP_V2C)
+                      + encode_tlv(TAG_OCTET_STRING, community.encode('utf-8')) + pdu)
+
+
+def _decode_tlv(data: bytes, pos: int) -> Tuple[int, bytes, int]:
+    """Decode one TLV at pos; returns (tag, payload, next position)."""
+    tag = data[pos]
+    length = data[pos + 1]
+    pos += 2
+    if length & 0x80:
+        count = length & 0x7F
+        length = int.from_bytes(data[pos:pos + count], 'big')
+        pos += count
+    return tag, data[pos:pos + length], pos + length
+
+
+def _decode_oid(payload: bytes) -> str:
+    parts = [payload[0] // 40, payload[0] % 40]
+    value = 0
+    for byte in payload[1:]:
+        value = (value << 7) | (byte & 0x7F)
+        if not byte & 0x80:
+            parts.append(value)
+            value = 0
+    return '.'.join(str(part) for part in parts)
+
+
+def _decode_value(tag: int, payload: bytes):
+    if tag == TAG_INTEGER:
+        return int.from_bytes(payload, 'big', signed=True)
+    if tag in (TAG_COUNTER32, TAG_GAUGE32, TAG_TIMETICKS, TAG_COUNTER64):
+        return int.from_bytes(payload, 'big')
+    if tag in (TAG_NO_SUCH_OBJECT, TAG_NO_SUCH_INSTANCE, TAG_END_OF_MIB_VIEW):
+        return END_OF_VIEW
+    if tag == TAG_NULL:
+        return None
+    if tag == TAG_OID:
+        return _decode_oid(payload)
+    return payload
+
+
+def decode_message(data: bytes) -> Dict:
+    """
+    Decode an SNMPv2c message.
+
+    Args:
+        data: Raw datagram
+
+    Returns:
+        Dict with 'community', 'pdu_type', 'request_id', 'field1', 'field2'
+        and 'varbinds' (list of (oid, value) pairs)
+    """
+    _tag, message, _end = _decode_tlv(data, 0)
+    _tag, _version, pos = _decode_tlv(message, 0)
+    _tag, community, pos = _decode_tlv(message, pos)
+    pdu_type, pdu, _end = _decode_tlv(message, pos)
+
+    _tag, request_id, pos = _decode_tlv(pdu, 0)
+    _tag, field1, pos = _decode_tlv(pdu, pos)
+    _tag, field2, pos = _decode_tlv(pdu, pos)
+    _tag, bindings, _end = _decode_tlv(pdu, pos)
+
+    varbinds = []
+    pos = 0
+    while pos < len(bindings):
+        _tag, binding, pos = _decode_tlv(bindings, pos)
+        _tag, oid, inner = _decode_tlv(binding, 0)
+        value_tag, value, _end = _decode_tlv(binding, inner)
+        varbinds.append((_decode_oid(oid), _decode_value(value_tag, value)))
+
+    return {
+        'community': community.decode('utf-8', errors='replace'),
+        'pdu_type': pdu_type,
+        'request_id': int.from_bytes(request_id, 'big', signed=True),
+        'field1': int.from_bytes(field1, 'big', signed=True),
+        'field2': int.from_bytes(field2, 'big', signed=True),
+        'varbinds': varbinds,
+    }
+
+
+def oid_key(oid: str) -> Tuple[int, ...]:
+    """Sort key for OIDs (numeric, not lexical, order)."""
+    return tuple(int(part) for part in oid.strip('.').split('.'))
+
+
+class SnmpClient:
+    """Blocking SNMPv2c client for one agent."""
+
+    def __init__(self, host: str, community: str = 'public', port: int = 161,
+                 timeout: float = 2.0, retries: int = 1):
+        """
+        Initialize the client.
+
+        Args:
+            host: Agent address
+            community: Community string
+            port: Agent UDP port
+            timeout: Seconds to wait for each response
+            retries: Retransmissions after a timeout
+        """
+        self.host = host
+        self.community = community
+        self.port = port
+        self.timeout = timeout
+        self.retries = retries
+
+    def _request(self, pdu_type: int, varbinds, field1: int = 0, field2: int = 0) -> List:
+        """Send a request and return the response varbinds."""
+        request_id = int.from_bytes(os.urandom(3), 'big')
+        message = encode_message(self.community, pdu_type, request_id, varbinds, field1, field2)
+        family = socket.AF_INET6 if ':' in self.host else socket.AF_INET
+        with socket.socket(family, socket.SOCK_DGRAM) as sock:
+            sock.settimeout(self.timeout)
+            for _attempt in range(self.retries + 1):
+                sock.sendto(message, (self.host, self.port))
+                try:
+                    while True:
+                        data, _addr = sock.recvfrom(65535)
+                        response = decode_message(data)
+                        if response['request_id'] == request_id:
+                            break
+                except socket.timeout:
+                    continue
+                if response['field1']:
+                    raise RuntimeError(f"SNMP error status {response['field1']} from {self.host}")
+                return response['varbinds']
+        raise TimeoutError(f"No SNMP response from {self.host}")
+
+    def get(self, oids: List[str]) -> Dict[str, object]:
+        """
+        Fetch single values.
+
+        Args:
+            oids: OIDs to fetch
+
+        Returns:
+            Dictionary mapping OIDs to values (missing ones are left out)
+        """
+        varbinds = self._request(PDU_GET, [(oid, None) for oid in oids])
+        return {oid: value for oid, value in varbinds if value is not END_OF_VIEW}
+
+    def bulk_walk(self, columns: List[str], max_repetitions: int = 25) -> Dict[str, Dict[int, object]]:
+        """
+        Walk table columns with GETBULK.
+
+        Args:
+            columns: Column OIDs (e.g. ifHCInOctets)
+            max_repetitions: Rows requested per round trip
+
+        Returns:
+            Dictionary mapping each column to {row index: value}
+        """
+        results = {column: {} for column in columns}
+        cursors = {column: column for column in columns}
+        while cursors:
+            active = list(cursors)
+            varbinds = self._request(PDU_GETBULK, [(cursors[c], None) for c in active],
+                                     0, max_repetitions)
+            if not varbinds:
+                break
+            finished = set()
+            # Responses are row-major: repetition by repetition, one varbind per column
+            for i, (oid, value) in enumerate(varbinds):
+                column = active[i % len(active)]
+                if column in finished:
+                    continue
+                prefix = column + '.'
+                # Stop at the end of the column (or if the agent stops advancing)
+                if (value is END_OF_VIEW or not oid.startswith(prefix)
+                        or oid_key(oid) <= oid_key(cursors[column])):
+                    finished.add(column)
+                    continue
+                index = oid[len(prefix):]
+                if '.' not in index:
+                    results[column][int(index)] = value
+                cursors[column] = oid
+            for column in finished:
+                cursors.pop(column, None)
+        return results
@@ -5,27 +5,46 @@ Desktop application to manage network switch via web console.
 """
 
 import sys
+
+# Argument that makes the application executable act as the webview launcher
+WEBVIEW_WORKER_ARG = '--webview-worker'
+
+if __name__ == "__main__" and sys.argv[1:2] == [WEBVIEW_WORKER_ARG]:
+    # Bundled builds start their console windows by re-running themselves;
+    # dispatch before Tk and the tray are imported to keep the launch fast
+    from webview_launcher import main as webview_worker_main
+    sys.exit(webview_worker_main(sys.argv[2:]))
+
 import os
+import json
 import webview
 import threading
+import time
 import tkinter as tk
 from tkinter import ttk, messagebox
 import webbrowser
-import requests
 from urllib.parse import urlparse
-from requests.adapters import HTTPAdapter
+import requests
 import subprocess
 from switch_storage import SwitchStorage
-
-# Try to import Retry - handle different urllib3 versions
-try:
-    from urllib3.util.retry import Retry
-except ImportError:
-    try:
-        from requests.packages.urllib3.util.retry import Retry
-    except ImportError:
-        # Fallback: define a simple retry strategy
-        Retry = None
+from launch_scheduler import LaunchScheduler
+from webview_profiles import WebviewProfiles
+from console_proxy import ConsoleProxy
+from credential_vault import CredentialVault
+from http_session import create_session
+from host_health import HostHealth
+from endpoint_detect import EndpointDetector
+from manager_registry import ManagerRegistry
+from ui_dispatcher import UIDispatcher
+from ui_snapshot import UISnapshot
+from site_agent import AggregatorClient
+from device_facts import FactsCollector, describe as describe_facts, search_text, summary as facts_summary
+from fleet_probe import ProbeResult
+from result_sinks import pipeline_from_specs
+from alert_engine import AlertEngine, HealthIconCache, HEALTH_UNKNOWN
+from inventory_sync import SyncClient
+from tls_sessions import TLSSessionCache, pins_from_switches, request_timing
+from runtime_profiler import RuntimeProfiler, install_signal_handlers, remove_pid_file
 
 # Try to import PIL for icon support
 try:
@@ -41,37 +60,204 @@ try:
 except ImportError:
     HAS_PYSTRAY = False
 
+# Host timing, TLS sessions and detected endpoints are per host/address, so managers share them
+_shared_health = HostHealth()
+_shared_tls = TLSSessionCache()
+_shared_detector = EndpointDetector()
+
+def webview_launcher_command():
+    """
+    Get the command that starts a webview launcher process.
+    
+    Bundled builds (PyInstaller/AppImage) have no system Python to rely on,
+    so they run their own executable in webview worker mode.
+    
+    Returns:
+        Argument list; the launcher arguments are appended to it
+    """
+    if getattr(sys, 'frozen', False):
+        return [sys.executable, WEBVIEW_WORKER_ARG]
+    return [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'webview_launcher.py')]
+
+# More separate edits than this and the switch list is refilled in one go
+# (each edit is a Tk call; one delete and one insert are cheaper then)
+MAX_ROW_EDITS = 200
+
+# The switch list is filtered once typing in the search field pauses this long
+SEARCH_DELAY_MS = 150
+
+def row_edits(old_rows, new_rows):
+    """
+    Find the edits turning one list of (name, text) rows into another.
+    
+    The rows are sorted by name, so one merge walk over both lists finds them
+    in linear time. Any order gives a correct result, just more edits.
+    
+    Args:
+        old_rows: Rows currently shown
+        new_rows: Rows to show
+        
+    Returns:
+        List of (start, end, texts) in ascending order: old rows start..end-1
+        are replaced by texts
+    """
+    edits = []
+    start = None
+    texts = []
+    i = j = 0
+    while i < len(old_rows) or j < len(new_rows):
+        if i < len(old_rows) and j < len(new_rows) and old_rows[i] == new_rows[j]:
+            if start is not None:
+                edits.append((start, i, texts))
+                start, texts = None, []
+            i += 1
+            j += 1
+            continue
+        if start is None:
+            start = i
+        if j == len(new_rows) or (i < len(old_rows) and old_rows[i][0] < new_rows[j][0]):
+            # Row removed
+            i += 1
+        elif i == len(old_rows) or new_rows[j][0] < old_rows[i][0]:
+            # Row added
+            texts.append(new_rows[j][1])
+            j += 1
+        else:
+            # Same switch, new text
+            texts.append(new_rows[j][1])
+            i += 1
+            j += 1
+    if start is not None:
+        edits.append((start, i, texts))
+    return edits
+
 class SwitchManager:
-    def __init__(self, initial_url="http://192.168.2.1/", switch_name=None):
+    def __init__(self, initial_url="http://192.168.2.1/", switch_name=None, profile_dir=None):
         self.switch_url = initial_url
         self.switch_name = switch_name or "Switch"
+        # Persistent webview storage (cache, cookies, localStorage) for this switch
+        self.profile_dir = profile_dir
+        # Optional local caching reverse proxy (ConsoleProxy) for console traffic
+        self.proxy = None
+        # Optional CredentialVault for console auto-login
+        self.vault = None
+        # Optional SinkPipeline receiving connection check/test results
+        self.result_sink = None
+        # Optional callback(ProbeResult) after each connection check/test
+        self.on_probe = None
         self.window = None
         self.webview_process = None
         self.webview_running = False
+        # URL the running console window was last pointed at, and the lock
+        # serializing commands sent to it (see _send_control)
+        self._console_loaded_url = None
+        self._control_lock = threading.Lock()
+        
+        # Console launch timing (set when the launcher reports the page loaded)
+        self.ready_event = threading.Event()
+        self.launch_started_at = None
+        # Seconds spent starting the launcher process, and until the page loaded
+        self.launch_spawn_seconds = None
+        self.time_to_open = None
+        # Set while queued in a LaunchScheduler batch, so the manager is not
+        # evicted before its console is spawned
+        self.launch_pending = False
+        
+        # HTTP session, created on first use (see the session property)
+        self._session = None
+        
+        # Adaptive per-host timeouts and circuit breaker
+        self.health = _shared_health
+        
+        # Resumed TLS sessions and pinned certificates (set before the session is created)
+        self.tls = _shared_tls
+        
+        # Scheme/port detection for addresses entered without a scheme
+        self.detector = _shared_detector
+        self.on_url_detected = None
+        self._detection = None
+        self._detecting = None
+        
+    @property
+    def session(self):
+        """Optimized session for faster requests (no automatic retries: failed
+        checks back off per host instead, see HostHealth)."""
+        if self._session is None:
+            self._session = create_session(retries=0, tls=self.tls)
+        return self._session
+    
+    def close(self):
+        """Release the HTTP session; the manager stays usable and recreates it on demand."""
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+    
+    def is_idle(self):
+        """Check whether the manager can be dropped (no console open or queued, no detection running)."""
+        return not self.launch_pending and not self.is_console_open() and not self._detection_pending()
+    
+    def _timed_get(self, url):
+        """GET the response headers of url with the host's adaptive timeout, recording the outcome.
+        
+        Any HTTP response (also 429/5xx) means the host is alive; only connection
+        errors and timeouts count against its circuit."""
+        host = urlparse(url).netloc
+        self.tls.begin()
+        started = time.monotonic()
+        try:
+            response = self.session.get(url, timeout=self.health.timeout(host), stream=True)
+        except (requests.ConnectionError, requests.Timeout):
+            self.health.record_failure(host)
+            raise
+        self.health.record_success(host, time.monotonic() - started)
+        return response
+    
+    def _probe(self, respect_circuit=True):
+        """
+        Check once whether the switch answers 200 (blocking).
         
-        # Create optimized session for faster requests
-        self.session = requests.Session()
-        if Retry is not None:
-            retry_strategy = Retry(
-                total=1,
-                backoff_factor=0.1,
-                status_forcelist=[429, 500, 502, 503, 504],
-            )
-            adapter = HTTPAdapter(max_retries=retry_strategy)
-            self.session.mount("http://", adapter)
-            self.session.mount("https://", adapter)
-        
+        Args:
+            respect_circuit: Report hosts whose circuit is open as down without a request
+            
+        Returns:
+            ProbeResult
+        """
+        if respect_circuit and not self.health.allow(urlparse(self.switch_url).netloc):
+            return ProbeResult(self.switch_name, False, None, None, 'Host down (circuit open)', time.time())
+        started = time.monotonic()
+        try:
+            # Only read headers, not full body (faster)
+            response = self._timed_get(self.switch_url)
+            finished = time.monotonic()
+            handshake, ttfb = request_timing(self.tls, started, finished)
+            status_code = response.status_code
+            response.close()
+        except Exception as e:
+            return ProbeResult(self.switch_name, False, None, None, str(e), time.time())
+        return ProbeResult(self.switch_name, status_code == 200, status_code, finished - started, None,
+                           time.time(), handshake, ttfb)
+    
+    def _emit_result(self, result, source):
+        """Hand a probe result to on_probe and the result sinks, if any (never blocks for long)."""
+        if self.on_probe is not None:
+            try:
+                self.on_probe(result)
+            except Exception as e:
+                print(f"Error handling probe result: {e}")
+        if self.result_sink is not None:
+            try:
+                self.result_sink.emit(result, source)
+            except Exception as e:
+                print(f"Error emitting probe result: {e}")
+    
     def check_connection(self, callback=None):
         """Check if switch is reachable (async)."""
         def _check():
-            try:
-                # Use shorter timeout for faster response
-                response = self.session.get(self.switch_url, timeout=1.5, stream=True)
-                # Only read headers, not full body (faster)
-                result = response.status_code == 200
-                response.close()
-            except:
-                result = False
+            self.wait_for_url()
+            # Hosts that keep failing are reported down without waiting for a timeout
+            probe = self._probe(respect_circuit=True)
+            self._emit_result(probe, 'check')
+            result = probe.reachable
             
             if callback:
                 callback(result)
@@ -84,13 +270,22 @@ class SwitchManager:
     
     def open_console(self, skip_check=False, gui_callback=None):
         """Open switch console in embedded webview."""
+        if self._detection_pending():
+            # Open once the endpoint is known instead of paying for a redirect or timeout
+            threading.Thread(
+                target=lambda: (self.wait_for_url(), self.open_console(skip_check, gui_callback)),
+                daemon=True
+            ).start()
+            return
+        
         # Allow multiple windows - check if THIS switch's webview is still running
         if self.webview_process is not None:
             # Check if process is still alive (poll() returns None if running)
             if self.webview_process.poll() is None:
-                # Window for this switch already exists and is running
-                # User can still open multiple switches, each switch gets its own window
-                # Just return to avoid duplicate windows for the same switch
+                # Reuse this switch's window: follow a changed URL and bring it
+                # to the front instead of paying for a new process
+                self.follow_url()
+                self.focus_console()
                 return
             else:
                 # Process has ended, reset state
@@ -131,147 +326,47 @@ class SwitchManager:
             self.webview_running = False
             self.webview_process = None
             self.webview_running = True
-            # Get the directory where this script is located (core folder)
-            # Handle both normal execution and PyInstaller bundled execution
-            launcher_script = None
-            
-            if getattr(sys, 'frozen', False):
-                # Running as bundled executable (PyInstaller/AppImage)
-                # Try multiple locations for webview_launcher.py
-                possible_paths = []
-                
-                # 1. In _MEIPASS/core (PyInstaller temp folder)
-                if hasattr(sys, '_MEIPASS'):
-                    possible_paths.append(os.path.join(sys._MEIPASS, 'core', 'webview_launcher.py'))
-                
-                # 2. Next to executable in core/ folder
-                exe_dir = os.path.dirname(sys.executable)
-                possible_paths.append(os.path.join(exe_dir, 'core', 'webview_launcher.py'))
-                
-                # 3. In usr/bin (AppImage structure)
-                possible_paths.append(os.path.join(exe_dir, 'usr', 'bin', 'webview_launcher.py'))
-                
-                # 4. In same directory as executable
-                possible_paths.append(os.path.join(exe_dir, 'webview_launcher.py'))
-                
-                # Try each path
-                for path in possible_paths:
-                    if os.path.exists(path):
-                        launcher_script = path
-                        break
-            else:
-                # Normal Python execution
-                script_dir = os.path.dirname(os.path.abspath(__file__))
-                launcher_script = os.path.join(script_dir, 'webview_launcher.py')
-            
-            # If still not found, try current working directory
-            if not launcher_script or not os.path.exists(launcher_script):
-                cwd_script = os.path.join(os.getcwd(), 'core', 'webview_launcher.py')
-                if os.path.exists(cwd_script):
-                    launcher_script = cwd_script
-                else:
-                    launcher_script = None
-            
-            # Determine which executable to use for running the launcher
-            # For bundled executables, we need system Python, not the bundled app
-            import shutil
-            
-            if getattr(sys, 'frozen', False):
-                # We're bundled - find system Python
-                python_exe = None
-                for python_cmd in ['python3', 'python']:
-                    if shutil.which(python_cmd):
-                        python_exe = python_cmd
-                        break
-            else:
-                # Not bundled - use sys.executable (which is Python)
-                python_exe = sys.executable
+            self.ready_event.clear()
+            self.time_to_open = None
+            self.launch_spawn_seconds = None
+            self.launch_started_at = time.monotonic()
+            # Saved login and cached session for auto-login (None if not configured)
+            login = self._login_payload()
+            self._console_loaded_url = self.console_url()
+            # stdin stays open as the window's control channel; stderr goes to
+            # ours, since nothing would drain a pipe
+            self.webview_process = subprocess.Popen(
+                webview_launcher_command() + self._launcher_args(login),
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE
+            )
+            self.launch_spawn_seconds = time.monotonic() - self.launch_started_at
             
-            # Run webview in a subprocess
-            if launcher_script and os.path.exists(launcher_script):
-                if python_exe:
-                    # Use launcher script with Python
-                    try:
-                        self.webview_process = subprocess.Popen(
-                            [python_exe, launcher_script, self.switch_url, self.switch_name],
-                            stdout=subprocess.PIPE,
-                            stderr=subprocess.PIPE,
-                            cwd=os.path.dirname(launcher_script) if launcher_script else None
-                        )
-                    except Exception as e:
-                        print(f"Error launching webview with launcher: {e}")
-                        python_exe = None  # Fall through to temp script
-                else:
-                    # No Python found - try to make launcher executable and run directly
-                    try:
-                        os.chmod(launcher_script, 0o755)
-                        self.webview_process = subprocess.Popen(
-                            [launcher_script, self.switch_url, self.switch_name],
-                            stdout=subprocess.PIPE,
-                            stderr=subprocess.PIPE,
-                            cwd=os.path.dirname(launcher_script) if launcher_script else None
-                        )
-                    except Exception as e:
-                        print(f"Error running launcher directly: {e}")
-                        python_exe = None  # Fall through to temp script
+            # Monitor process in background
+            process = self.webview_process
             
-            # Fallback: create temporary script (works for both bundled and non-bundled)
-            if not (launcher_script and os.path.exists(launcher_script) and self.webview_process):
-                import tempfile
-                
-                # Find Python for temp script
-                if not python_exe:
-                    for python_cmd in ['python3', 'python']:
-                        if shutil.which(python_cmd):
-                            python_exe = python_cmd
-                            break
-                
-                if not python_exe:
-                    raise RuntimeError("Python not found. Cannot launch webview.")
-                
-                # Create temp script that imports webview and runs it
-                temp_script = tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False)
-                window_title = f'YaP Switch Manager - {self.switch_name}'
-                temp_script.write(f'''#!/usr/bin/env python3
-import sys
-import webview
-url = "{self.switch_url}"
-try:
-    window = webview.create_window('{window_title}', url, width=1200, height=800, min_size=(800, 600), resizable=True)
-    webview.start(debug=False)
-except Exception as e:
-    print(f"Error: {{e}}", file=sys.stderr)
-    sys.exit(1)
-''')
-                temp_script.close()
-                # Make executable
-                os.chmod(temp_script.name, 0o755)
-                
+            # Hand credentials to the launcher over stdin (never on the command line)
+            if login is not None and process.stdin is not None:
                 try:
-                    # Run with Python explicitly
-                    self.webview_process = subprocess.Popen(
-                        [python_exe, temp_script.name],
-                        stdout=subprocess.PIPE,
-                        stderr=subprocess.PIPE
-                    )
+                    process.stdin.write((json.dumps(login) + '\n').encode('utf-8'))
+                    process.stdin.flush()
                 except Exception as e:
-                    print(f"Error launching webview fallback: {e}")
-                    # Clean up temp file
-                    try:
-                        os.unlink(temp_script.name)
-                    except:
-                        pass
-                    raise
+                    print(f"Error sending login to webview: {e}")
             
-            # Monitor process in background
             def monitor_process():
                 try:
-                    self.webview_process.wait()
+                    for line in process.stdout:
+                        self._handle_launcher_message(line.strip())
+                    process.wait()
                 except Exception:
                     pass
                 finally:
-                    self.webview_running = False
-                    self.webview_process = None
+                    if self.webview_process is process:
+                        # Wake anyone waiting for readiness (time_to_open stays None)
+                        self.ready_event.set()
+                        self.webview_running = False
+                        self.webview_process = None
+                        self._console_loaded_url = None
             
             threading.Thread(target=monitor_process, daemon=True).start()
         except Exception as e:
@@ -284,21 +379,155 @@ except Exception as e:
             # They can use "Open in Browser" button if needed
             raise RuntimeError(f"Failed to open embedded console: {e}")
     
+    def _launcher_args(self, login=None):
+        """Build the webview_launcher.py arguments for this switch."""
+        args = [self._console_loaded_url or self.console_url(), self.switch_name, '--control']
+        if self.profile_dir:
+            args += ['--profile-dir', self.profile_dir]
+        if login is not None:
+            args.append('--auto-login')
+        return args
+    
+    def _login_payload(self):
+        """Get saved credentials and any still-valid session cookies for auto-login."""
+        if self.vault is None:
+            return None
+        credentials = self.vault.get_credentials(self.switch_name)
+        if not credentials:
+            return None
+        payload = dict(credentials)
+        payload['cookies'] = self.vault.get_session(self.switch_name) or []
+        return payload
+    
+    def _handle_launcher_message(self, line):
+        """Handle one status line printed by the webview launcher."""
+        if line == b'READY':
+            # The console page has loaded
+            if not self.ready_event.is_set():
+                self.time_to_open = time.monotonic() - self.launch_started_at
+                self.ready_event.set()
+        elif line.startswith(b'SESSION ') and self.vault is not None:
+            # Auto-login succeeded: cache the session for the next open
+            try:
+                cookies = json.loads(line[len(b'SESSION '):].decode('utf-8'))
+                self.vault.store_session(self.switch_name, cookies)
+            except ValueError as e:
+                print(f"Invalid session from webview: {e}")
+        elif line == b'LOGIN_FAILED' and self.vault is not None:
+            self.vault.clear_session(self.switch_name)
+    
+    def is_console_open(self):
+        """Return True if this switch's console window is still running."""
+        return self.webview_process is not None and self.webview_process.poll() is None
+    
+    def _send_control(self, action, **fields):
+        """
+        Send one command to the running console window.
+        
+        Returns:
+            True if sent, False if no window is running or it stopped listening
+        """
+        process = self.webview_process
+        if process is None or process.poll() is not None or process.stdin is None:
+            return False
+        command = dict(fields, action=action)
+        try:
+            with self._control_lock:
+                process.stdin.write((json.dumps(command) + '\n').encode('utf-8'))
+                process.stdin.flush()
+        except (OSError, ValueError) as e:
+            print(f"Error controlling console of {self.switch_name}: {e}")
+            return False
+        return True
+    
+    def focus_console(self):
+        """Bring the running console window to the front; False if none is running."""
+        return self._send_control('focus')
+    
+    def reload_console(self):
+        """Reload the page in the running console window; False if none is running."""
+        return self._send_control('reload')
+    
+    def close_console(self):
+        """Ask the running console window to close; False if none is running."""
+        return self._send_control('close')
+    
+    def navigate_console(self, url):
+        """
+        Point the running console window at another URL.
+        
+        The launch timing restarts, so wait_until_ready() reports the new page load.
+        
+        Returns:
+            True if sent, False if no window is running
+        """
+        ready_set = self.ready_event.is_set()
+        self.ready_event.clear()
+        started_at, self.launch_started_at = self.launch_started_at, time.monotonic()
+        if not self._send_control('navigate', url=url):
+            self.launch_started_at = started_at
+            if ready_set:
+                self.ready_event.set()
+            return False
+        self.time_to_open = None
+        self._console_loaded_url = url
+        return True
+    
+    def follow_url(self):
+        """
+        Move the running console window to the current console URL if it changed.
+        
+        Returns:
+            None if nothing needed doing, else whether the window was moved
+        """
+        detection = self._detection
+        if not self.is_console_open() or (self._detection_pending() and detection is not threading.current_thread()):
+            return None
+        url = self.console_url()
+        if url == self._console_loaded_url:
+            return None
+        return self.navigate_console(url)
+    
+    def wait_until_ready(self, timeout=None):
+        """
+        Block until the console reports its page has loaded.
+        
+        Returns:
+            Seconds from launch to first page load, or None on timeout/exit
+        """
+        if self.ready_event.wait(timeout):
+            return self.time_to_open
+        return None
+    
+    def console_url(self):
+        """Get the URL consoles should load, routed through the proxy if enabled."""
+        if self.proxy is not None:
+            try:
+                return self.proxy.proxy_url(self.switch_url)
+            except Exception as e:
+                print(f"Console proxy unavailable, connecting directly: {e}")
+        return self.switch_url
+    
     def open_in_browser(self):
         """Open switch console in external browser."""
-        webbrowser.open(self.switch_url)
+        if self._detection_pending():
+            threading.Thread(
+                target=lambda: (self.wait_for_url(), webbrowser.open(self.console_url())),
+                daemon=True
+            ).start()
+            return
+        webbrowser.open(self.console_url())
     
     def test_connection(self, callback=None):
         """Test connection to switch (async)."""
         def _test():
-            try:
-                # Use optimized session with shorter timeout
-                response = self.session.get(self.switch_url, timeout=1.5, stream=True)
-                result = response.status_code == 200
-                response.close()
-            except Exception as e:
-                print(f"Connection test error: {e}")  # Debug output
-                result = False
+            self.wait_for_url()
+            # Explicit tests always try, even if the host's circuit is open
+            probe = self._probe(respect_circuit=False)
+            self._emit_result(probe, 'test')
+            if probe.error:
+                print(f"Connection test error: {probe.error}")  # Debug output
+            result = probe.reachable
             
             if callback:
                 try:
@@ -313,13 +542,61 @@ except Exception as e:
     
     def set_url(self, url):
         """Update the switch URL."""
+        # Without a scheme, use the endpoint detected earlier or detect it now
+        address = None
+        if url and not url.startswith(('http://', 'https://')):
+            detected = self.detector.cached(url)
+            if detected:
+                self._detecting = None
+                self.switch_url = detected
+                self.follow_url()
+                return
+            address = url
         # Ensure URL ends with /
         if url and not url.endswith('/'):
             url += '/'
-        # Ensure URL has protocol
+        # Ensure URL has protocol (provisional until detection finishes)
         if url and not url.startswith(('http://', 'https://')):
             url = 'http://' + url
         self.switch_url = url
+        if address:
+            self._detect_url(address, url)
+        else:
+            # A full URL overrides any detection still running
+            self._detecting = None
+            self.follow_url()
+    
+    def _detect_url(self, address, provisional):
+        """Detect the scheme/port of address in the background and switch to it."""
+        if self._detecting == address and self._detection_pending():
+            return
+        self._detecting = address
+        
+        def _detect():
+            detected = self.detector.detect(address)
+            # Ignore the result if the URL was changed meanwhile
+            if not detected or self._detecting != address:
+                return
+            self.switch_url = detected
+            self.follow_url()
+            if self.on_url_detected:
+                try:
+                    self.on_url_detected(self.switch_name, provisional, detected)
+                except Exception as e:
+                    print(f"Callback error: {e}")
+        
+        self._detection = threading.Thread(target=_detect, daemon=True)
+        self._detection.start()
+    
+    def _detection_pending(self):
+        """Check whether endpoint detection is still running."""
+        return self._detection is not None and self._detection.is_alive()
+    
+    def wait_for_url(self, timeout=None):
+        """Wait for a running endpoint detection to finish."""
+        detection = self._detection
+        if detection is not None and detection is not threading.current_thread():
+            detection.join(self.detector.timeout + 1 if timeout is None else timeout)
     
     def set_name(self, name):
         """Update the switch name."""
@@ -330,36 +607,124 @@ class SwitchManagerGUI:
     def __init__(self, root):
         self.root = root
         self.root.title("YaP Switch Manager")
-        self.root.geometry("560x680")
+        self.root.geometry("560x760")
         self.root.resizable(False, False)
         
         # System tray support
         self.tray_icon = None
         self.tray_thread = None
         self.hidden_to_tray = False
+        # Tray images per aggregate health level, and the level and counts shown
+        self.tray_images = None
+        self.tray_health = None
+        self.tray_counts = None
+        
+        # Alerts for switches going down or coming back (fed by connection
+        # checks and, if configured, site agent status)
+        self.alerts = AlertEngine(self._on_alert)
+        # Switches in the last site agent status
+        self._site_reported = set()
         
         # Configure modern styling
         style = ttk.Style()
         style.theme_use('clam')  # Modern theme
         
+        # Updates from worker threads are applied on the Tk thread, in batches
+        self.ui = UIDispatcher(root)
+        self.ui.start()
+        
         # Switch storage for saving/loading switches
         self.storage = SwitchStorage()
         
+        # Team inventory shared through a sync server (optional, see inventory_sync.py)
+        self.sync = None
+        sync_url = os.environ.get('YAP_SYNC_URL')
+        if sync_url:
+            self.sync = SyncClient(self.storage, sync_url, token=os.environ.get('YAP_SYNC_TOKEN'))
+        
+        # External storage changes not yet applied to the list (merged per UI tick)
+        self._pending_changes_lock = threading.Lock()
+        self._pending_changed = set()
+        self._pending_removed = set()
+        
+        # Persistent per-switch webview profiles (cache, cookies, localStorage)
+        self.profiles = WebviewProfiles()
+        
+        # Optional local caching proxy in front of switch consoles (started on demand)
+        self.console_proxy = None
+        
+        # Encrypted console logins and cached sessions
+        self.vault = CredentialVault()
+        
+        # Probe results streamed to files, syslog, sockets or webhooks (optional)
+        self.result_sinks = pipeline_from_specs(os.environ.get('YAP_RESULT_SINKS', '').split(','))
+        
+        # Response times and circuit breakers of all switch hosts, shared by every manager
+        self.host_health = HostHealth()
+        
+        # TLS sessions and certificate pins of HTTPS switches, shared by managers and the console proxy
+        self.tls_sessions = TLSSessionCache()
+        
+        # Model, firmware, uptime and MAC of the saved switches (created on first refresh)
+        self.facts_collector = None
+        
+        # Endpoints detected for addresses entered without a scheme, shared by every manager
+        self.endpoint_detector = EndpointDetector()
+        
         # Track multiple switch manager instances (one per switch)
-        self.managers = {}  # Maps switch name to SwitchManager instance
+        # Created on demand, closed again when idle without an open console
+        self.managers = ManagerRegistry(
+            lambda name, url: SwitchManager(url, name, profile_dir=self.profiles.profile_dir(name))
+        )
         
         # Current active switch (for UI)
         self.current_switch_name = None
         self.current_manager = None
         
-        # Mapping from listbox index to switch name
+        # Mapping from listbox index to switch name, and the rows currently shown
         self.listbox_index_to_name = {}
+        self.listbox_rows = []
+        
+        # Rows of all saved switches and the text each is searched by (None
+        # until the inventory is loaded); searching only filters these
+        self.inventory_rows = []
+        self.search_index = None
+        self._search_after = None
+        
+        # Last rendered list, painted at startup before the inventory is loaded
+        self.ui_snapshot = UISnapshot(self.storage.storage_file)
+        
+        # Reachability reported by site agents (see site_agent.py)
+        self.site_status = {}
+        
+        # Staggered launcher for opening several consoles at once
+        self.launch_scheduler = LaunchScheduler(max_concurrent=3, stagger=0.5)
+        
+        # On-demand CPU profile and heap tracing (tray menu, or SIGUSR1/SIGUSR2)
+        self.profiler = RuntimeProfiler(state=self._diagnostic_state)
+        install_signal_handlers(lambda: self.ui.post(self.toggle_profiling),
+                                lambda: self.ui.post(self.toggle_heap_tracing))
         
         # Setup UI first (faster)
         self.create_widgets()
         
-        # Load saved switches
-        self.load_saved_switches()
+        # Paint the list as it was last time; the saved switches are loaded in
+        # the background and only the rows that changed are updated
+        snapshot = self.ui_snapshot.load()
+        if snapshot:
+            # Cached status only means something while an aggregator is configured
+            if os.environ.get('YAP_AGGREGATOR_URL'):
+                self.site_status = snapshot.status
+            self._show_rows(snapshot.rows)
+        threading.Thread(target=self._load_inventory, daemon=True).start()
+        
+        # Reachability reported by site agents through a central aggregator (optional)
+        self.aggregator = None
+        aggregator_url = os.environ.get('YAP_AGGREGATOR_URL')
+        if aggregator_url:
+            self.aggregator = AggregatorClient(aggregator_url, token=os.environ.get('YAP_AGENT_TOKEN'))
+            self.aggregator.watch(self._on_site_status)
+        self.root.after(1000, self._alert_tick)
         
         # Center the window on primary monitor (non-blocking, after widgets are created)
         def center_window():
@@ -571,6 +936,15 @@ class SwitchManagerGUI:
         saved_frame = ttk.LabelFrame(main_frame, text="Saved Switches", padding="10")
         saved_frame.pack(fill=tk.BOTH, expand=True, pady=(0, 10))
         
+        # Search by name, URL or collected facts (model, firmware, MAC)
+        search_frame = ttk.Frame(saved_frame)
+        search_frame.pack(fill=tk.X, pady=(0, 6))
+        ttk.Label(search_frame, text="Search:").pack(side=tk.LEFT)
+        self.search_var = tk.StringVar()
+        search_entry = ttk.Entry(search_frame, textvariable=self.search_var, font=("Segoe UI", 9))
+        search_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(8, 0))
+        self.search_var.trace_add('write', self._on_search_changed)
+        
         # Listbox with scrollbar for saved switches
         listbox_frame = ttk.Frame(saved_frame)
         listbox_frame.pack(fill=tk.BOTH, expand=True)
@@ -582,6 +956,7 @@ class SwitchManagerGUI:
             listbox_frame,
             font=("Segoe UI", 9),
             yscrollcommand=scrollbar.set,
+            selectmode=tk.EXTENDED,
             height=6
         )
         self.switches_listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
@@ -593,12 +968,20 @@ class SwitchManagerGUI:
         saved_buttons_frame.pack(fill=tk.X, pady=(10, 0))
         saved_buttons_frame.columnconfigure(0, weight=1)
         saved_buttons_frame.columnconfigure(1, weight=1)
+        saved_buttons_frame.columnconfigure(2, weight=1)
+        saved_buttons_frame.columnconfigure(3, weight=1)
         
         load_btn = ttk.Button(saved_buttons_frame, text="Load", command=self.load_selected_switch)
         load_btn.grid(row=0, column=0, sticky=(tk.W, tk.E), padx=(0, 4), pady=2)
         
+        open_selected_btn = ttk.Button(saved_buttons_frame, text="Open Selected", command=self.open_selected_switches)
+        open_selected_btn.grid(row=0, column=1, sticky=(tk.W, tk.E), padx=4, pady=2)
+        
         delete_btn = ttk.Button(saved_buttons_frame, text="Delete", command=self.delete_selected_switch)
-        delete_btn.grid(row=0, column=1, sticky=(tk.W, tk.E), padx=(4, 0), pady=2)
+        delete_btn.grid(row=0, column=2, sticky=(tk.W, tk.E), padx=4, pady=2)
+        
+        facts_btn = ttk.Button(saved_buttons_frame, text="Refresh Facts", command=self.refresh_facts)
+        facts_btn.grid(row=0, column=3, sticky=(tk.W, tk.E), padx=(4, 0), pady=2)
         
         # Switch configuration frame
         config_frame = ttk.LabelFrame(main_frame, text="Add/Edit Switch", padding="12")
@@ -619,13 +1002,26 @@ class SwitchManagerGUI:
         url_entry.grid(row=1, column=1, sticky=(tk.W, tk.E), padx=(8, 0), pady=4)
         url_entry.bind('<Return>', lambda e: self.save_switch())
         
+        # Optional console login (stored encrypted, used for auto-login)
+        ttk.Label(config_frame, text="Username:", font=("Segoe UI", 9, "bold")).grid(row=2, column=0, sticky=tk.W, pady=4)
+        self.username_var = tk.StringVar()
+        username_entry = ttk.Entry(config_frame, textvariable=self.username_var, font=("Segoe UI", 9))
+        username_entry.grid(row=2, column=1, sticky=(tk.W, tk.E), padx=(8, 0), pady=4)
+        username_entry.bind('<Return>', lambda e: self.save_switch())
+        
+        ttk.Label(config_frame, text="Password:", font=("Segoe UI", 9, "bold")).grid(row=3, column=0, sticky=tk.W, pady=4)
+        self.password_var = tk.StringVar()
+        password_entry = ttk.Entry(config_frame, textvariable=self.password_var, font=("Segoe UI", 9), show="•")
+        password_entry.grid(row=3, column=1, sticky=(tk.W, tk.E), padx=(8, 0), pady=4)
+        password_entry.bind('<Return>', lambda e: self.save_switch())
+        
         # Status label
         self.status_label = ttk.Label(config_frame, text="", font=("Segoe UI", 8))
-        self.status_label.grid(row=2, column=0, columnspan=2, sticky=tk.W, pady=(4, 0))
+        self.status_label.grid(row=4, column=0, columnspan=2, sticky=tk.W, pady=(4, 0))
         
         # Save button
         save_btn_frame = ttk.Frame(config_frame)
-        save_btn_frame.grid(row=3, column=0, columnspan=2, pady=(10, 0))
+        save_btn_frame.grid(row=5, column=0, columnspan=2, pady=(10, 0))
         save_btn = ttk.Button(save_btn_frame, text="Save Switch", command=self.save_switch)
         save_btn.pack(pady=2)
         
@@ -658,6 +1054,15 @@ class SwitchManagerGUI:
         )
         test_btn.grid(row=1, column=1, sticky=(tk.W, tk.E), padx=(4, 2), pady=5)
         
+        # Route consoles through the local caching proxy
+        self.use_proxy_var = tk.BooleanVar(value=False)
+        proxy_check = ttk.Checkbutton(
+            buttons_frame,
+            text="Use local caching proxy",
+            variable=self.use_proxy_var
+        )
+        proxy_check.grid(row=2, column=0, columnspan=2, sticky=tk.W, padx=2, pady=(0, 5))
+        
         # Footer
         footer_label = ttk.Label(
             main_frame,
@@ -668,16 +1073,198 @@ class SwitchManagerGUI:
         footer_label.pack(side=tk.BOTTOM, pady=(4, 0))
     
     def load_saved_switches(self):
-        """Load saved switches into the listbox."""
+        """Re-read the saved switches and show those matching the search."""
+        self._set_inventory(*self._inventory_rows(self.storage.load_switches()))
+    
+    @staticmethod
+    def _inventory_rows(switches):
+        """
+        Build the (name, display text) rows of the switch list.
+        
+        Returns:
+            Tuple of (rows sorted by name, {name: text the switch is searched by})
+        """
+        rows = []
+        index = {}
+        for switch_name in sorted(switches.keys()):
+            switch_data = switches[switch_name]
+            text = f"{switch_name} - {switch_data.get('url', 'N/A')}"
+            facts = facts_summary(switch_data)
+            rows.append((switch_name, f"{text} · {facts}" if facts else text))
+            index[switch_name] = search_text(switch_name, switch_data)
+        return rows, index
+    
+    def _set_inventory(self, rows, index):
+        """Keep the rows of all saved switches and show those matching the search."""
+        self.inventory_rows = rows
+        self.search_index = index
+        self._show_rows(self._filter_rows(self.search_var.get()))
+    
+    def _filter_rows(self, query):
+        """Get the inventory rows matching every word of a search query (case-insensitive)."""
+        terms = query.lower().split()
+        if not terms:
+            return self.inventory_rows
+        index = self.search_index
+        return [row for row in self.inventory_rows if all(term in index[row[0]] for term in terms)]
+    
+    def _on_search_changed(self, *args):
+        """Filter the list once typing pauses (search field trace, Tk thread)."""
+        if self._search_after is not None:
+            self.root.after_cancel(self._search_after)
+        self._search_after = self.root.after(SEARCH_DELAY_MS, self._apply_search)
+    
+    def _apply_search(self):
+        """Show the rows matching the search, without re-reading the inventory."""
+        self._search_after = None
+        if self.search_index is None:
+            # Still loading; the search is applied once the inventory is there
+            return
+        self._show_rows(self._filter_rows(self.search_var.get()))
+    
+    def _show_rows(self, rows):
+        """Show rows in the listbox, only touching the rows that differ from the current ones."""
+        edits = row_edits(self.listbox_rows, rows)
+        if len(edits) > MAX_ROW_EDITS:
+            # Scattered changes (e.g. a search filter): refill instead
+            self.switches_listbox.delete(0, tk.END)
+            if rows:
+                self.switches_listbox.insert(0, *[text for _name, text in rows])
+            edits = []
+        # Apply from the end so earlier indices stay valid
+        for start, end, texts in reversed(edits):
+            if end > start:
+                self.switches_listbox.delete(start, end - 1)
+            if texts:
+                self.switches_listbox.insert(start, *texts)
+        self.listbox_rows = list(rows)
+        self.listbox_index_to_name = {idx: name for idx, (name, _text) in enumerate(rows)}
+        self._color_switch_entries()
+    
+    def _load_inventory(self):
+        """Load the saved switches in the background, then reconcile the list (startup)."""
         switches = self.storage.load_switches()
-        self.switches_listbox.delete(0, tk.END)
-        self.listbox_index_to_name = {}
+        self.tls_sessions.set_pins(pins_from_switches(switches))
+        rows, index = self._inventory_rows(switches)
+        self.ui.post(self._finish_inventory_load, rows, index)
+        # Pick up switches saved or deleted by other running instances (and,
+        # when syncing, by the rest of the team)
+        if self.sync:
+            self.sync.start(self._on_storage_changed)
+        else:
+            self.storage.watch(self._on_storage_changed)
+    
+    def _finish_inventory_load(self, rows, index):
+        """Apply the loaded inventory and refresh the snapshot for the next start."""
+        self._set_inventory(rows, index)
+        self._save_ui_snapshot()
+    
+    def _save_ui_snapshot(self):
+        """Store the whole list (also while it is filtered) for the next start's first paint."""
+        if self.search_index is None:
+            # Not loaded yet: the snapshot on disk is still what is shown
+            return
+        self.ui_snapshot.save(self.inventory_rows, self.site_status)
+    
+    def _on_site_status(self, reachability):
+        """Handle new site agent status (called from the aggregator polling thread)."""
+        # Switches no longer reported by any site (checked ones stay tracked)
+        reported = set(reachability)
+        self.alerts.forget(self._site_reported - reported)
+        self._site_reported = reported
+        self.alerts.observe_all(reachability, self.aggregator.switch_sites())
+        self.ui.update('site_status', self._apply_site_status, reachability)
+    
+    def _apply_site_status(self, reachability):
+        """Store the reported reachability and recolor the list."""
+        self.site_status = reachability
+        self._color_switch_entries()
+    
+    def _on_probe_result(self, result):
+        """Feed a connection check/test into the alerts (called from the checking thread)."""
+        self.alerts.observe(result.name, result.reachable)
+    
+    def _alert_tick(self):
+        """Send due alerts and refresh the tray's health badge and title (every second)."""
+        self.alerts.tick()
+        if self.tray_icon and self.tray_images:
+            counts = self.alerts.counts()
+            health = self.alerts.health()
+            try:
+                # The title follows every count; the icon only changes with the level
+                if counts != self.tray_counts:
+                    self.tray_counts = counts
+                    self.tray_icon.title = (f"YaP Switch Manager - {counts[True]} up, {counts[False]} down"
+                                            + (f", {counts[None]} unreported" if counts[None] else ""))
+                if health != self.tray_health:
+                    self.tray_health = health
+                    self.tray_icon.icon = self.tray_images.image(health)
+            except Exception as e:
+                print(f"Error updating tray icon: {e}")
+        self.root.after(1000, self._alert_tick)
+    
+    def _on_alert(self, alert):
+        """Show an alert as a desktop notification, or in the status line without a tray."""
+        if self.tray_icon:
+            try:
+                self.tray_icon.notify(alert.message, "YaP Switch Manager")
+                return
+            except Exception as e:
+                print(f"Error showing notification: {e}")
+        color = "#00AA00" if alert.kind == 'up' else "#CC0000"
+        self.status_label.config(text=f"⚠ {alert.message}" if alert.kind != 'up' else f"✓ {alert.message}",
+                                 foreground=color)
+    
+    def _color_switch_entries(self):
+        """Color saved switches by reported reachability: green up, red down, grey stale."""
+        if not self.site_status:
+            return
+        default = self.switches_listbox.cget('foreground')
+        colors = {True: "#00AA00", False: "#CC0000", None: "#999999"}
+        for idx, name in self.listbox_index_to_name.items():
+            if name in self.site_status:
+                color = colors[self.site_status[name]]
+            else:
+                color = default
+            self.switches_listbox.itemconfig(idx, foreground=color)
+    
+    def _on_storage_changed(self, changed, removed):
+        """Handle switches changed by another process (called from watcher thread)."""
+        with self._pending_changes_lock:
+            self._pending_changed |= set(changed)
+            self._pending_removed |= set(removed)
+        self.ui.update('storage', self._apply_pending_storage_changes)
+    
+    def _apply_pending_storage_changes(self):
+        """Apply all storage changes collected since the last UI tick at once."""
+        with self._pending_changes_lock:
+            changed, removed = self._pending_changed, self._pending_removed
+            self._pending_changed, self._pending_removed = set(), set()
+        if changed or removed:
+            self._apply_storage_changes(changed - removed, removed)
+    
+    def _apply_storage_changes(self, changed, removed):
+        """Refresh the list for external changes, keeping the current selection."""
+        selected = [self.listbox_index_to_name.get(i) for i in self.switches_listbox.curselection()]
+        self.load_saved_switches()
+        for idx, name in self.listbox_index_to_name.items():
+            if name in selected:
+                self.switches_listbox.selection_set(idx)
         
-        for idx, switch_name in enumerate(sorted(switches.keys())):
-            switch_data = switches[switch_name]
-            display_text = f"{switch_name} - {switch_data.get('url', 'N/A')}"
-            self.switches_listbox.insert(tk.END, display_text)
-            self.listbox_index_to_name[idx] = switch_name
+        # Certificate pins follow the inventory
+        self.tls_sessions.set_pins(pins_from_switches(self.storage.load_switches()))
+        
+        # Keep existing managers pointed at the updated URLs
+        for name in changed:
+            manager = self.managers.peek(name)
+            switch_data = self.storage.get_switch(name)
+            if manager is not None and switch_data:
+                manager.set_url(switch_data.get('url', ''))
+        
+        # Forget managers of removed switches unless their console is still open
+        for name in removed:
+            self.managers.remove(name)
+        self.alerts.forget(removed - self._site_reported)
     
     def on_switch_select(self, event):
         """Handle switch selection from listbox."""
@@ -694,8 +1281,14 @@ class SwitchManagerGUI:
         if switch_data:
             self.name_var.set(switch_data.get('name', ''))
             self.url_var.set(switch_data.get('url', ''))
+            credentials = self.vault.get_credentials(switch_name) or {}
+            self.username_var.set(credentials.get('username', ''))
+            self.password_var.set(credentials.get('password', ''))
+            # The manager is only created when the switch is opened or tested
             self.current_switch_name = switch_name
-            self._get_or_create_manager(switch_name, switch_data.get('url', ''))
+            facts = describe_facts(switch_data)
+            if facts:
+                self.status_label.config(text=facts, foreground="#666666")
     
     def load_selected_switch(self):
         """Load the selected switch from the list."""
@@ -711,6 +1304,35 @@ class SwitchManagerGUI:
             self.status_label.config(text=f"✓ Loaded switch: {switch_name}", foreground="#00AA00")
             self.root.after(3000, lambda: self.status_label.config(text=""))
     
+    def refresh_facts(self):
+        """Collect model, firmware, uptime and MAC of the selected (or all) switches in the background."""
+        names = [self.listbox_index_to_name.get(i) for i in self.switches_listbox.curselection()]
+        names = [name for name in names if name] or list(self.listbox_index_to_name.values())
+        if not names:
+            return
+        if self.facts_collector is None:
+            self.facts_collector = FactsCollector(self.storage, vault=self.vault, tls=self.tls_sessions)
+        self.status_label.config(text=f"Collecting facts of {len(names)} switch(es)...", foreground="#0066CC")
+        
+        def _collect():
+            try:
+                results = self.facts_collector.run(names)
+            except Exception as e:
+                self.ui.update('status', self.status_label.config,
+                               {'text': f"❌ Collecting facts failed: {e}", 'foreground': "#CC0000"})
+                return
+            changed = sum(1 for r in results if r.status == 'changed')
+            if changed:
+                self.ui.post(self.load_saved_switches)
+            failed = sum(1 for r in results if r.status == 'failed')
+            text = f"✓ Facts of {len(results)} switch(es): {changed} changed"
+            if failed:
+                text += f", {failed} failed"
+            self.ui.update('status', self.status_label.config,
+                           {'text': text, 'foreground': "#00AA00" if not failed else "#CC0000"})
+        
+        threading.Thread(target=_collect, daemon=True).start()
+    
     def delete_selected_switch(self):
         """Delete the selected switch."""
         selection = self.switches_listbox.curselection()
@@ -734,8 +1356,12 @@ class SwitchManagerGUI:
         if result:
             if self.storage.delete_switch(switch_name):
                 # Remove from managers if active
-                if switch_name in self.managers:
-                    del self.managers[switch_name]
+                self.managers.remove(switch_name, force=True)
+                if switch_name not in self._site_reported:
+                    self.alerts.forget([switch_name])
+                # Drop the switch's cached console data and login
+                self.profiles.delete_profile(switch_name)
+                self.vault.delete(switch_name)
                 if self.current_switch_name == switch_name:
                     self.current_switch_name = None
                     self.current_manager = None
@@ -759,21 +1385,33 @@ class SwitchManagerGUI:
             self.status_label.config(text="❌ Switch URL cannot be empty", foreground="#CC0000")
             return
         
-        # Validate URL format
+        # Validate URL format (without a scheme, the scheme and port are detected)
         try:
-            if not url.startswith(('http://', 'https://')):
-                url = 'http://' + url
-            parsed = urlparse(url)
+            parsed = urlparse(url if url.startswith(('http://', 'https://')) else 'http://' + url)
             if not parsed.netloc:
                 raise ValueError("Invalid URL format")
         except Exception as e:
             self.status_label.config(text=f"❌ Invalid URL: {str(e)}", foreground="#CC0000")
             return
         
-        # Save to storage
-        if self.storage.save_switch(name, url):
-            # Update or create manager
-            self._get_or_create_manager(name, url)
+        # Store the console login, if one was entered
+        username = self.username_var.get().strip()
+        if username:
+            if not self.vault.available:
+                self.status_label.config(text="❌ Install 'cryptography' to save logins", foreground="#CC0000")
+                return
+            if not self.vault.set_credentials(name, username, self.password_var.get()):
+                self.status_label.config(text="❌ Failed to save login", foreground="#CC0000")
+                return
+        elif self.vault.get_credentials(name):
+            # Username cleared: stop auto-login for this switch
+            self.vault.delete(name)
+        
+        # Update or create manager first: it resolves addresses without a scheme
+        manager = self._get_or_create_manager(name, url)
+        
+        # Save to storage (a detected endpoint replaces the provisional URL later)
+        if self.storage.save_switch(name, manager.switch_url):
             # Reload list
             self.load_saved_switches()
             # Select the saved switch in listbox
@@ -785,18 +1423,47 @@ class SwitchManagerGUI:
     
     def _get_or_create_manager(self, switch_name, switch_url):
         """Get or create a SwitchManager instance for a switch."""
-        if switch_name not in self.managers:
-            self.managers[switch_name] = SwitchManager(switch_url, switch_name)
-        else:
-            # Update existing manager
-            manager = self.managers[switch_name]
-            manager.set_url(switch_url)
-            manager.set_name(switch_name)
+        manager = self.managers.get(switch_name, switch_url)
+        
+        manager.proxy = self._get_console_proxy()
+        manager.vault = self.vault
+        manager.result_sink = self.result_sinks
+        manager.health = self.host_health
+        manager.tls = self.tls_sessions
+        manager.detector = self.endpoint_detector
+        manager.on_url_detected = self._on_url_detected
+        manager.on_probe = self._on_probe_result
+        
+        # Also normalizes new managers' URLs and starts endpoint detection
+        manager.set_url(switch_url)
+        manager.set_name(switch_name)
         
         self.current_switch_name = switch_name
-        self.current_manager = self.managers[switch_name]
+        self.current_manager = manager
         return self.current_manager
     
+    def _on_url_detected(self, switch_name, provisional_url, detected_url):
+        """Handle a detected endpoint (called from the detection thread)."""
+        self.ui.post(self._store_detected_url, switch_name, provisional_url, detected_url)
+    
+    def _store_detected_url(self, switch_name, provisional_url, detected_url):
+        """Replace a saved switch's provisional URL with the detected endpoint."""
+        switch_data = self.storage.get_switch(switch_name)
+        if not switch_data or switch_data.get('url') != provisional_url:
+            return
+        if self.storage.update_switch(switch_name, url=detected_url):
+            self._apply_storage_changes({switch_name}, set())
+            self.status_label.config(text=f"✓ Detected {detected_url}", foreground="#00AA00")
+            self.root.after(3000, lambda: self.status_label.config(text=""))
+    
+    def _get_console_proxy(self):
+        """Get the shared console proxy if enabled, starting it on first use."""
+        if not self.use_proxy_var.get():
+            return None
+        if self.console_proxy is None:
+            self.console_proxy = ConsoleProxy(tls=self.tls_sessions)
+        return self.console_proxy
+    
     def _select_switch_in_listbox(self, switch_name):
         """Select a switch in the listbox by name."""
         for idx, name in self.listbox_index_to_name.items():
@@ -812,10 +1479,7 @@ class SwitchManagerGUI:
         name = self.name_var.get().strip() or "Switch"
         url = self.url_var.get().strip() or "http://192.168.2.1/"
         
-        # Normalize URL
-        if not url.startswith(('http://', 'https://')):
-            url = 'http://' + url
-        
+        # Addresses without a scheme are resolved by the manager
         manager = self._get_or_create_manager(name, url)
         
         self.root.after_idle(lambda: self._open_embedded_async(manager))
@@ -839,12 +1503,66 @@ class SwitchManagerGUI:
                     return
         
         try:
-            # Open immediately (optimistic) - connection check happens in background
-            manager.open_console(skip_check=False, gui_callback=on_connection_check)
+            # Open immediately (optimistic) - connection check happens in background,
+            # its result is shown from the Tk thread
+            manager.open_console(
+                skip_check=False,
+                gui_callback=lambda connected: self.ui.post(on_connection_check, connected)
+            )
         except Exception as e:
             import traceback
             error_details = f"{str(e)}\n\n{traceback.format_exc()}"
-            self.root.after(0, lambda: self._show_error(error_details))
+            self.ui.post(self._show_error, error_details)
+    
+    def open_selected_switches(self):
+        """Open consoles for every selected switch with a staggered launch."""
+        selection = self.switches_listbox.curselection()
+        if not selection:
+            messagebox.showwarning("No Selection", "Please select one or more switches from the list.")
+            return
+        
+        managers = []
+        for index in selection:
+            switch_name = self.listbox_index_to_name.get(index)
+            switch_data = self.storage.get_switch(switch_name) if switch_name else None
+            if switch_data:
+                manager = self._get_or_create_manager(switch_name, switch_data.get('url', ''))
+                # Not idle while the rest of the batch is gathered (a batch over max_live would evict it)
+                manager.launch_pending = True
+                managers.append(manager)
+        
+        if not managers:
+            return
+        
+        total = len(managers)
+        self.status_label.config(text=f"Opening {total} console(s)...", foreground="#0066CC")
+        
+        def on_result(result):
+            """Report per-console time-to-open in the GUI thread."""
+            if result.status == 'opened':
+                text = f"✓ {result.name} opened in {result.seconds:.1f}s"
+            elif result.status == 'skipped':
+                text = f"{result.name} is already open (brought to the front)"
+            elif result.status == 'timeout':
+                text = f"⏳ {result.name} is still loading"
+            else:
+                text = f"❌ {result.name} failed: {result.error}"
+            self.ui.update('status', self.status_label.config, {'text': text, 'foreground': "#0066CC"})
+        
+        def on_done(results):
+            """Summarize the batch in the GUI thread."""
+            opened = [r for r in results if r.status == 'opened']
+            failed = sum(1 for r in results if r.status == 'failed')
+            text = f"✓ Opened {len(opened)}/{total} console(s)"
+            if opened:
+                slowest = max(r.seconds for r in opened)
+                text += f", slowest {slowest:.1f}s"
+            if failed:
+                text += f", {failed} failed"
+            self.ui.update('status', self.status_label.config,
+                           {'text': text, 'foreground': "#00AA00" if not failed else "#CC0000"})
+        
+        self.launch_scheduler.open_all(managers, on_result=on_result, on_done=on_done)
     
     def _show_error(self, error_msg):
         """Show error message."""
@@ -856,10 +1574,7 @@ class SwitchManagerGUI:
         name = self.name_var.get().strip() or "Switch"
         url = self.url_var.get().strip() or "http://192.168.2.1/"
         
-        # Normalize URL
-        if not url.startswith(('http://', 'https://')):
-            url = 'http://' + url
-        
+        # Addresses without a scheme are resolved by the manager
         manager = self._get_or_create_manager(name, url)
         
         # Open browser (non-blocking)
@@ -878,10 +1593,7 @@ class SwitchManagerGUI:
         name = self.name_var.get().strip() or "Switch"
         url = self.url_var.get().strip() or "http://192.168.2.1/"
         
-        # Normalize URL
-        if not url.startswith(('http://', 'https://')):
-            url = 'http://' + url
-        
+        # Addresses without a scheme are resolved by the manager
         manager = self._get_or_create_manager(name, url)
         
         # Create status window
@@ -987,8 +1699,8 @@ class SwitchManagerGUI:
                 )
             close_button.config(state="normal")
         
-        # Start async connection test
-        manager.test_connection(on_test_result)
+        # Start async connection test (the result is shown from the Tk thread)
+        manager.test_connection(lambda connected: self.ui.post(on_test_result, connected))
     
     def setup_system_tray(self):
         """Setup system tray icon and menu."""
@@ -1033,10 +1745,24 @@ class SwitchManagerGUI:
             if not tray_image:
                 tray_image = Image.new('RGB', (64, 64), color='#0066CC')
             
+            # With site status available, the icon carries an aggregate health badge
+            if self.aggregator:
+                self.tray_images = HealthIconCache(tray_image)
+                self.tray_health = HEALTH_UNKNOWN
+                tray_image = self.tray_images.image(HEALTH_UNKNOWN)
+            
             # Create menu
+            # Menu actions run on the tray thread; hand them to the Tk thread
             menu = pystray.Menu(
-                pystray.MenuItem('Show Window', self.show_window),
-                pystray.MenuItem('Quit', self.quit_application)
+                pystray.MenuItem('Show Window', lambda icon, item: self.ui.post(self.show_window)),
+                pystray.MenuItem('Diagnostics', pystray.Menu(
+                    pystray.MenuItem('Record CPU Profile', lambda icon, item: self.ui.post(self.toggle_profiling),
+                                     checked=lambda item: self.profiler.profiling),
+                    pystray.MenuItem('Trace Heap', lambda icon, item: self.ui.post(self.toggle_heap_tracing),
+                                     checked=lambda item: self.profiler.tracing),
+                    pystray.MenuItem('Open Dumps Folder', lambda icon, item: self.ui.post(self.open_diagnostics_folder))
+                )),
+                pystray.MenuItem('Quit', lambda icon, item: self.ui.post(self.quit_application))
             )
             
             # Create tray icon
@@ -1063,10 +1789,76 @@ class SwitchManagerGUI:
             self.root.withdraw()
             self.hidden_to_tray = True
     
+    def _diagnostic_state(self):
+        """Counters recorded with every profile and heap dump, to spot what keeps growing."""
+        return {
+            'switch managers': len(self.managers),
+            'open consoles': sum(1 for _name, manager in self.managers.items() if manager.is_console_open()),
+            'list rows': len(self.listbox_rows),
+            'site status entries': len(self.site_status),
+            'alert-tracked switches': len(self.alerts.names()),
+        }
+    
+    def _report_diagnostics(self, started_text, path):
+        """Show that recording started, or where the dump was written."""
+        if path is None:
+            self.status_label.config(text=f"● {started_text}", foreground="#CC0000")
+            message = started_text
+        else:
+            self.status_label.config(text=f"✓ Diagnostics written to {path}", foreground="#00AA00")
+            message = f"Diagnostics written to {path}"
+        if self.tray_icon:
+            try:
+                self.tray_icon.update_menu()
+                self.tray_icon.notify(message, "YaP Switch Manager")
+            except Exception as e:
+                print(f"Error updating tray: {e}")
+    
+    def toggle_profiling(self):
+        """Start the CPU profile, or stop it and write the dump (Tk thread)."""
+        try:
+            self._report_diagnostics("Recording CPU profile", self.profiler.toggle_profile())
+        except Exception as e:
+            self.status_label.config(text=f"❌ Profiling failed: {e}", foreground="#CC0000")
+    
+    def toggle_heap_tracing(self):
+        """Start heap tracing, or stop it and write the snapshot (Tk thread)."""
+        try:
+            self._report_diagnostics("Tracing heap allocations", self.profiler.toggle_heap())
+        except Exception as e:
+            self.status_label.config(text=f"❌ Heap tracing failed: {e}", foreground="#CC0000")
+    
+    def open_diagnostics_folder(self):
+        """Open the directory with the profile and heap dumps."""
+        os.makedirs(self.profiler.output_dir, exist_ok=True)
+        webbrowser.open(f"file://{self.profiler.output_dir}")
+    
+    def _stop_diagnostics(self):
+        """Write running profiles before exiting, so nothing recorded is lost."""
+        for stop in (self.profiler.stop_profile, self.profiler.stop_heap):
+            try:
+                path = stop()
+                if path:
+                    print(f"Diagnostics written to {path}")
+            except Exception as e:
+                print(f"Error writing diagnostics: {e}")
+        remove_pid_file()
+    
     def quit_application(self, icon=None, item=None):
         """Quit the application."""
+        self._stop_diagnostics()
         if self.tray_icon:
             self.tray_icon.stop()
+        if self.console_proxy:
+            self.console_proxy.shutdown()
+        if self.aggregator:
+            self.aggregator.stop_watching()
+        if self.sync:
+            self.sync.stop()
+        if self.result_sinks:
+            self.result_sinks.close()
+        self.ui.stop()
+        self._save_ui_snapshot()
         self.root.quit()
         self.root.destroy()
     
@@ -1077,6 +1869,8 @@ class SwitchManagerGUI:
             self.hide_to_tray()
         else:
             # No tray support, just close
+            self._stop_diagnostics()
+            self._save_ui_snapshot()
             self.root.destroy()
 
 def main():
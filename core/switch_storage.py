@@ -5,7 +5,91 @@ Switch storage module - handles saving and loading switch configurations.
 import json
 import os
 import sys
-from typing import List, Dict, Optional
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Callable, List, Dict, Optional, Set, Tuple
+
+# Advisory file locking (POSIX only)
+try:
+    import fcntl
+    HAS_FCNTL = True
+except ImportError:
+    HAS_FCNTL = False
+
+
+def get_config_dir() -> str:
+    """
+    Get the per-user configuration directory, creating it if needed.
+    
+    Returns:
+        Path to the configuration directory
+    """
+    if sys.platform == 'win32':
+        config_dir = os.path.join(os.environ.get('APPDATA', ''), 'YaP-Switch-Manager')
+    else:
+        # Linux/Mac: use ~/.config
+        config_dir = os.path.join(os.path.expanduser('~'), '.config', 'yap-switch-manager')
+    
+    # Create config directory if it doesn't exist
+    os.makedirs(config_dir, exist_ok=True)
+    return config_dir
+
+
+def write_atomic(path: str, data, exclusive: bool = False, sync: bool = True) -> bool:
+    """
+    Atomically replace a file, readable only by the current user.
+    
+    The data is written to a temporary file in the same directory and renamed
+    over the old file, so readers and crashes never see a partial file.
+    
+    Args:
+        path: File to write (its directory is created if needed)
+        data: Contents; str is written as UTF-8
+        exclusive: Only create the file; keep it if it already exists
+        sync: fsync the file and its directory before returning
+        
+    Returns:
+        True if written, False if exclusive and the file already existed
+    """
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}-", suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            if sync:
+                f.flush()
+                os.fsync(f.fileno())
+        if exclusive:
+            # link() fails if the file exists, so of several concurrent writers only the first wins
+            try:
+                os.link(temp_path, path)
+            except FileExistsError:
+                return False
+            finally:
+                os.unlink(temp_path)
+        else:
+            os.replace(temp_path, path)
+    except Exception:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        raise
+    
+    if sync:
+        try:
+            dir_fd = os.open(directory, os.O_RDONLY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+        except OSError:
+            pass
+    return True
 
 
 class SwitchStorage:
@@ -20,17 +104,177 @@ class SwitchStorage:
         """
         if storage_file is None:
             # Default storage location: user config directory
-            if sys.platform == 'win32':
-                config_dir = os.path.join(os.environ.get('APPDATA', ''), 'YaP-Switch-Manager')
-            else:
-                # Linux/Mac: use ~/.config
-                config_dir = os.path.join(os.path.expanduser('~'), '.config', 'yap-switch-manager')
-            
-            # Create config directory if it doesn't exist
-            os.makedirs(config_dir, exist_ok=True)
-            storage_file = os.path.join(config_dir, 'switches.json')
+            storage_file = os.path.join(get_config_dir(), 'switches.json')
         
         self.storage_file = storage_file
+        self.lock_file = storage_file + '.lock'
+        
+        # Last known file contents and the stat signature they were read at
+        self._cache = {}
+        self._cache_sig = None
+        self._cache_lock = threading.RLock()
+        self._watch_thread = None
+        self._watch_stop = threading.Event()
+        self._listeners = []
+    
+    @contextmanager
+    def _locked(self, exclusive: bool = True):
+        """
+        Hold an advisory lock on the storage file.
+        
+        Args:
+            exclusive: Exclusive lock for writers, shared lock for readers
+        """
+        if not HAS_FCNTL:
+            yield
+            return
+        
+        os.makedirs(os.path.dirname(os.path.abspath(self.lock_file)), exist_ok=True)
+        with open(self.lock_file, 'a') as lock:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+    
+    def _file_signature(self) -> Optional[Tuple[int, int, int]]:
+        """Get (inode, size, mtime) of the storage file, or None if missing."""
+        try:
+            st = os.stat(self.storage_file)
+        except OSError:
+            return None
+        return (st.st_ino, st.st_size, st.st_mtime_ns)
+    
+    def _read_file(self) -> Dict[str, Dict[str, str]]:
+        """Read and parse the storage file (caller holds the lock)."""
+        if not os.path.exists(self.storage_file):
+            return {}
+        with open(self.storage_file, 'r') as f:
+            data = json.load(f)
+        # Ensure format is correct
+        if isinstance(data, dict):
+            return data
+        return {}
+    
+    def _write_file(self, switches: Dict[str, Dict[str, str]]):
+        """Atomically replace the storage file (caller holds the lock, see write_atomic)."""
+        write_atomic(self.storage_file, json.dumps(switches, indent=2))
+    
+    def _refresh(self) -> Tuple[Set[str], Set[str]]:
+        """
+        Re-read the file if it changed since the last read.
+        
+        Returns:
+            Tuple of (added or updated switch names, removed switch names)
+        """
+        with self._cache_lock:
+            sig = self._file_signature()
+            if sig is not None and sig == self._cache_sig:
+                return set(), set()
+            
+            with self._locked(exclusive=False):
+                sig = self._file_signature()
+                switches = self._read_file() if sig is not None else {}
+            return self._update_cache(switches, sig)
+    
+    def _update_cache(self, switches, sig) -> Tuple[Set[str], Set[str]]:
+        """Replace the cached contents and report which entries differ."""
+        with self._cache_lock:
+            old = self._cache
+            changed = {name for name, data in switches.items() if old.get(name) != data}
+            removed = set(old) - set(switches)
+            self._cache = switches
+            self._cache_sig = sig
+            return changed, removed
+    
+    def _modify(self, change: Callable[[Dict[str, Dict[str, str]]], bool]) -> bool:
+        """
+        Run a locked read-modify-write cycle on the storage file.
+        
+        Args:
+            change: Mutates the switches dict in place; returns False to skip writing
+            
+        Returns:
+            Whatever change returned
+        """
+        with self._cache_lock:
+            with self._locked(exclusive=True):
+                # Always start from the file so other processes' updates are kept
+                switches = self._read_file()
+                if not change(switches):
+                    return False
+                self._write_file(switches)
+                sig = self._file_signature()
+            changed, removed = self._update_cache(switches, sig)
+        if changed or removed:
+            for listener in list(self._listeners):
+                try:
+                    listener(changed, removed)
+                except Exception as e:
+                    print(f"Storage listener error: {e}")
+        return True
+    
+    def poll_changes(self) -> Tuple[Set[str], Set[str]]:
+        """
+        Check whether another process changed the storage file.
+        
+        Returns:
+            Tuple of (added or updated switch names, removed switch names)
+        """
+        try:
+            return self._refresh()
+        except Exception as e:
+            print(f"Error checking switches for changes: {e}")
+            return set(), set()
+    
+    def watch(self, callback: Callable[[Set[str], Set[str]], None], interval: float = 1.0):
+        """
+        Watch the storage file for changes made by other processes.
+        
+        Args:
+            callback: Called from a background thread with (changed, removed) names
+            interval: Polling interval in seconds
+        """
+        if self._watch_thread is not None:
+            return
+        
+        # Establish the baseline so only later changes are reported
+        self.poll_changes()
+        self._watch_stop.clear()
+        
+        def _watch():
+            while not self._watch_stop.wait(interval):
+                changed, removed = self.poll_changes()
+                if changed or removed:
+                    try:
+                        callback(changed, removed)
+                    except Exception as e:
+                        print(f"Storage watch callback error: {e}")
+        
+        self._watch_thread = threading.Thread(target=_watch, daemon=True)
+        self._watch_thread.start()
+    
+    def stop_watching(self):
+        """Stop the background change watcher."""
+        self._watch_stop.set()
+        self._watch_thread = None
+    
+    def add_listener(self, callback: Callable[[Set[str], Set[str]], None]):
+        """
+        Get notified of writes made through this instance.
+        
+        watch() only reports changes made by other processes; listeners see
+        this instance's own writes.
+        
+        Args:
+            callback: Called with (changed, removed) names after each write
+        """
+        self._listeners.append(callback)
+    
+    def remove_listener(self, callback: Callable[[Set[str], Set[str]], None]):
+        """Stop notifying a listener added with add_listener()."""
+        if callback in self._listeners:
+            self._listeners.remove(callback)
     
     def save_switch(self, name: str, url: str) -> bool:
         """
@@ -43,44 +287,139 @@ class SwitchStorage:
         Returns:
             True if successful, False otherwise
         """
+        def change(switches):
+            # Update existing or add new switch, keeping any extra fields
+            entry = dict(switches.get(name) or {})
+            entry['name'] = name
+            entry['url'] = url
+            switches[name] = entry
+            return True
+        
         try:
-            switches = self.load_switches()
-            
-            # Update existing or add new switch
-            switches[name] = {
-                'name': name,
-                'url': url
-            }
-            
-            # Write to file
-            with open(self.storage_file, 'w') as f:
-                json.dump(switches, f, indent=2)
+            return self._modify(change)
+        except Exception as e:
+            print(f"Error saving switch: {e}")
+            return False
+    
+    def update_switch(self, name: str, **fields) -> bool:
+        """
+        Set extra fields on an existing switch (e.g. backup settings).
+        
+        Fields set to None are removed.
+        
+        Args:
+            name: Name of the switch
+            **fields: Fields to set
             
+        Returns:
+            True if successful, False if the switch does not exist or on error
+        """
+        def change(switches):
+            entry = switches.get(name)
+            if entry is None:
+                return False
+            for key, value in fields.items():
+                if key == 'name':
+                    continue
+                if value is None:
+                    entry.pop(key, None)
+                else:
+                    entry[key] = value
             return True
+        
+        try:
+            return self._modify(change)
         except Exception as e:
-            print(f"Error saving switch: {e}")
+            print(f"Error updating switch: {e}")
+            return False
+    
+    def update_switches(self, changes: Dict[str, Dict]) -> bool:
+        """
+        Set extra fields on several existing switches in a single write.
+        
+        Switches that no longer exist are skipped; fields set to None are removed.
+        
+        Args:
+            changes: Fields to set, by switch name
+        
+        Returns:
+            True if the file changed, False if nothing differed or on error
+        """
+        def change(switches):
+            modified = False
+            for name, fields in changes.items():
+                entry = switches.get(name)
+                if entry is None:
+                    continue
+                for key, value in fields.items():
+                    if key == 'name':
+                        continue
+                    if value is None:
+                        if entry.pop(key, None) is not None:
+                            modified = True
+                    elif entry.get(key) != value:
+                        entry[key] = value
+                        modified = True
+            return modified
+        
+        try:
+            return self._modify(change)
+        except Exception as e:
+            print(f"Error updating switches: {e}")
             return False
     
-    def load_switches(self) -> Dict[str, Dict[str, str]]:
+    def apply_changes(self, updated: Dict[str, Dict], removed: List[str],
+                      check: Optional[Callable[[str, Optional[Dict]], bool]] = None) -> bool:
+        """
+        Replace and delete several switches in a single write.
+        
+        Args:
+            updated: Complete entries by switch name (replacing existing ones)
+            removed: Names of switches to delete
+            check: Optional check(name, current entry or None), run under the file
+                lock; switches it returns False for are left as they are
+            
+        Returns:
+            True if the file changed, False if nothing differed or on error
+        """
+        def change(switches):
+            modified = False
+            for name, entry in updated.items():
+                if check is not None and not check(name, switches.get(name)):
+                    continue
+                entry = dict(entry, name=name)
+                if switches.get(name) != entry:
+                    switches[name] = entry
+                    modified = True
+            for name in removed:
+                if check is not None and not check(name, switches.get(name)):
+                    continue
+                if switches.pop(name, None) is not None:
+                    modified = True
+            return modified
+        
+        try:
+            return self._modify(change)
+        except Exception as e:
+            print(f"Error applying switch changes: {e}")
+            return False
+    
+    def load_switches(self) -> Dict[str, Dict]:
         """
         Load all saved switches.
         
         Returns:
             Dictionary mapping switch names to their configurations
         """
-        if not os.path.exists(self.storage_file):
-            return {}
-        
         try:
-            with open(self.storage_file, 'r') as f:
-                data = json.load(f)
-                # Ensure format is correct
-                if isinstance(data, dict):
-                    return data
-                return {}
+            # Only re-parse the file when it changed on disk
+            self._refresh()
         except Exception as e:
             print(f"Error loading switches: {e}")
             return {}
+        
+        with self._cache_lock:
+            return {name: dict(data) for name, data in self._cache.items()}
     
     def delete_switch(self, name: str) -> bool:
         """
@@ -92,23 +431,19 @@ class SwitchStorage:
         Returns:
             True if successful, False otherwise
         """
-        try:
-            switches = self.load_switches()
-            
+        def change(switches):
             if name in switches:
                 del switches[name]
-                
-                # Write updated list to file
-                with open(self.storage_file, 'w') as f:
-                    json.dump(switches, f, indent=2)
-                
                 return True
             return False
+        
+        try:
+            return self._modify(change)
         except Exception as e:
             print(f"Error deleting switch: {e}")
             return False
     
-    def get_switch(self, name: str) -> Optional[Dict[str, str]]:
+    def get_switch(self, name: str) -> Optional[Dict]:
         """
         Get a specific switch configuration.
         
@@ -118,8 +453,15 @@ class SwitchStorage:
         Returns:
             Switch configuration dict or None if not found
         """
-        switches = self.load_switches()
-        return switches.get(name)
+        try:
+            self._refresh()
+        except Exception as e:
+            print(f"Error loading switches: {e}")
+            return None
+        
+        with self._cache_lock:
+            data = self._cache.get(name)
+            return dict(data) if data is not None else None
     
     def get_switch_names(self) -> List[str]:
         """
@@ -128,6 +470,12 @@ class SwitchStorage:
         Returns:
             List of switch names
         """
-        switches = self.load_switches()
-        return sorted(list(switches.keys()))
+        try:
+            self._refresh()
+        except Exception as e:
+            print(f"Error loading switches: {e}")
+            return []
+        
+        with self._cache_lock:
+            return sorted(self._cache.keys())
 
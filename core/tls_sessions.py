@@ -0,0 +1,411 @@
+#!/usr/bin/env python3
+"""
+TLS sessions - resumed handshakes and certificate pinning for HTTPS switches.
+
+Switch CPUs take a long time for a full TLS handshake, and every new
+connection to an HTTPS console pays for one. The TLSAdapter mounted by
+create_session(tls=...) keeps the session (ticket) of the last handshake
+with each host and offers it on the next connection, so later probes and
+console requests only do the cheap abbreviated handshake - also after the
+connection pool was closed or a new session object was created.
+
+Switches with self-signed certificates can be pinned instead of trusted
+through a CA bundle or connected to without verification: the SHA-256
+fingerprint of the switch's certificate is stored in its inventory entry
+('tls_pin') and the certificate presented on every handshake must match it.
+Pin a switch with:
+
+    python tls_sessions.py pin core-sw1          # trust on first use
+    python tls_sessions.py fingerprint https://10.0.0.1/
+
+The handshake time of each request is recorded per thread, so probes report
+it separately from the time to first byte.
+"""
+import hashlib
+import re
+import ssl
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+from requests.adapters import HTTPAdapter
+
+# Inventory field holding a switch's pinned certificate fingerprint
+PIN_FIELD = 'tls_pin'
+
+_FINGERPRINT_RE = re.compile(r'^[0-9a-f]{64}$')
+
+
+def cert_fingerprint(der: bytes) -> str:
+    """Get the SHA-256 fingerprint (lowercase hex) of a DER certificate."""
+    return hashlib.sha256(der).hexdigest()
+
+
+def normalize_fingerprint(fingerprint: str) -> str:
+    """
+    Normalize a SHA-256 fingerprint as printed by browsers or openssl.
+
+    Args:
+        fingerprint: Hex digest, optionally with colons or spaces
+
+    Returns:
+        Lowercase hex digest without separators
+
+    Raises:
+        ValueError: If it is not a SHA-256 fingerprint
+    """
+    normalized = re.sub(r'[\s:]', '', fingerprint).lower()
+    if normalized.startswith('sha256'):
+        normalized = normalized[len('sha256'):].lstrip('=/')
+    if not _FINGERPRINT_RE.match(normalized):
+        raise ValueError(f"Not a SHA-256 certificate fingerprint: {fingerprint}")
+    return normalized
+
+
+def host_key(netloc: str) -> str:
+    """Get the 'host:port' key of an HTTPS netloc (port 443 if none is given)."""
+    parsed = urlparse('//' + netloc)
+    return f"{(parsed.hostname or '').lower()}:{parsed.port or 443}"
+
+
+def pins_from_switches(switches: Dict[str, Dict]) -> Dict[str, str]:
+    """
+    Collect the certificate pins of an inventory.
+
+    Args:
+        switches: SwitchStorage.load_switches() result
+
+    Returns:
+        Dictionary mapping HTTPS netlocs to fingerprints
+    """
+    pins = {}
+    for data in switches.values():
+        pin = data.get(PIN_FIELD)
+        url = data.get('url') or ''
+        if pin and url.lower().startswith('https://'):
+            pins[urlparse(url).netloc] = pin
+    return pins
+
+
+class _ResumingContext(ssl.SSLContext):
+    """SSLContext that offers cached sessions and times handshakes (see TLSSessionCache)."""
+
+    cache = None
+
+    def load_verify_locations(self, cafile=None, capath=None, cadata=None):
+        # urllib3 passes the CA bundle again for every new connection; parsing
+        # it once is enough
+        key = (cafile, capath, cadata)
+        if key not in self.cache._loaded_cas:
+            super().load_verify_locations(cafile, capath, cadata)
+            self.cache._loaded_cas.add(key)
+
+    def wrap_socket(self, sock, server_side=False, do_handshake_on_connect=True,
+                    suppress_ragged_eofs=True, server_hostname=None, session=None):
+        return self.cache._wrap(super().wrap_socket, sock, server_hostname, do_handshake_on_connect,
+                                suppress_ragged_eofs, session)
+
+
+class TLSSessionCache:
+    """Per-host TLS sessions, certificate pins and handshake timing (thread-safe)."""
+
+    def __init__(self, max_sessions: int = 4096):
+        """
+        Initialize the cache.
+
+        Args:
+            max_sessions: Hosts whose last session is kept (least recently used dropped)
+        """
+        self.max_sessions = max(1, int(max_sessions))
+        self._lock = threading.Lock()
+        self._sessions = OrderedDict()
+        self._pins = {}
+        self._loaded_cas = set()
+        self._local = threading.local()
+        self._stats = {'handshakes': 0, 'resumed': 0, 'handshake_seconds': 0.0, 'pin_mismatches': 0}
+
+        # Verifies against the CA bundle requests hands in
+        self.context = _ResumingContext(ssl.PROTOCOL_TLS_CLIENT)
+        self.context.cache = self
+        # Pinned hosts: the chain is not verified, the fingerprint is checked instead
+        self._pinned_context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+        self._pinned_context.check_hostname = False
+        self._pinned_context.verify_mode = ssl.CERT_NONE
+        self._pinned_context.set_alpn_protocols(['http/1.1'])
+
+    def set_pins(self, pins: Dict[str, str]):
+        """
+        Replace all certificate pins.
+
+        Args:
+            pins: Dictionary mapping netlocs ('host' or 'host:port') to SHA-256 fingerprints;
+                invalid fingerprints are reported and skipped
+        """
+        normalized = {}
+        for netloc, fingerprint in pins.items():
+            try:
+                normalized[host_key(netloc)] = normalize_fingerprint(fingerprint)
+            except ValueError as e:
+                print(f"Error loading certificate pin for {netloc}: {e}")
+        with self._lock:
+            self._pins = normalized
+
+    def pin(self, netloc: str, fingerprint: Optional[str]):
+        """Pin one host's certificate, or remove its pin (fingerprint None)."""
+        key = host_key(netloc)
+        fingerprint = normalize_fingerprint(fingerprint) if fingerprint else None
+        with self._lock:
+            if fingerprint:
+                self._pins[key] = fingerprint
+            else:
+                self._pins.pop(key, None)
+
+    def forget(self, netloc: str):
+        """Drop the cached sessions of a host (the next handshake is a full one)."""
+        key = host_key(netloc)
+        with self._lock:
+            for pinned in (False, True):
+                self._sessions.pop((key, pinned), None)
+
+    def _wrap(self, wrap, sock, server_hostname, do_handshake_on_connect, suppress_ragged_eofs, session):
+        """Wrap a connected socket, offering the host's last session."""
+        key = f"{(server_hostname or '').lower()}:{sock.getpeername()[1]}"
+        with self._lock:
+            pin = self._pins.get(key)
+            cached = self._sessions.get((key, pin is not None))
+        if pin is not None:
+            wrap = self._pinned_context.wrap_socket
+        started = time.monotonic()
+        ssl_sock = wrap(sock, server_side=False, do_handshake_on_connect=do_handshake_on_connect,
+                        suppress_ragged_eofs=suppress_ragged_eofs, server_hostname=server_hostname,
+                        session=session or cached)
+        finished = time.monotonic()
+        if pin is not None:
+            presented = cert_fingerprint(ssl_sock.getpeercert(binary_form=True) or b'')
+            if presented != pin:
+                ssl_sock.close()
+                with self._lock:
+                    self._stats['pin_mismatches'] += 1
+                    self._sessions.pop((key, True), None)
+                raise ssl.SSLError(f"Certificate of {key} does not match its pin "
+                                   f"(expected {pin}, got {presented})")
+        resumed = ssl_sock.session_reused
+        with self._lock:
+            self._stats['handshakes'] += 1
+            self._stats['resumed'] += int(resumed)
+            self._stats['handshake_seconds'] += finished - started
+        self._local.handshake = (finished - started, resumed, finished)
+        self.remember(ssl_sock)
+        return ssl_sock
+
+    def remember(self, ssl_sock):
+        """
+        Keep the session of a TLS connection for the next handshake with its host.
+
+        TLS 1.3 servers send their tickets after the handshake, so this is
+        called again once the response headers were read.
+        """
+        if not isinstance(ssl_sock, ssl.SSLSocket):
+            return
+        try:
+            session = ssl_sock.session
+            if session is None or not (session.has_ticket or session.id):
+                return
+            key = f"{(ssl_sock.server_hostname or '').lower()}:{ssl_sock.getpeername()[1]}"
+        except (OSError, ValueError):
+            return
+        pinned = ssl_sock.context is self._pinned_context
+        with self._lock:
+            self._sessions[(key, pinned)] = session
+            self._sessions.move_to_end((key, pinned))
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+    def begin(self):
+        """Start timing a request in this thread (see timing())."""
+        self._local.handshake = None
+
+    def timing(self, started: float, finished: float) -> Tuple[Optional[float], float]:
+        """
+        Split the time of this thread's last request.
+
+        Args:
+            started: time.monotonic() before the request (after begin())
+            finished: time.monotonic() when the response headers arrived
+
+        Returns:
+            (handshake, ttfb): seconds spent in a TLS handshake, or None if the
+            request used a pooled connection or plain HTTP, and seconds from the
+            end of the handshake (or the start) until the response headers
+        """
+        handshake = getattr(self._local, 'handshake', None)
+        if handshake is None:
+            return None, finished - started
+        seconds, _resumed, handshake_finished = handshake
+        return seconds, finished - max(started, handshake_finished)
+
+    def last_resumed(self) -> Optional[bool]:
+        """Whether this thread's last handshake resumed a session (None without handshake)."""
+        handshake = getattr(self._local, 'handshake', None)
+        return handshake[1] if handshake else None
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Get handshake counters.
+
+        Returns:
+            Dictionary with 'handshakes', 'resumed', 'handshake_seconds',
+            'pin_mismatches', 'sessions' and 'pins'
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats['sessions'] = len(self._sessions)
+            stats['pins'] = len(self._pins)
+        return stats
+
+
+def request_timing(tls: Optional[TLSSessionCache], started: float,
+                   finished: float) -> Tuple[Optional[float], float]:
+    """TLSSessionCache.timing(), or (None, total) without a TLS session cache."""
+    if tls is None:
+        return None, finished - started
+    return tls.timing(started, finished)
+
+
+class TLSAdapter(HTTPAdapter):
+    """HTTPAdapter whose HTTPS connections go through a TLSSessionCache."""
+
+    def __init__(self, tls: TLSSessionCache, **kwargs):
+        """
+        Args:
+            tls: Session cache (shared by all adapters that should resume each other's sessions)
+            **kwargs: HTTPAdapter options
+        """
+        self.tls = tls
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs['ssl_context'] = self.tls.context
+        super().init_poolmanager(*args, **kwargs)
+
+    def proxy_manager_for(self, proxy, **proxy_kwargs):
+        proxy_kwargs['ssl_context'] = self.tls.context
+        return super().proxy_manager_for(proxy, **proxy_kwargs)
+
+    def cert_verify(self, conn, url, verify, cert):
+        if url.lower().startswith('https') and not verify:
+            # The shared context always verifies; pin self-signed certificates instead
+            raise ValueError("TLS session cache requires verification; pin the certificate instead")
+        super().cert_verify(conn, url, verify, cert)
+
+    def build_response(self, req, resp):
+        # Headers were read, so TLS 1.3 tickets have arrived by now
+        connection = getattr(resp, 'connection', None) or getattr(resp, '_connection', None)
+        self.tls.remember(getattr(connection, 'sock', None))
+        return super().build_response(req, resp)
+
+
+def fetch_fingerprint(url: str, timeout: float = 10.0) -> Tuple[str, float]:
+    """
+    Connect to an HTTPS switch and get its certificate fingerprint (nothing is verified).
+
+    Args:
+        url: Switch URL
+        timeout: Connect timeout in seconds
+
+    Returns:
+        (fingerprint, handshake seconds)
+    """
+    import socket
+
+    parsed = urlparse(url)
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+    with socket.create_connection((parsed.hostname, parsed.port or 443), timeout=timeout) as sock:
+        started = time.monotonic()
+        with context.wrap_socket(sock, server_hostname=parsed.hostname) as ssl_sock:
+            seconds = time.monotonic() - started
+            return cert_fingerprint(ssl_sock.getpeercert(binary_form=True)), seconds
+
+
+def main(argv=None):
+    """Show, pin or unpin switch certificates."""
+    import argparse
+    from http_session import create_session
+    from switch_storage import SwitchStorage
+
+    parser = argparse.ArgumentParser(description="Pin self-signed switch certificates")
+    subparsers = parser.add_subparsers(dest="mode")
+    subparsers.required = True
+
+    show_parser = subparsers.add_parser("fingerprint", help="show a switch's certificate fingerprint "
+                                                            "and its full and resumed handshake times")
+    show_parser.add_argument("url", help="switch URL, e.g. https://10.0.0.1/")
+    show_parser.add_argument("--requests", type=int, default=5, help="requests on new connections to time")
+
+    pin_parser = subparsers.add_parser("pin", help="pin a saved switch's certificate")
+    pin_parser.add_argument("name", help="saved switch")
+    pin_parser.add_argument("--fingerprint", help="expected SHA-256 fingerprint (default: trust the "
+                                                  "certificate the switch presents now)")
+
+    unpin_parser = subparsers.add_parser("unpin", help="remove a saved switch's pin")
+    unpin_parser.add_argument("name", help="saved switch")
+
+    for sub in (pin_parser, unpin_parser):
+        sub.add_argument("--storage", default=None, help="switches.json (default: the saved switches)")
+    args = parser.parse_args(argv)
+
+    if args.mode == "fingerprint":
+        try:
+            fingerprint, _seconds = fetch_fingerprint(args.url)
+        except (OSError, ssl.SSLError) as e:
+            print(f"Error connecting to {args.url}: {e}")
+            return 1
+        print(f"SHA-256 fingerprint: {fingerprint}")
+        tls = TLSSessionCache()
+        tls.pin(urlparse(args.url).netloc, fingerprint)
+        for _ in range(max(1, args.requests)):
+            # A new session object every time: only the TLS session carries over
+            session = create_session(retries=0, tls=tls)
+            tls.begin()
+            started = time.monotonic()
+            try:
+                session.get(args.url, timeout=10, stream=True).close()
+            except Exception as e:
+                print(f"Error requesting {args.url}: {e}")
+                return 1
+            finally:
+                session.close()
+            handshake, ttfb = tls.timing(started, time.monotonic())
+            kind = "resumed" if tls.last_resumed() else "full"
+            print(f"{kind:>7} handshake {handshake * 1000:.1f} ms, first byte after {ttfb * 1000:.1f} ms")
+        return 0
+
+    storage = SwitchStorage(args.storage)
+    switch = storage.get_switch(args.name)
+    if not switch:
+        print(f"Error: no saved switch named {args.name}")
+        return 1
+    if args.mode == "unpin":
+        return 0 if storage.update_switch(args.name, **{PIN_FIELD: None}) else 1
+
+    url = switch.get('url') or ''
+    if not url.lower().startswith('https://'):
+        print(f"Error: {args.name} is not an HTTPS switch ({url})")
+        return 1
+    try:
+        fingerprint = normalize_fingerprint(args.fingerprint) if args.fingerprint else fetch_fingerprint(url)[0]
+    except (ValueError, OSError, ssl.SSLError) as e:
+        print(f"Error: {e}")
+        return 1
+    if not storage.update_switch(args.name, **{PIN_FIELD: fingerprint}):
+        return 1
+    print(f"Pinned {args.name} to {fingerprint}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
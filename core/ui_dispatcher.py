@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+UI dispatcher - runs updates from worker threads on the Tk thread, in batches.
+
+Tk must only be touched from the thread running the main loop. Worker
+threads hand their updates to the dispatcher instead; a single root.after
+tick drains them in one batch. Updates posted under a key (for example the
+status line) replace any pending update with the same key, so a burst of
+hundreds of results costs one widget change per key and tick rather than
+one event per result.
+"""
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Callable, Hashable
+
+
+class UIDispatcher:
+    """Queue of UI updates drained on the Tk thread."""
+
+    def __init__(self, root, interval_ms: int = 50, max_seconds: float = 0.02):
+        """
+        Initialize the dispatcher.
+
+        Args:
+            root: Tk root window
+            interval_ms: Milliseconds between two drains
+            max_seconds: Time budget per drain for one-off updates; the rest
+                waits for the next tick so input events keep flowing
+        """
+        self.root = root
+        self.interval_ms = max(1, int(interval_ms))
+        self.max_seconds = max_seconds
+        self._lock = threading.Lock()
+        self._keyed = OrderedDict()
+        self._queue = deque()
+        self._running = False
+
+    def start(self):
+        """Start draining (call from the Tk thread)."""
+        if not self._running:
+            self._running = True
+            self.root.after(self.interval_ms, self._tick)
+
+    def stop(self):
+        """Stop draining; pending updates are dropped."""
+        self._running = False
+        with self._lock:
+            self._keyed.clear()
+            self._queue.clear()
+
+    def post(self, fn: Callable, *args):
+        """
+        Run fn(*args) on the Tk thread (thread-safe).
+
+        Args:
+            fn: Callable touching Tk
+            *args: Its arguments
+        """
+        with self._lock:
+            self._queue.append((fn, args))
+
+    def update(self, key: Hashable, fn: Callable, *args):
+        """
+        Run fn(*args) on the Tk thread, replacing a pending update with the same key.
+
+        Args:
+            key: What is being updated (e.g. 'status')
+            fn: Callable touching Tk
+            *args: Its arguments
+        """
+        with self._lock:
+            self._keyed[key] = (fn, args)
+
+    def _tick(self):
+        """Drain pending updates (runs on the Tk thread)."""
+        if not self._running:
+            return
+        # Schedule the next tick first: a posted dialog runs a nested event
+        # loop, and updates must keep flowing while it is open
+        self.root.after(self.interval_ms, self._tick)
+        with self._lock:
+            keyed = self._keyed
+            self._keyed = OrderedDict()
+
+        # Latest value per key: one widget change each
+        for fn, args in keyed.values():
+            self._run(fn, args)
+
+        deadline = time.monotonic() + self.max_seconds
+        while time.monotonic() < deadline:
+            with self._lock:
+                if not self._queue:
+                    break
+                fn, args = self._queue.popleft()
+            self._run(fn, args)
+
+    @staticmethod
+    def _run(fn, args):
+        try:
+            fn(*args)
+        except Exception as e:
+            print(f"UI update error: {e}")
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+UI snapshot - the last rendered switch list, for an instant first paint.
+
+On exit (and after every full reload) the GUI stores the rows of its switch
+list and the last known switch status in a small file. At the next start
+the rows are painted from this file right away; the real inventory is
+loaded in the background and only the rows that differ are updated.
+"""
+import json
+import os
+from collections import namedtuple
+from typing import Dict, List, Optional, Tuple
+
+from switch_storage import get_config_dir, write_atomic
+
+SNAPSHOT_VERSION = 1
+
+# rows: [(switch name, display text)] in list order
+# status: {switch name: True/False/None} as last reported by site agents
+Snapshot = namedtuple('Snapshot', ['rows', 'status'])
+
+
+class UISnapshot:
+    """Reads and writes the switch list snapshot of one storage file."""
+
+    def __init__(self, storage_file: str, snapshot_file: Optional[str] = None):
+        """
+        Initialize the snapshot.
+
+        Args:
+            storage_file: SwitchStorage file the rows were rendered from
+            snapshot_file: Path of the snapshot. If None, uses 'ui_snapshot.json' in the config directory.
+        """
+        self.storage_file = os.path.abspath(storage_file)
+        self.snapshot_file = snapshot_file or os.path.join(get_config_dir(), 'ui_snapshot.json')
+
+    def load(self) -> Optional[Snapshot]:
+        """
+        Read the snapshot.
+
+        Returns:
+            Snapshot, or None if there is none for this storage file
+        """
+        try:
+            with open(self.snapshot_file, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(data, dict) or data.get('version') != SNAPSHOT_VERSION \
+                or data.get('storage_file') != self.storage_file:
+            return None
+        try:
+            rows = [(str(name), str(text)) for name, text in data.get('rows', [])]
+        except (TypeError, ValueError):
+            return None
+        status = data.get('status') or {}
+        return Snapshot(rows, status if isinstance(status, dict) else {})
+
+    def save(self, rows: List[Tuple[str, str]], status: Dict[str, Optional[bool]]):
+        """
+        Write the snapshot atomically.
+
+        Args:
+            rows: (switch name, display text) pairs in list order
+            status: Last known status per switch
+        """
+        data = {
+            'version': SNAPSHOT_VERSION,
+            'storage_file': self.storage_file,
+            'rows': rows,
+            'status': status,
+        }
+        try:
+            write_atomic(self.snapshot_file, json.dumps(data, separators=(',', ':')), sync=False)
+        except Exception as e:
+            print(f"Error saving UI snapshot: {e}")
@@ -1,30 +1,241 @@
 #!/usr/bin/env python3
 """
 Webview launcher - runs in separate process to avoid threading issues
+
+Started as a script next to switch_manager.py, or, in bundled builds, as
+the application executable itself with --webview-worker as first argument.
+
+With --control, the parent process keeps driving the window over stdin
+(one JSON object per line, after the login line of --auto-login):
+
+    {"action": "focus"}                      bring the window to the front
+    {"action": "reload"}                     reload the current page
+    {"action": "navigate", "url": "..."}     load another URL
+    {"action": "close"}                      close the window and exit
+
+The launcher reports on stdout: READY after each page load, SESSION and
+LOGIN_FAILED for auto-login.
 """
+import argparse
+import json
 import sys
+from email.utils import parsedate_to_datetime
 import webview
 
-if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: webview_launcher.py <url> [switch_name]", file=sys.stderr)
-        sys.exit(1)
-    
-    url = sys.argv[1]
-    switch_name = sys.argv[2] if len(sys.argv) > 2 else "Switch"
-    window_title = f'YaP Switch Manager - {switch_name}'
-    
+try:
+    from webview_profiles import prune_profile, DEFAULT_MAX_BYTES
+except ImportError:
+    # Launcher copied without its siblings
+    prune_profile = None
+    DEFAULT_MAX_BYTES = 200 * 1024 * 1024
+
+
+# Detects a login form on the current page
+_HAS_LOGIN_JS = "!!document.querySelector('input[type=password]')"
+
+# Fills the login form and submits it; %s are JSON-encoded username/password
+_FILL_LOGIN_JS = """
+(function(username, password) {
+    var pw = document.querySelector('input[type=password]');
+    if (!pw) { return false; }
+    var scope = pw.form || document;
+    var user = scope.querySelector('input[type=text], input[type=email], input:not([type])');
+    function set(el, value) {
+        el.focus();
+        el.value = value;
+        el.dispatchEvent(new Event('input', {bubbles: true}));
+        el.dispatchEvent(new Event('change', {bubbles: true}));
+    }
+    if (user) { set(user, username); }
+    set(pw, password);
+    if (pw.form) {
+        var button = pw.form.querySelector('[type=submit], button');
+        if (button) { button.click(); } else { pw.form.submit(); }
+    }
+    return true;
+})(%s, %s)
+"""
+
+
+def _report(message):
+    """Send one line to the parent process."""
     try:
+        print(message, flush=True)
+    except Exception:
+        pass
+
+
+def _report_ready():
+    """Tell the parent process the console page has finished loading."""
+    _report("READY")
+
+
+def _focus(window):
+    """Bring the window to the front (pywebview has no focus call; toggling on_top raises it)."""
+    window.restore()
+    window.show()
+    window.on_top = True
+    window.on_top = False
+
+
+def _serve_control(window, stream):
+    """Run the commands the parent process sends until it closes the channel."""
+    for line in stream:
+        if not line.strip():
+            continue
+        try:
+            command = json.loads(line)
+            action = command.get('action')
+            if action == 'focus':
+                _focus(window)
+            elif action == 'reload':
+                window.evaluate_js("location.reload()")
+            elif action == 'navigate':
+                window.load_url(command['url'])
+            elif action == 'close':
+                window.destroy()
+                return
+            else:
+                print(f"Unknown control action: {action!r}", file=sys.stderr)
+        except Exception as e:
+            print(f"Control error: {e}", file=sys.stderr)
+    # Parent gone: the window stays open until the user closes it
+
+
+class _AutoLogin:
+    """Logs into the switch console only when the cached session is not enough."""
+
+    def __init__(self, window, login):
+        self.window = window
+        self.username = login.get('username', '')
+        self.password = login.get('password')
+        self.cookies = login.get('cookies') or []
+        self.cookies_injected = False
+        self.attempted = False
+        self.reported = False
+
+    def on_loaded(self):
+        """Handle a finished page load."""
+        try:
+            has_login = self.window.evaluate_js(_HAS_LOGIN_JS)
+
+            # Try the cached session first: restore its cookies and reload once
+            if has_login and self.cookies and not self.cookies_injected:
+                self.cookies_injected = True
+                self._inject_cookies()
+                self.window.evaluate_js("location.reload()")
+                return
+
+            if has_login:
+                if not self.attempted and self.password is not None:
+                    self.attempted = True
+                    self.window.evaluate_js(
+                        _FILL_LOGIN_JS % (json.dumps(self.username), json.dumps(self.password))
+                    )
+                elif self.attempted and not self.reported:
+                    self.reported = True
+                    _report("LOGIN_FAILED")
+            elif self.attempted and not self.reported:
+                # Logged in: hand the fresh session to the parent for reuse
+                self.reported = True
+                _report("SESSION " + json.dumps(self._collect_cookies()))
+        except Exception as e:
+            print(f"Auto-login error: {e}", file=sys.stderr)
+
+    def _inject_cookies(self):
+        """Set cached (non-HttpOnly) session cookies on the current origin."""
+        for cookie in self.cookies:
+            value = f"{cookie['name']}={cookie['value']}; path={cookie.get('path') or '/'}"
+            self.window.evaluate_js(f"document.cookie = {json.dumps(value)}")
+
+    def _collect_cookies(self):
+        """Read the current cookies as plain dicts."""
+        cookies = []
+        try:
+            for jar in self.window.get_cookies():
+                for morsel in jar.values():
+                    cookie = {'name': morsel.key, 'value': morsel.value, 'path': morsel['path'] or '/'}
+                    if morsel['expires']:
+                        try:
+                            cookie['expires'] = parsedate_to_datetime(morsel['expires']).timestamp()
+                        except (TypeError, ValueError):
+                            pass
+                    cookies.append(cookie)
+        except Exception:
+            # Older pywebview: fall back to the script-visible cookies
+            raw = self.window.evaluate_js("document.cookie") or ''
+            for part in raw.split(';'):
+                if '=' in part:
+                    name, value = part.strip().split('=', 1)
+                    cookies.append({'name': name, 'value': value, 'path': '/'})
+        return cookies
+
+
+def _parse_args(argv):
+    """Parse launcher command line arguments."""
+    parser = argparse.ArgumentParser(
+        prog="webview_launcher.py",
+        usage="webview_launcher.py <url> [switch_name] [--profile-dir DIR] [--auto-login] [--control]"
+    )
+    parser.add_argument("url")
+    parser.add_argument("switch_name", nargs="?", default="Switch")
+    parser.add_argument("--profile-dir", default=None,
+                        help="persistent storage for cache, cookies and localStorage")
+    parser.add_argument("--profile-max-mb", type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024),
+                        help="size cap of the profile directory")
+    parser.add_argument("--auto-login", action="store_true",
+                        help="read login credentials and cached cookies as JSON from stdin")
+    parser.add_argument("--control", action="store_true",
+                        help="accept focus/reload/navigate/close commands as JSON lines on stdin")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """
+    Open one console window and run its event loop until it is closed.
+
+    Args:
+        argv: Launcher arguments (defaults to sys.argv[1:])
+
+    Returns:
+        Process exit code
+    """
+    args = _parse_args(sys.argv[1:] if argv is None else argv)
+    window_title = f'YaP Switch Manager - {args.switch_name}'
+
+    try:
+        # Credentials come over stdin so they never show up in the process list
+        login = None
+        if args.auto_login:
+            line = sys.stdin.readline()
+            login = json.loads(line) if line.strip() else None
+
+        # Keep the profile bounded before the webview starts using it
+        if args.profile_dir and prune_profile is not None:
+            prune_profile(args.profile_dir, args.profile_max_mb * 1024 * 1024)
+
         window = webview.create_window(
             window_title,
-            url,
+            args.url,
             width=1200,
             height=800,
             min_size=(800, 600),
             resizable=True
         )
-        webview.start(debug=False)
+        window.events.loaded += _report_ready
+        if login:
+            window.events.loaded += _AutoLogin(window, login).on_loaded
+        # Commands are served from a thread pywebview starts once the GUI loop runs
+        control, control_args = (_serve_control, (window, sys.stdin)) if args.control else (None, None)
+        if args.profile_dir:
+            webview.start(control, control_args, debug=False, private_mode=False, storage_path=args.profile_dir)
+        else:
+            webview.start(control, control_args, debug=False)
     except Exception as e:
         print(f"Error: {e}", file=sys.stderr)
-        sys.exit(1)
+        return 1
+    return 0
 
+
+if __name__ == "__main__":
+    sys.exit(main())
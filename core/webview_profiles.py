@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Webview profiles - persistent per-switch storage for console windows.
+
+Each switch gets its own directory for the webview's HTTP cache, cookies and
+localStorage so consoles load from cache and keep their session across
+restarts. Profiles are size-capped; the oldest cache files are evicted first.
+"""
+import hashlib
+import os
+import re
+import shutil
+from typing import Optional
+
+from switch_storage import get_config_dir
+
+
+# Default per-profile size cap
+DEFAULT_MAX_BYTES = 200 * 1024 * 1024
+
+# Files whose path contains one of these are session state and never evicted
+_PROTECTED_MARKERS = ('cookie', 'localstorage', 'local storage', 'indexeddb')
+
+
+def _profile_slug(switch_name: str) -> str:
+    """Build a filesystem-safe, collision-free directory name for a switch."""
+    safe = re.sub(r'[^A-Za-z0-9._-]+', '_', switch_name).strip('._')[:40] or 'switch'
+    digest = hashlib.sha1(switch_name.encode('utf-8')).hexdigest()[:8]
+    return f"{safe}-{digest}"
+
+
+def profile_size(path: str) -> int:
+    """
+    Get the total size of a profile directory.
+
+    Args:
+        path: Profile directory
+
+    Returns:
+        Size in bytes
+    """
+    total = 0
+    for dirpath, _dirnames, filenames in os.walk(path):
+        for filename in filenames:
+            try:
+                total += os.lstat(os.path.join(dirpath, filename)).st_size
+            except OSError:
+                pass
+    return total
+
+
+def prune_profile(path: str, max_bytes: int = DEFAULT_MAX_BYTES) -> int:
+    """
+    Evict least recently used cache files until the profile fits its cap.
+
+    Cookies and localStorage are kept so sessions survive eviction.
+
+    Args:
+        path: Profile directory
+        max_bytes: Size cap in bytes
+
+    Returns:
+        Number of bytes freed
+    """
+    if not os.path.isdir(path):
+        return 0
+
+    entries = []
+    total = 0
+    for dirpath, _dirnames, filenames in os.walk(path):
+        for filename in filenames:
+            file_path = os.path.join(dirpath, filename)
+            try:
+                st = os.lstat(file_path)
+            except OSError:
+                continue
+            total += st.st_size
+            lowered = file_path.lower()
+            if not any(marker in lowered for marker in _PROTECTED_MARKERS):
+                entries.append((max(st.st_atime, st.st_mtime), st.st_size, file_path))
+
+    if total <= max_bytes:
+        return 0
+
+    freed = 0
+    entries.sort()
+    for _used, size, file_path in entries:
+        if total - freed <= max_bytes:
+            break
+        try:
+            os.remove(file_path)
+            freed += size
+        except OSError:
+            pass
+    return freed
+
+
+class WebviewProfiles:
+    """Manages the persistent webview profile directories of all switches."""
+
+    def __init__(self, root: Optional[str] = None, max_bytes: int = DEFAULT_MAX_BYTES):
+        """
+        Initialize profile management.
+
+        Args:
+            root: Directory holding all profiles. If None, uses the config directory.
+            max_bytes: Size cap for each profile
+        """
+        if root is None:
+            root = os.path.join(get_config_dir(), 'profiles')
+        self.root = root
+        self.max_bytes = max_bytes
+
+    def profile_dir(self, switch_name: str) -> str:
+        """
+        Get (and create) the profile directory of a switch.
+
+        Args:
+            switch_name: Name of the switch
+
+        Returns:
+            Path to the switch's profile directory
+        """
+        path = os.path.join(self.root, _profile_slug(switch_name))
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def delete_profile(self, switch_name: str) -> bool:
+        """
+        Remove a switch's profile, e.g. when the switch is deleted.
+
+        Args:
+            switch_name: Name of the switch
+
+        Returns:
+            True if a profile was removed, False otherwise
+        """
+        path = os.path.join(self.root, _profile_slug(switch_name))
+        if not os.path.isdir(path):
+            return False
+        try:
+            shutil.rmtree(path)
+            return True
+        except Exception as e:
+            print(f"Error deleting webview profile: {e}")
+            return False
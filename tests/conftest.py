@@ -0,0 +1,163 @@
+"""
+Shared test setup: core/ on the import path, a local stub HTTP upstream, free
+ports, SwitchManagers with private state and stopping whatever a test started.
+"""
+import os
+import socket
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'core'))
+
+# switch_manager imports pystray at module level; tests never show a tray icon
+sys.modules.setdefault('pystray', None)
+
+
+class StubServer:
+    """Local HTTP server answering every request through a respond(request) function."""
+
+    def __init__(self, respond):
+        """
+        Args:
+            respond: Called with each StubRequest; returns (status, headers dict, body bytes)
+        """
+        self.respond = respond
+        self.requests = []
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def _serve(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                request = StubRequest(self.command, self.path, dict(self.headers),
+                                      self.rfile.read(length) if length else b'')
+                with stub._lock:
+                    stub.requests.append(request)
+                status, headers, body = stub.respond(request)
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                if self.command != 'HEAD':
+                    self.wfile.write(body)
+
+            do_GET = do_HEAD = do_POST = _serve
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def paths(self):
+        """Paths requested so far, in order."""
+        with self._lock:
+            return [request.path for request in self.requests]
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class StubRequest:
+    """One request received by a StubServer."""
+
+    def __init__(self, method, path, headers, body):
+        self.method = method
+        self.path = path
+        # Header names as sent; look them up case-insensitively with header()
+        self.headers = headers
+        self.body = body
+
+    def header(self, name, default=None):
+        for key, value in self.headers.items():
+            if key.lower() == name.lower():
+                return value
+        return default
+
+
+class ResultCollector:
+    """Result sink keeping every emitted ProbeResult."""
+
+    def __init__(self):
+        self.results = []
+
+    def emit(self, result, source):
+        self.results.append(result)
+
+
+class SwitchManagers:
+    """Creates SwitchManagers with their own host health and TLS sessions, closed after the test."""
+
+    def __init__(self, started):
+        self._started = started
+
+    def make(self, url, name='core'):
+        """Create a manager; its check results are collected in manager.result_sink.results."""
+        from host_health import HostHealth
+        from switch_manager import SwitchManager
+        from tls_sessions import TLSSessionCache
+
+        manager = SwitchManager(url, name)
+        manager.health = HostHealth(failure_threshold=3)
+        # Simulated switches each have their own certificate with the same
+        # subject; a shared trust store would keep the earlier ones
+        manager.tls = TLSSessionCache()
+        manager.result_sink = ResultCollector()
+        return self._started(manager, 'close')
+
+    @staticmethod
+    def check(manager, times=1):
+        """Run connection checks one after another; returns their ProbeResults."""
+        for _ in range(times):
+            manager.check_connection().join()
+        return manager.result_sink.results[-times:]
+
+
+def pytest_configure(config):
+    config.addinivalue_line('markers', 'slow: performance budgets at inventory scale (deselect with -m "not slow")')
+
+
+@pytest.fixture
+def started():
+    """
+    Stop what a test started: started(obj) returns obj and calls obj.stop()
+    (or started(obj, 'close') obj.close()) after the test, last started first.
+    """
+    running = []
+
+    def register(obj, stop='stop'):
+        running.append(getattr(obj, stop))
+        return obj
+
+    yield register
+    for stop in reversed(running):
+        stop()
+
+
+@pytest.fixture
+def free_port():
+    """A TCP port on 127.0.0.1 that nothing listens on."""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def switch_managers(started):
+    """SwitchManagers factory, see SwitchManagers."""
+    return SwitchManagers(started)
+
+
+@pytest.fixture
+def stub_server(started):
+    """Start StubServers with stub_server(respond); all are stopped after the test."""
+    return lambda respond: started(StubServer(respond))
@@ -0,0 +1,58 @@
+"""
+BackupEngine against a local stub switch: rate limits and server errors are retried.
+"""
+import pytest
+
+from config_backup import BackupEngine, BackupStore
+from switch_storage import SwitchStorage
+
+
+def _engine(tmp_path, url, **options):
+    storage = SwitchStorage(str(tmp_path / 'switches.json'))
+    storage.save_switch('core', url)
+    return BackupEngine(storage, BackupStore(str(tmp_path / 'backups')), **options)
+
+
+def _flaky(statuses, config=b'hostname core\n'):
+    """Answer with the given statuses first (Retry-After: 0), then with the configuration."""
+    remaining = list(statuses)
+
+    def respond(request):
+        if remaining:
+            return remaining.pop(0), {'Retry-After': '0'}, b'busy\n'
+        return 200, {'Content-Type': 'text/plain'}, config
+
+    return respond
+
+
+@pytest.mark.parametrize('status', [429, 503, 500])
+def test_busy_switch_is_retried_until_backup_succeeds(tmp_path, stub_server, status):
+    switch = stub_server(_flaky([status]))
+    engine = _engine(tmp_path, switch.url)
+
+    results = engine.run()
+
+    assert [(r.status, r.error) for r in results] == [('changed', None)]
+    assert switch.paths() == ['/config.cfg', '/config.cfg']
+    assert engine.store.read(results[0].digest) == b'hostname core\n'
+
+
+def test_backup_gives_up_after_max_attempts(tmp_path, stub_server):
+    switch = stub_server(_flaky([503] * 10))
+    engine = _engine(tmp_path, switch.url, max_attempts=3)
+
+    results = engine.run()
+
+    assert results[0].status == 'failed'
+    assert '503' in results[0].error
+    assert len(switch.requests) == 3
+
+
+def test_client_errors_are_not_retried(tmp_path, stub_server):
+    switch = stub_server(lambda request: (404, {}, b'no such page\n'))
+    engine = _engine(tmp_path, switch.url)
+
+    results = engine.run()
+
+    assert results[0].status == 'failed'
+    assert len(switch.requests) == 1
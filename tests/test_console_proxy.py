@@ -0,0 +1,104 @@
+"""
+ConsoleProxy against a local stub upstream: revalidation, coalescing and pass-through.
+"""
+import threading
+import time
+
+import pytest
+import requests
+
+from console_proxy import ConsoleProxy
+
+
+@pytest.fixture
+def proxy():
+    proxy = ConsoleProxy(timeout=5.0)
+    yield proxy
+    proxy.shutdown()
+
+
+def _origin_stats(proxy):
+    return next(iter(proxy.stats().values()))
+
+
+def test_stale_asset_is_revalidated_with_etag(stub_server, proxy):
+    def respond(request):
+        if request.header('If-None-Match') == '"v1"':
+            return 304, {'ETag': '"v1"'}, b''
+        # max-age=0: every later request must be revalidated upstream
+        return 200, {'ETag': '"v1"', 'Cache-Control': 'max-age=0', 'Content-Type': 'text/css'}, b'body { }'
+
+    upstream = stub_server(respond)
+    url = proxy.proxy_url(upstream.url) + 'style.css'
+
+    first = requests.get(url, timeout=5)
+    second = requests.get(url, timeout=5)
+
+    assert first.status_code == second.status_code == 200
+    assert second.content == b'body { }'
+    assert len(upstream.requests) == 2
+    assert upstream.requests[0].header('If-None-Match') is None
+    assert upstream.requests[1].header('If-None-Match') == '"v1"'
+    stats = _origin_stats(proxy)
+    assert stats['misses'] == 1
+    assert stats['revalidated'] == 1
+
+
+def test_fresh_asset_is_served_from_cache(stub_server, proxy):
+    upstream = stub_server(lambda request: (200, {'Cache-Control': 'max-age=300'}, b'console.log(1)'))
+    url = proxy.proxy_url(upstream.url) + 'app.js'
+
+    for _ in range(5):
+        assert requests.get(url, timeout=5).content == b'console.log(1)'
+
+    assert len(upstream.requests) == 1
+    assert _origin_stats(proxy)['hits'] == 4
+
+
+def test_client_etag_gets_304_from_proxy(stub_server, proxy):
+    upstream = stub_server(lambda request: (200, {'ETag': '"abc"', 'Cache-Control': 'max-age=300'}, b'x' * 100))
+    url = proxy.proxy_url(upstream.url) + 'logo.png'
+    requests.get(url, timeout=5)
+
+    response = requests.get(url, headers={'If-None-Match': '"abc"'}, timeout=5)
+
+    assert response.status_code == 304
+    assert len(upstream.requests) == 1
+
+
+def test_concurrent_requests_share_one_upstream_fetch(stub_server, proxy):
+    def respond(request):
+        # Slow enough for every client to arrive while the first fetch is in flight
+        time.sleep(0.5)
+        return 200, {'Cache-Control': 'max-age=300'}, b'shared'
+
+    upstream = stub_server(respond)
+    url = proxy.proxy_url(upstream.url) + 'bundle.js'
+    bodies = []
+    start = threading.Barrier(8)
+
+    def client():
+        start.wait()
+        bodies.append(requests.get(url, timeout=5).content)
+
+    clients = [threading.Thread(target=client) for _ in range(8)]
+    for thread in clients:
+        thread.start()
+    for thread in clients:
+        thread.join()
+
+    assert bodies == [b'shared'] * 8
+    assert len(upstream.requests) == 1
+    stats = _origin_stats(proxy)
+    assert stats['coalesced'] + stats['hits'] == 7
+
+
+def test_pages_pass_through_uncached(stub_server, proxy):
+    upstream = stub_server(lambda request: (200, {'Content-Type': 'text/html'}, b'<html></html>'))
+    url = proxy.proxy_url(upstream.url)
+
+    for _ in range(3):
+        assert requests.get(url, timeout=5).content == b'<html></html>'
+
+    assert len(upstream.requests) == 3
+    assert _origin_stats(proxy)['passthrough'] == 3
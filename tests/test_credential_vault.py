@@ -0,0 +1,71 @@
+"""
+CredentialVault: a vault that does not match its key is never overwritten, and first runs agree on one key.
+"""
+import glob
+import os
+import threading
+
+import pytest
+
+pytest.importorskip('cryptography')
+
+from credential_vault import CredentialVault, VaultUnreadableError
+
+
+def _vault(tmp_path):
+    return CredentialVault(str(tmp_path / 'credentials.vault'), str(tmp_path / 'vault.key'))
+
+
+def test_credentials_round_trip(tmp_path):
+    vault = _vault(tmp_path)
+    assert vault.set_credentials('core', 'admin', 'secret')
+    assert _vault(tmp_path).get_credentials('core') == {'username': 'admin', 'password': 'secret'}
+
+
+def test_replaced_key_does_not_wipe_existing_logins(tmp_path):
+    vault = _vault(tmp_path)
+    vault.set_credentials('core', 'admin', 'secret')
+    vault.set_credentials('edge', 'admin', 'other')
+    old_key = (tmp_path / 'vault.key').read_bytes()
+
+    # Key regenerated (e.g. restored from another machine)
+    os.unlink(tmp_path / 'vault.key')
+    replaced = _vault(tmp_path)
+    assert replaced.get_credentials('core') is None
+    with pytest.raises(VaultUnreadableError):
+        replaced._load()
+
+    assert replaced.set_credentials('new', 'admin', 'pw')
+
+    # The old vault was moved aside intact and still opens with the old key
+    moved = glob.glob(str(tmp_path / 'credentials.vault.unreadable-*'))
+    assert len(moved) == 1
+    (tmp_path / 'old.key').write_bytes(old_key)
+    recovered = CredentialVault(moved[0], str(tmp_path / 'old.key'))
+    assert recovered.get_credentials('core') == {'username': 'admin', 'password': 'secret'}
+    assert recovered.get_credentials('edge') == {'username': 'admin', 'password': 'other'}
+    assert replaced.get_credentials('new') == {'username': 'admin', 'password': 'pw'}
+
+
+def test_concurrent_first_runs_agree_on_one_key(tmp_path):
+    vaults = [_vault(tmp_path) for _ in range(16)]
+    start = threading.Barrier(len(vaults))
+    keys = []
+
+    def first_use(vault):
+        start.wait()
+        vault._get_fernet()
+        with open(vault.key_file, 'rb') as f:
+            keys.append(f.read())
+
+    threads = [threading.Thread(target=first_use, args=(vault,)) for vault in vaults]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(set(keys)) == 1
+    # Whatever one instance writes, every other can read
+    assert vaults[0].set_credentials('core', 'admin', 'secret')
+    assert all(vault.get_credentials('core') for vault in vaults)
+    assert not glob.glob(str(tmp_path / '.vault.key-*'))
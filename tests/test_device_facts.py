@@ -0,0 +1,105 @@
+"""
+Device facts: parsing switch pages, and collecting again from simulated switches without rewriting the inventory.
+"""
+import pytest
+
+from device_facts import FACTS_FIELD, FactsCollector, extract_labeled, parse_mac, parse_uptime
+from fleet_sim import FleetSimulator
+from switch_storage import SwitchStorage
+
+
+@pytest.mark.parametrize('value, seconds', [
+    ('123456', 123456),
+    ('123456 s', 123456),
+    ('0 days, 0 hours, 48 minutes, 23 seconds', 48 * 60 + 23),
+    ('3d 4h 5m 6s', 3 * 86400 + 4 * 3600 + 5 * 60 + 6),
+    ('3 days, 04:05:06', 3 * 86400 + 4 * 3600 + 5 * 60 + 6),
+    ('1 week, 2 days, 3 hours, 4 minutes', 9 * 86400 + 3 * 3600 + 4 * 60),
+    ('1 month 2 days', 32 * 86400),
+    ('up 5 mins', 300),
+    ('1 fortnight 2 days', None),
+    ('unknown', None),
+])
+def test_parse_uptime(value, seconds):
+    assert parse_uptime(value) == seconds
+
+
+@pytest.mark.parametrize('value, mac', [
+    ('00:1A:2b:3C:4d:5E', '00:1a:2b:3c:4d:5e'),
+    ('00-1A-2B-3C-4D-5E', '00:1a:2b:3c:4d:5e'),
+    ('001a.2b3c.4d5e', '00:1a:2b:3c:4d:5e'),
+    ('Base MAC 00:1A:2B:3C:4D:5E (port 1)', '00:1a:2b:3c:4d:5e'),
+    ('00:1A:2B:3C:4D', None),
+])
+def test_parse_mac(value, mac):
+    assert parse_mac(value) == mac
+
+
+def test_extract_labeled_reads_two_column_tables():
+    page = """<html><body><table class="info">
+    <tr><th>Product Name</th><th>GS308E</th></tr>
+    <tr><td class="label">Firmware Version</td><td>V1.00.11&nbsp;</td></tr>
+    <tr><td>MAC Address</td><td>00:1A:2B:3C:4D:5E</td><td>(system)</td></tr>
+    <tr><td>System Up Time</td><td>0 days, 2 hours, 3 minutes</td></tr>
+    </table><script>var model = "decoy";</script></body></html>"""
+
+    assert extract_labeled(page) == {'model': 'GS308E', 'firmware': 'V1.00.11', 'mac': '00:1A:2B:3C:4D:5E',
+                                     'uptime': '0 days, 2 hours, 3 minutes'}
+
+
+def test_extract_labeled_reads_label_lines():
+    page = """<div><h2>System</h2>
+    <p>System Description: Managed Switch 24-port<br>
+    Software Version: 2.5.3<br>Base MAC Address: 001a.2b3c.4d5e<br>
+    Uptime: 12 days, 01:02:03</p>
+    <p>Model: </p></div>"""
+
+    assert extract_labeled(page) == {'model': 'Managed Switch 24-port', 'firmware': '2.5.3',
+                                     'mac': '001a.2b3c.4d5e', 'uptime': '12 days, 01:02:03'}
+
+
+def _collect_from_fleet(started, tmp_path):
+    switches = started(FleetSimulator(4)).start()
+    storage = SwitchStorage(str(tmp_path / 'switches.json'))
+    for switch in switches:
+        storage.save_switch(switch.name, switch.url)
+    collector = FactsCollector(storage, max_workers=4)
+    first = collector.run()
+    assert [r.status for r in first] == ['changed'] * len(switches), [r.error for r in first]
+    return storage, collector
+
+
+def _record_writes(storage, monkeypatch):
+    writes = []
+    monkeypatch.setattr(storage, 'update_switches', lambda updates: writes.append(updates))
+    return writes
+
+
+def test_second_run_is_served_from_the_cache(started, tmp_path, monkeypatch):
+    storage, collector = _collect_from_fleet(started, tmp_path)
+    facts = storage.load_switches()
+    writes = _record_writes(storage, monkeypatch)
+
+    second = collector.run()
+
+    assert all(r.status == 'unchanged' and r.requests == 0 and r.cache_hits == 2 for r in second)
+    assert writes == []
+    assert all(entry[FACTS_FIELD]['model'] and entry[FACTS_FIELD]['mac'] and entry[FACTS_FIELD]['booted_at']
+               for entry in facts.values())
+
+
+def test_expired_pages_are_answered_not_modified(started, tmp_path, monkeypatch):
+    storage, _collector = _collect_from_fleet(started, tmp_path)
+    switches = storage.load_switches()
+    for entry in switches.values():
+        for page in entry[FACTS_FIELD]['pages'].values():
+            page['fetched_at'] -= 2 * 86400
+    storage.update_switches({name: {FACTS_FIELD: entry[FACTS_FIELD]} for name, entry in switches.items()})
+    writes = _record_writes(storage, monkeypatch)
+
+    # A new collector has no memory of the first run's requests
+    second = FactsCollector(storage, max_workers=4).run()
+
+    # The console page has no validators and is read again; sysinfo.htm is 304
+    assert all(r.status == 'unchanged' and r.requests == 2 and r.not_modified == 1 for r in second), second
+    assert writes == []
@@ -0,0 +1,81 @@
+"""
+EndpointDetector against local stub switches and closed ports, and the detected URL written back to the inventory.
+"""
+import endpoint_detect
+from endpoint_detect import EndpointDetector
+from switch_manager import SwitchManager, SwitchManagerGUI
+from switch_storage import SwitchStorage
+
+
+def _port(server):
+    return int(server.url.rstrip('/').rsplit(':', 1)[1])
+
+
+def test_answering_port_is_detected(stub_server):
+    switch = stub_server(lambda request: (200, {}, b'ok\n'))
+
+    assert EndpointDetector().detect(f'127.0.0.1:{_port(switch)}') == switch.url
+    assert switch.paths() == ['/']
+
+
+def test_closed_port_is_not_detected(free_port):
+    detector = EndpointDetector(timeout=2)
+
+    assert detector.detect(f'127.0.0.1:{free_port}') is None
+    assert detector.cached(f'127.0.0.1:{free_port}') is None
+
+
+def test_closed_candidates_fall_through_to_the_answering_one(stub_server, free_port, monkeypatch):
+    switch = stub_server(lambda request: (200, {}, b'ok\n'))
+    monkeypatch.setattr(endpoint_detect, 'DEFAULT_CANDIDATES', [('http', free_port), ('http', _port(switch))])
+    detector = EndpointDetector(stagger=5)
+
+    assert detector.detect('127.0.0.1/admin') == f'{switch.url}admin/'
+    assert detector.cached('127.0.0.1/admin') == f'{switch.url}admin/'
+
+
+def test_redirect_to_another_port_resolves_to_its_target(stub_server):
+    target = stub_server(lambda request: (200, {}, b'ok\n'))
+    redirect = stub_server(lambda request: (301, {'Location': target.url}, b''))
+
+    assert EndpointDetector().detect(f'127.0.0.1:{_port(redirect)}') == target.url
+
+
+class _Immediate:
+    """UIDispatcher stand-in running posted calls right away."""
+
+    def post(self, fn, *args):
+        fn(*args)
+
+
+class _Widget:
+    def config(self, **options):
+        pass
+
+    def after(self, ms, fn):
+        pass
+
+
+def test_detected_url_is_written_back(stub_server, tmp_path):
+    target = stub_server(lambda request: (200, {}, b'ok\n'))
+    redirect = stub_server(lambda request: (301, {'Location': target.url}, b''))
+    address = f'127.0.0.1:{_port(redirect)}'
+    gui = SwitchManagerGUI.__new__(SwitchManagerGUI)
+    gui.storage = SwitchStorage(str(tmp_path / 'switches.json'))
+    gui.ui = _Immediate()
+    gui.root = gui.status_label = _Widget()
+    applied = []
+    gui._apply_storage_changes = lambda changed, removed: applied.append((changed, removed))
+    # What the GUI saves for an address without a scheme until detection finishes
+    gui.storage.save_switch('core', f'http://{address}/')
+
+    manager = SwitchManager('http://192.0.2.1/', 'core')
+    manager.detector = EndpointDetector()
+    manager.on_url_detected = gui._on_url_detected
+    manager.set_url(address)
+    assert manager.switch_url == f'http://{address}/'
+    manager.wait_for_url()
+
+    assert manager.switch_url == target.url
+    assert gui.storage.get_switch('core')['url'] == target.url
+    assert applied == [({'core'}, set())]
@@ -0,0 +1,29 @@
+"""
+ShardedProber with spawned worker processes against a simulated fleet.
+"""
+from collections import Counter
+from urllib.parse import urlparse
+
+from fleet_probe import ShardedProber, shard_targets
+from fleet_sim import FleetSimulator
+from switch_storage import SwitchStorage
+
+
+def test_shards_report_every_switch_once_and_merge_host_health(started, tmp_path):
+    switches = started(FleetSimulator(50, down_rate=0.2, seed=3)).start()
+    storage = SwitchStorage(str(tmp_path / 'switches.json'))
+    storage.apply_changes({switch.name: {'name': switch.name, 'url': switch.url} for switch in switches}, [])
+    prober = ShardedProber(storage, processes=2, threads_per_process=8, timeout=0.5, min_per_process=1)
+    assert len(shard_targets([(s.name, s.url) for s in switches], 2)) == 2
+
+    results = prober.run()
+
+    assert Counter(result.name for result in results) == Counter(switch.name for switch in switches)
+    down = {switch.name for switch in switches if switch.profile.down}
+    assert down and len(down) < len(switches)
+    assert {result.name for result in results if not result.reachable} == down
+    # Both workers handed back the states of their hosts: answers and timeouts
+    health = prober.health.export()
+    assert set(health) == {urlparse(switch.url).netloc for switch in switches}
+    assert {host for host, state in health.items() if state[3]} == \
+        {urlparse(switch.url).netloc for switch in switches if switch.profile.down}
@@ -0,0 +1,51 @@
+"""
+SwitchManager connection checks against simulated switches: plain, HTTPS, redirecting and login consoles.
+"""
+import pytest
+
+from fleet_sim import FleetSimulator
+
+
+def _check(switch_managers, switch):
+    """Run one connection check of a simulated switch; returns its ProbeResult."""
+    manager = switch_managers.make(switch.url, switch.name)
+    return switch_managers.check(manager)[0]
+
+
+@pytest.mark.parametrize('options, scheme', [
+    ({}, 'http'),
+    ({'login_rate': 1}, 'http'),
+    ({'tls_rate': 1}, 'https'),
+    ({'redirect_rate': 1}, 'http'),
+])
+def test_check_connection_reaches_simulated_switch(started, switch_managers, monkeypatch, options, scheme):
+    sim = started(FleetSimulator(1, **options))
+    switches = sim.start()
+    if sim.cert_file:
+        monkeypatch.setenv('REQUESTS_CA_BUNDLE', sim.cert_file)
+
+    result = _check(switch_managers, switches[0])
+
+    assert switches[0].url.startswith(scheme + '://')
+    assert result.reachable, result.error
+    assert result.status_code == 200
+
+
+def test_down_switch_is_unreachable(started, switch_managers):
+    switches = started(FleetSimulator(1, down_rate=1)).start()
+
+    result = _check(switch_managers, switches[0])
+
+    assert not result.reachable
+    assert result.status_code is None
+
+
+def test_certificate_covers_every_switch_address(started, switch_managers, monkeypatch, free_port):
+    pytest.importorskip('cryptography')
+    sim = started(FleetSimulator(3, tls_rate=1, base_address='127.1.0.1', port=free_port))
+    switches = sim.start()
+    monkeypatch.setenv('REQUESTS_CA_BUNDLE', sim.cert_file)
+
+    for switch in switches:
+        result = _check(switch_managers, switch)
+        assert result.reachable, f"{switch.url}: {result.error}"
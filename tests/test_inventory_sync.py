@@ -0,0 +1,112 @@
+"""
+Inventory sync between clients through a SyncServer: conflicts, tombstones and server resets.
+"""
+import pytest
+
+from inventory_sync import SyncClient, SyncServer
+from switch_storage import SwitchStorage
+
+
+@pytest.fixture
+def server_url(started, free_port):
+    """URL of a fresh in-memory sync server; start_server() replaces it (a reset server)."""
+    def start_server():
+        server = started(SyncServer())
+        server.start('127.0.0.1', free_port)
+        return server
+
+    start_server.url = f'http://127.0.0.1:{free_port}/'
+    start_server.current = start_server()
+    return start_server
+
+
+def _client(tmp_path, name, url):
+    storage = SwitchStorage(str(tmp_path / name / 'switches.json'))
+    return SyncClient(storage, url, wait=0.0, timeout=5.0)
+
+
+def _urls(client):
+    return {name: entry['url'] for name, entry in client.storage.load_switches().items()}
+
+
+def test_concurrent_edits_converge_on_both_clients(tmp_path, server_url):
+    a = _client(tmp_path, 'a', server_url.url)
+    b = _client(tmp_path, 'b', server_url.url)
+    a.storage.save_switch('core', 'http://10.0.0.1/')
+    a.run_once()
+    b.run_once()
+
+    # Both edit the same switch while the other is not looking
+    a.storage.save_switch('core', 'http://10.0.0.2/')
+    b.storage.save_switch('core', 'http://10.0.0.3/')
+    a.storage.save_switch('edge', 'http://10.0.1.1/')
+    b.storage.save_switch('lab', 'http://10.0.2.1/')
+    for client in (a, b, a, b):
+        client.run_once()
+
+    assert _urls(a) == _urls(b)
+    assert set(_urls(a)) == {'core', 'edge', 'lab'}
+    assert _urls(a)['core'] in ('http://10.0.0.2/', 'http://10.0.0.3/')
+
+
+def test_tombstones_reach_an_offline_client(tmp_path, server_url):
+    a = _client(tmp_path, 'a', server_url.url)
+    b = _client(tmp_path, 'b', server_url.url)
+    a.storage.save_switch('core', 'http://10.0.0.1/')
+    a.storage.save_switch('edge', 'http://10.0.1.1/')
+    a.run_once()
+    b.run_once()
+    assert set(_urls(b)) == {'core', 'edge'}
+
+    # b is offline while edge is deleted; it learns about it when it comes back
+    a.storage.delete_switch('edge')
+    a.run_once()
+    b = _client(tmp_path, 'b', server_url.url)
+    b.run_once()
+
+    assert set(_urls(b)) == {'core'}
+
+
+def test_reset_server_gets_local_entries_offered_again(tmp_path, server_url):
+    a = _client(tmp_path, 'a', server_url.url)
+    a.storage.save_switch('core', 'http://10.0.0.1/')
+    a.storage.save_switch('edge', 'http://10.0.1.1/')
+    a.run_once()
+
+    # Server restarted without its journal: new epoch, empty inventory
+    server_url.current.stop()
+    reset = server_url()
+    a.run_once()
+
+    assert set(reset.changes()['changes']) == {'core', 'edge'}
+    b = _client(tmp_path, 'b', server_url.url)
+    b.run_once()
+    assert _urls(b) == _urls(a)
+
+
+def test_local_save_racing_a_remote_change_is_kept_and_pushed(tmp_path, server_url):
+    a = _client(tmp_path, 'a', server_url.url)
+    b = _client(tmp_path, 'b', server_url.url)
+    a.storage.save_switch('core', 'http://10.0.0.1/')
+    a.run_once()
+    b.run_once()
+    b.storage.save_switch('core', 'http://10.0.0.2/')
+    b.run_once()
+
+    # Another process saves core on a's side after a has compared stamps,
+    # but before the remote entry is written
+    other_process = SwitchStorage(a.storage.storage_file)
+    apply_changes = a.storage.apply_changes
+
+    def racing_apply(updated, removed, check=None):
+        other_process.save_switch('core', 'http://10.0.0.9/')
+        return apply_changes(updated, removed, check)
+
+    a.storage.apply_changes = racing_apply
+    a.pull()
+    a.storage.apply_changes = apply_changes
+
+    assert _urls(a)['core'] == 'http://10.0.0.9/'
+    a.push()
+    b.run_once()
+    assert _urls(b)['core'] == 'http://10.0.0.9/'
@@ -0,0 +1,84 @@
+"""
+ManagerRegistry eviction of SwitchManagers, and the managers a LaunchScheduler batch keeps alive until spawned.
+"""
+import threading
+
+from launch_scheduler import LaunchScheduler
+from manager_registry import ManagerRegistry
+from switch_manager import SwitchManager
+
+
+def _registry(max_live):
+    return ManagerRegistry(lambda name, url: SwitchManager(url, name), max_live=max_live)
+
+
+def test_least_recently_used_are_evicted_over_max_live():
+    registry = _registry(max_live=2)
+    for name in ('a', 'b', 'c'):
+        registry.get(name, 'http://192.0.2.1/')
+
+    assert sorted(name for name, _manager in registry.items()) == ['b', 'c']
+
+
+def test_managers_queued_for_launch_are_kept():
+    registry = _registry(max_live=2)
+    queued = [registry.get(name, 'http://192.0.2.1/') for name in ('a', 'b')]
+    for manager in queued:
+        manager.launch_pending = True
+
+    registry.get('c', 'http://192.0.2.1/')
+    assert len(registry) == 3
+
+    for manager in queued:
+        manager.launch_pending = False
+    registry.evict_idle()
+    assert sorted(name for name, _manager in registry.items()) == ['b', 'c']
+
+
+class _Console:
+    """SwitchManager stand-in whose console opens once the test releases it."""
+
+    def __init__(self, name, release):
+        self.switch_name = name
+        self.launch_pending = False
+        self.release = release
+        self.opened = False
+
+    def is_console_open(self):
+        return self.opened
+
+    def open_console(self, skip_check=False):
+        self.release.wait(5)
+        self.opened = True
+
+    def wait_until_ready(self, timeout=None):
+        return 0.1
+
+
+def test_batch_marks_managers_pending_until_spawned():
+    release = threading.Event()
+    consoles = [_Console(f'sw{index}', release) for index in range(3)]
+    done = threading.Event()
+    scheduler = LaunchScheduler(max_concurrent=3, stagger=0)
+
+    scheduler.open_all(consoles, on_done=lambda results: done.set())
+    assert all(console.launch_pending for console in consoles)
+    release.set()
+
+    assert done.wait(5)
+    assert not any(console.launch_pending for console in consoles)
+
+
+def test_cancelled_batch_clears_pending():
+    release = threading.Event()
+    consoles = [_Console(f'sw{index}', release) for index in range(3)]
+    done = threading.Event()
+    scheduler = LaunchScheduler(max_concurrent=3, stagger=0)
+
+    scheduler.open_all(consoles, on_done=lambda results: done.set())
+    scheduler.cancel()
+    release.set()
+
+    assert done.wait(5)
+    assert not any(console.launch_pending for console in consoles)
+    assert not all(console.opened for console in consoles)
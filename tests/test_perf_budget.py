@@ -0,0 +1,210 @@
+"""
+Performance budgets: the core paths at inventory scale must stay within their agreed time, memory and thread limits.
+
+Each test runs one core path against local stand-ins (a temporary
+switches.json, a simulated switch from fleet_sim.py with WAN-like latency,
+a bare Tk listbox) and asserts one measurement against its budget in BUDGETS.
+The tests are marked slow (deselect them with -m "not slow"). The switch list
+tests need a display and are skipped without one; run them under xvfb-run.
+"""
+import threading
+import time
+import tracemalloc
+
+import pytest
+
+from fleet_sim import FleetSimulator
+from switch_manager import SwitchManagerGUI
+from switch_storage import SwitchStorage
+
+pytestmark = pytest.mark.slow
+
+# Scale the budgets are agreed for
+SWITCHES = 50000
+PROBES = 1000
+# Calls timed per latency check (saves are capped at 40, each rewrites the file)
+SAMPLES = 200
+
+# Response latency of the simulated switch in seconds: checks overlap like
+# they do against real switches, so the thread peak means something
+PROBE_LATENCY = 0.05
+
+BUDGETS = {
+    # tracemalloc peak while loading the inventory
+    'load_peak_mib': 64.0,
+    # 95th percentile latency at scale
+    'get_switch_p95_ms': 1.0,
+    'save_switch_p95_ms': 1200.0,
+    # Most extra threads alive while many connection checks run
+    'probe_peak_threads': 256,
+    # Filling the switch list from scratch, and applying a one-switch change to it
+    'listbox_rebuild_ms': 2000.0,
+    'listbox_update_ms': 800.0,
+    # Applying a search that keeps switches spread over the whole list, then clearing it
+    'listbox_filter_ms': 2500.0,
+}
+
+
+def _percentile(samples, fraction):
+    """Percentile of samples (nearest rank), e.g. fraction=0.95 for p95."""
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, int(round(fraction * len(ordered))) - 1))
+    return ordered[index]
+
+
+def _timed_ms(fn):
+    started = time.perf_counter()
+    fn()
+    return (time.perf_counter() - started) * 1000
+
+
+def _assert_within(name, value, note=''):
+    assert value <= BUDGETS[name], f"{name} is {value:.2f}, over its budget of {BUDGETS[name]:g} ({note})"
+
+
+def _inventory(count):
+    """count switch entries shaped like a real inventory."""
+    switches = {}
+    for index in range(count):
+        name = f"switch-{index:06d}"
+        switches[name] = {
+            'name': name,
+            'url': f"http://10.{index // 65536 % 256}.{index // 256 % 256}.{index % 256}/",
+            'backup': True,
+            'site': f"site-{index % 40:02d}",
+        }
+    return switches
+
+
+@pytest.fixture(scope='module')
+def storage_file(tmp_path_factory):
+    """switches.json holding SWITCHES switches (shared by the module's tests)."""
+    path = str(tmp_path_factory.mktemp('perf') / 'switches.json')
+    SwitchStorage(path).apply_changes(_inventory(SWITCHES), [])
+    return path
+
+
+def _picked(storage):
+    names = sorted(storage.load_switches())
+    return names[::max(1, len(names) // SAMPLES)][:SAMPLES]
+
+
+def test_load_peak_memory(storage_file):
+    storage = SwitchStorage(storage_file)
+    tracemalloc.start()
+    try:
+        loaded = storage.load_switches()
+        _current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert len(loaded) == SWITCHES
+    _assert_within('load_peak_mib', peak / 1048576)
+
+
+def test_get_switch_latency(storage_file):
+    storage = SwitchStorage(storage_file)
+    latencies = [_timed_ms(lambda name=name: storage.get_switch(name)) for name in _picked(storage)]
+
+    _assert_within('get_switch_p95_ms', _percentile(latencies, 0.95), f"{len(latencies)} calls")
+
+
+def test_save_switch_latency(storage_file):
+    storage = SwitchStorage(storage_file)
+    loaded = storage.load_switches()
+    latencies = [_timed_ms(lambda name=name: storage.save_switch(name, loaded[name]['url'] + 'x'))
+                 for name in _picked(storage)[:40]]
+
+    _assert_within('save_switch_p95_ms', _percentile(latencies, 0.95), f"{len(latencies)} calls")
+
+
+def test_probe_peak_threads(started, switch_managers):
+    switch = started(FleetSimulator(1, latency=PROBE_LATENCY)).start()[0]
+    manager = switch_managers.make(switch.url, switch.name)
+    baseline = threading.active_count()
+    peak = baseline
+    done = threading.Semaphore(0)
+    failures = []
+
+    def on_result(reachable):
+        if not reachable:
+            failures.append(1)
+        done.release()
+
+    for _ in range(PROBES):
+        manager.check_connection(on_result)
+        peak = max(peak, threading.active_count())
+    for _ in range(PROBES):
+        # Keep sampling while the last checks finish
+        while not done.acquire(timeout=0.005):
+            peak = max(peak, threading.active_count())
+
+    assert not failures
+    _assert_within('probe_peak_threads', peak - baseline, f"{PROBES} checks at {PROBE_LATENCY * 1000:g} ms latency")
+
+
+@pytest.fixture
+def switch_list(storage_file):
+    """Only the list handling of the GUI (no tray, proxy or background loading) in a hidden Tk root."""
+    tk = pytest.importorskip('tkinter')
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        pytest.skip(f"no display: {e}")
+    root.withdraw()
+    gui = SwitchManagerGUI.__new__(SwitchManagerGUI)
+    gui.root = root
+    gui.storage = SwitchStorage(storage_file)
+    gui.search_var = tk.StringVar(root)
+    gui.site_status = {}
+    gui.listbox_rows = []
+    gui.listbox_index_to_name = {}
+    gui.inventory_rows = []
+    gui.search_index = None
+    gui._search_after = None
+    gui.switches_listbox = tk.Listbox(root)
+    yield gui
+    root.destroy()
+
+
+def _reload(gui):
+    gui.load_saved_switches()
+    gui.root.update_idletasks()
+
+
+def test_listbox_rebuild(switch_list):
+    elapsed = _timed_ms(lambda: _reload(switch_list))
+
+    assert switch_list.switches_listbox.size() == SWITCHES
+    _assert_within('listbox_rebuild_ms', elapsed, f"{SWITCHES} rows")
+
+
+def test_listbox_update(switch_list):
+    _reload(switch_list)
+    name = switch_list.listbox_rows[len(switch_list.listbox_rows) // 2][0]
+    switch_list.storage.update_switch(name, url='http://192.0.2.1/')
+
+    elapsed = _timed_ms(lambda: _reload(switch_list))
+
+    assert switch_list.storage.get_switch(name)['url'] in switch_list.switches_listbox.get(0, 'end')[SWITCHES // 2]
+    _assert_within('listbox_update_ms', elapsed, "one switch changed")
+
+
+def test_listbox_filter(switch_list):
+    _reload(switch_list)
+
+    def search(query):
+        # What the search field does once typing pauses
+        switch_list.search_var.set(query)
+        switch_list._apply_search()
+        switch_list.root.update_idletasks()
+
+    # URLs ending in 0/: about every tenth switch, spread over the whole list
+    applied = _timed_ms(lambda: search('0/'))
+    shown = switch_list.switches_listbox.size()
+    cleared = _timed_ms(lambda: search(''))
+
+    assert SWITCHES // 20 < shown < SWITCHES // 5
+    assert switch_list.switches_listbox.size() == SWITCHES
+    _assert_within('listbox_filter_ms', applied + cleared,
+                   f"{shown} rows shown in {applied:.0f} ms, cleared in {cleared:.0f} ms")
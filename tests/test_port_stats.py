@@ -0,0 +1,189 @@
+"""
+Port statistics: GETBULK walks against a loopback SNMP agent, and the counter delta/wrap/rate math.
+"""
+import math
+import socket
+import threading
+
+import pytest
+
+pytest.importorskip('numpy')
+
+from port_stats import CounterSample, CounterStore, METRICS, PortStatsPoller, SNMP_COLUMNS
+from snmp_client import (END_OF_VIEW, PDU_GETBULK, PDU_RESPONSE, TAG_COUNTER32, TAG_COUNTER64,
+                         SnmpClient, decode_message, encode_message, oid_key)
+from switch_storage import SwitchStorage
+
+
+class LoopbackAgent:
+    """SNMPv2c agent on 127.0.0.1 answering GETBULK from a static MIB."""
+
+    def __init__(self, mib, community='public'):
+        """
+        Args:
+            mib: {oid: (tag, value)}
+            community: Requests with another community are ignored (like real agents)
+        """
+        self.mib = mib
+        self.order = sorted(mib, key=oid_key)
+        self.community = community
+        self.requests = 0
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(('127.0.0.1', 0))
+        self.port = self.sock.getsockname()[1]
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    def _next(self, oid):
+        key = oid_key(oid)
+        for candidate in self.order:
+            if oid_key(candidate) > key:
+                return candidate
+        return None
+
+    def _serve(self):
+        while True:
+            try:
+                data, address = self.sock.recvfrom(65535)
+            except OSError:
+                return
+            request = decode_message(data)
+            if request['community'] != self.community or request['pdu_type'] != PDU_GETBULK:
+                continue
+            self.requests += 1
+            cursors = [oid for oid, _value in request['varbinds']]
+            varbinds = []
+            for _repetition in range(request['field2']):
+                for i, cursor in enumerate(cursors):
+                    following = self._next(cursor) if cursor is not None else None
+                    if following is None:
+                        varbinds.append((cursor or request['varbinds'][i][0], END_OF_VIEW))
+                    else:
+                        varbinds.append((following, self.mib[following]))
+                    cursors[i] = following
+                if all(cursor is None for cursor in cursors):
+                    break
+            self.sock.sendto(encode_message(request['community'], PDU_RESPONSE, request['request_id'],
+                                            varbinds), address)
+
+    def stop(self):
+        self.sock.close()
+
+
+def _if_mib(ports, in_octets=lambda p: p * 1000, errors=lambda p: p):
+    mib = {}
+    for port in ports:
+        mib[f"{SNMP_COLUMNS['in_octets'][0]}.{port}"] = (TAG_COUNTER64, in_octets(port))
+        mib[f"{SNMP_COLUMNS['out_octets'][0]}.{port}"] = (TAG_COUNTER64, in_octets(port) // 2)
+        mib[f"{SNMP_COLUMNS['in_errors'][0]}.{port}"] = (TAG_COUNTER32, errors(port))
+        mib[f"{SNMP_COLUMNS['out_errors'][0]}.{port}"] = (TAG_COUNTER32, 0)
+    # A neighbouring column the walk must stop at
+    mib['1.3.6.1.2.1.31.1.1.1.18.1'] = b'uplink'
+    return mib
+
+
+@pytest.fixture
+def agent(started):
+    return lambda mib, **options: started(LoopbackAgent(mib, **options))
+
+
+def test_bulk_walk_reads_every_row_in_few_round_trips(agent):
+    snmp = agent(_if_mib(range(1, 49)))
+    client = SnmpClient('127.0.0.1', port=snmp.port, timeout=1.0)
+    columns = [SNMP_COLUMNS[metric][0] for metric in METRICS]
+
+    table = client.bulk_walk(columns, max_repetitions=20)
+
+    assert table[columns[0]] == {port: port * 1000 for port in range(1, 49)}
+    assert table[columns[2]] == {port: port for port in range(1, 49)}
+    assert all(len(table[column]) == 48 for column in columns)
+    # 48 rows at 20 per request: 3 round trips, not one per counter
+    assert snmp.requests == 3
+
+
+def test_wrong_community_times_out(agent):
+    snmp = agent(_if_mib([1]), community='secret')
+    client = SnmpClient('127.0.0.1', community='public', port=snmp.port, timeout=0.2, retries=1)
+
+    with pytest.raises(TimeoutError):
+        client.bulk_walk([SNMP_COLUMNS['in_octets'][0]])
+
+
+def test_poller_reads_snmp_switches(tmp_path, agent):
+    snmp = agent(_if_mib(range(1, 9)))
+    storage = SwitchStorage(str(tmp_path / 'switches.json'))
+    storage.save_switch('core', 'http://127.0.0.1/')
+    storage.update_switch('core', snmp_community='public', snmp_port=snmp.port)
+    poller = PortStatsPoller(storage, timeout=1.0)
+
+    sample = poller.fetch(storage.get_switch('core'))
+
+    assert list(sample.ports) == list(range(1, 9))
+    assert sample.values[2] == [3000, 1500, 3, 0]
+    assert sample.widths == [64, 64, 32, 32]
+
+
+def _sample(ports, rows, timestamp, widths=(64, 64, 32, 32)):
+    return CounterSample(ports, rows, list(widths), timestamp)
+
+
+def test_rates_are_bits_per_second_for_octets():
+    store = CounterStore()
+    store.update('sw', _sample([1, 2], [[0, 0, 0, 0], [1000, 0, 5, 0]], 100.0))
+    store.update('sw', _sample([1, 2], [[1250, 500, 10, 0], [1000, 0, 5, 0]], 110.0))
+
+    rates = store.rates('sw')
+
+    assert rates[1] == {'in_octets': 1000.0, 'out_octets': 400.0, 'in_errors': 1.0, 'out_errors': 0.0}
+    assert rates[2]['in_octets'] == 0.0
+
+
+def test_32bit_counter_wrap_is_a_small_delta():
+    store = CounterStore()
+    store.update('sw', _sample([1], [[0, 0, 2 ** 32 - 100, 0]], 0.0))
+    store.update('sw', _sample([1], [[0, 0, 50, 0]], 10.0))
+
+    assert store.rates('sw')[1]['in_errors'] == 15.0
+
+
+def test_32bit_octet_counters_from_http_wrap_too():
+    store = CounterStore()
+    widths = (32, 32, 32, 32)
+    store.update('sw', _sample([7], [[2 ** 32 - 1000, 0, 0, 0]], 0.0, widths))
+    store.update('sw', _sample([7], [[1000, 0, 0, 0]], 1.0, widths))
+
+    assert store.rates('sw')[7]['in_octets'] == 2000 * 8.0
+
+
+def test_64bit_counter_going_backwards_is_a_reset():
+    store = CounterStore()
+    store.update('sw', _sample([1], [[10 ** 12, 0, 0, 0]], 0.0))
+    store.update('sw', _sample([1], [[500, 0, 0, 0]], 10.0))
+
+    assert math.isnan(store.rates('sw')[1]['in_octets'])
+    # A reset port never ranks as the busiest
+    assert store.top_ports(5) == []
+
+
+def test_ports_are_matched_by_id_when_the_port_list_changes():
+    store = CounterStore()
+    store.update('sw', _sample([1, 2, 3], [[0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0]], 0.0))
+    store.update('sw', _sample([3, 4, 1], [[30, 0, 0, 0], [99, 0, 0, 0], [10, 0, 0, 0]], 1.0))
+
+    rates = store.rates('sw')
+
+    assert sorted(rates) == [1, 3]
+    assert rates[1]['in_octets'] == 80.0
+    assert rates[3]['in_octets'] == 240.0
+
+
+def test_top_ports_ranks_across_switches():
+    store = CounterStore()
+    for name, scale in (('a', 1), ('b', 10), ('c', 4)):
+        ports = [1, 2, 3]
+        store.update(name, _sample(ports, [[0, 0, 0, 0]] * 3, 0.0))
+        store.update(name, _sample(ports, [[port * scale, 0, 0, 0] for port in ports], 1.0))
+
+    top = store.top_ports(3)
+
+    assert [(row.switch, row.port, row.rate) for row in top] == [('b', 3, 240.0), ('b', 2, 160.0), ('c', 3, 96.0)]
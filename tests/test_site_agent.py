@@ -0,0 +1,69 @@
+"""
+Aggregator and AggregatorClient over HTTP: incremental polls, restarts and pruned removals.
+"""
+import site_agent
+from site_agent import Aggregator, AggregatorClient
+
+
+def _report(site, seq, changes, full=False, removed=()):
+    return {'site': site, 'seq': seq, 'full': full, 'interval': 30,
+            'changes': changes, 'removed': list(removed)}
+
+
+def _start(started, port):
+    aggregator = started(Aggregator(token='secret'))
+    aggregator.start('127.0.0.1', port)
+    return aggregator
+
+
+def test_client_follows_incremental_changes(started, free_port):
+    aggregator = _start(started, free_port)
+    aggregator.apply(_report('berlin', 1, {'core': [1, 200, 4], 'edge': [1, 200, 8]}, full=True))
+    client = AggregatorClient(f'http://127.0.0.1:{free_port}/', token='secret')
+
+    assert client.poll()
+    assert client.reachability() == {'core': True, 'edge': True}
+
+    aggregator.apply(_report('berlin', 2, {'core': [0, None, None]}, removed=['edge']))
+    assert client.poll()
+    assert client.reachability() == {'core': False}
+    assert not client.poll()
+
+
+def test_restarted_aggregator_replaces_the_client_copy(started, free_port):
+    aggregator = _start(started, free_port)
+    aggregator.apply(_report('berlin', 1, {'core': [1, 200, 4], 'edge': [1, 200, 8], 'lab': [1, 200, 2]},
+                             full=True))
+    client = AggregatorClient(f'http://127.0.0.1:{free_port}/', token='secret')
+    client.poll()
+    old_version = client.version
+
+    # Restart: the agent re-sends a full snapshot without 'lab', and enough
+    # churn brings the new version past the client's
+    aggregator.stop()
+    restarted = _start(started, free_port)
+    restarted.apply(_report('berlin', 1, {'core': [1, 200, 4], 'edge': [1, 200, 8]}, full=True))
+    for seq in range(2, 5):
+        restarted.apply(_report('berlin', seq, {'core': [seq % 2, 200, 4]}))
+    assert restarted.status()['version'] >= old_version
+
+    assert client.poll()
+    assert client.epoch == restarted.epoch
+    assert sorted(client.reachability()) == ['core', 'edge']
+
+
+def test_removed_history_is_capped(started, free_port, monkeypatch):
+    monkeypatch.setattr(site_agent, 'MAX_REMOVED', 5)
+    aggregator = _start(started, free_port)
+    names = [f'sw{i}' for i in range(20)]
+    aggregator.apply(_report('berlin', 1, {name: [1, 200, 4] for name in names}, full=True))
+    client = AggregatorClient(f'http://127.0.0.1:{free_port}/', token='secret')
+    client.poll()
+
+    aggregator.apply(_report('berlin', 2, {}, removed=names[:12]))
+
+    assert len(aggregator._removed) == 5
+    # The client's version predates the pruned removals: it gets the full status
+    assert aggregator.status(client.version, client.epoch)['full']
+    assert client.poll()
+    assert sorted(client.reachability()) == sorted(names[12:])
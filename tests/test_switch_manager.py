@@ -0,0 +1,178 @@
+"""
+SwitchManager connection checks against a local stub switch, console reuse with a stub launcher, and the switch list.
+"""
+import json
+import random
+import subprocess
+import sys
+import time
+
+import pytest
+
+import switch_manager
+from alert_engine import AlertEngine
+from switch_manager import SwitchManager, SwitchManagerGUI, row_edits
+
+# Stands in for webview_launcher.py: reports the page loaded, then logs the
+# command line and every control command it is sent
+STUB_LAUNCHER = """
+import json, sys
+log = open(sys.argv[1], 'a')
+log.write(json.dumps({'action': 'start', 'args': sys.argv[2:]}) + '\\n')
+log.flush()
+print('READY', flush=True)
+for line in sys.stdin:
+    log.write(line)
+    log.flush()
+    if json.loads(line).get('action') == 'close':
+        break
+"""
+
+
+def test_server_errors_do_not_open_the_circuit(stub_server, switch_managers):
+    switch = stub_server(lambda request: (503, {}, b'busy\n'))
+    core = switch_managers.make(switch.url)
+
+    results = switch_managers.check(core, 4)
+
+    assert [r.status_code for r in results] == [503] * 4
+    assert not any(r.error == 'Host down (circuit open)' for r in results)
+    assert not any(r.reachable for r in results)
+    assert len(switch.requests) == 4
+
+
+def test_refused_connections_open_the_circuit(switch_managers, free_port):
+    core = switch_managers.make(f'http://127.0.0.1:{free_port}/')
+
+    results = switch_managers.check(core, 4)
+
+    assert all(r.status_code is None for r in results)
+    assert [r.error == 'Host down (circuit open)' for r in results] == [False, False, False, True]
+
+
+def test_check_results_feed_alerts(stub_server, switch_managers):
+    switch = stub_server(lambda request: (200, {}, b'ok\n'))
+    alerts = AlertEngine(lambda alert: None)
+    core = switch_managers.make(switch.url)
+    core.on_probe = lambda result: alerts.observe(result.name, result.reachable)
+
+    switch_managers.check(core)
+
+    assert alerts.counts()[True] == 1
+
+
+@pytest.fixture
+def stub_launcher(tmp_path, monkeypatch):
+    """Run consoles in STUB_LAUNCHER; returns a function waiting for the commands it logged, and the spawns."""
+    script = tmp_path / 'launcher.py'
+    script.write_text(STUB_LAUNCHER)
+    log = tmp_path / 'commands.jsonl'
+    monkeypatch.setattr(switch_manager, 'webview_launcher_command', lambda: [sys.executable, str(script), str(log)])
+    spawned = []
+    popen = subprocess.Popen
+
+    def counting_popen(*args, **kwargs):
+        spawned.append(args[0])
+        return popen(*args, **kwargs)
+
+    monkeypatch.setattr(switch_manager.subprocess, 'Popen', counting_popen)
+
+    def commands(count):
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            lines = log.read_text().splitlines() if log.exists() else []
+            if len(lines) >= count:
+                return [json.loads(line) for line in lines]
+            time.sleep(0.02)
+        raise AssertionError(f"launcher logged {lines}, expected {count} command(s)")
+
+    commands.spawned = spawned
+    return commands
+
+
+def test_open_console_reuses_the_running_window(stub_launcher):
+    manager = SwitchManager('http://192.0.2.1/', 'core')
+    manager.open_console(skip_check=True)
+    try:
+        assert manager.wait_until_ready(5) is not None
+
+        manager.open_console(skip_check=True)
+        assert [c['action'] for c in stub_launcher(2)] == ['start', 'focus']
+
+        manager.switch_url = 'https://192.0.2.1:8443/'
+        manager.open_console(skip_check=True)
+        commands = stub_launcher(4)
+        assert commands[2] == {'action': 'navigate', 'url': 'https://192.0.2.1:8443/'}
+        assert commands[3]['action'] == 'focus'
+        assert commands[0]['args'][:2] == ['http://192.0.2.1/', 'core']
+        assert len(stub_launcher.spawned) == 1
+    finally:
+        process = manager.webview_process
+        manager.close_console()
+        if process is not None:
+            process.wait(5)
+
+
+def _apply(rows, edits):
+    texts = [text for _name, text in rows]
+    for start, end, inserted in reversed(edits):
+        texts[start:end] = inserted
+    return texts
+
+
+def test_row_edits_turn_the_old_list_into_the_new_one():
+    rng = random.Random(7)
+    names = [f"sw{index:04d}" for index in range(500)]
+    for _ in range(50):
+        old = [(name, name + rng.choice('ab')) for name in names if rng.random() < 0.6]
+        new = [(name, name + rng.choice('ab')) for name in names if rng.random() < 0.6]
+        assert _apply(old, row_edits(old, new)) == [text for _name, text in new]
+
+
+def test_one_changed_switch_is_one_edit():
+    rows = [(f"sw{index:05d}", f"sw{index:05d} - http://10.0.0.1/") for index in range(50000)]
+    changed = list(rows)
+    changed[25000] = (rows[25000][0], 'changed')
+
+    assert row_edits(rows, changed) == [(25000, 25001, ['changed'])]
+    assert row_edits(rows, rows) == []
+
+
+def test_scattered_filter_is_linear():
+    rows = [(f"sw{index:05d}", f"sw{index:05d} - http://10.0.0.1/") for index in range(50000)]
+    filtered = rows[::5]
+
+    started = time.perf_counter()
+    edits = row_edits(rows, filtered)
+    cleared = row_edits(filtered, rows)
+    elapsed = time.perf_counter() - started
+
+    assert len(edits) == len(cleared) == 10000
+    assert elapsed < 1.0
+
+
+class _Var:
+    def __init__(self, value=''):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+
+def test_search_filters_the_loaded_rows_without_reading_storage():
+    gui = SwitchManagerGUI.__new__(SwitchManagerGUI)
+    gui.search_var = _Var()
+    shown = []
+    gui._show_rows = shown.append
+    switches = {
+        'core': {'url': 'http://10.0.0.1/', 'facts': {'model': 'GS308E'}},
+        'edge': {'url': 'http://10.0.0.2/', 'facts': {'model': 'GS105E'}},
+    }
+    gui._set_inventory(*gui._inventory_rows(switches))
+
+    gui.search_var.value = 'gs308e 10.0.0'
+    gui._apply_search()
+    gui.search_var.value = '  '
+    gui._apply_search()
+
+    assert [[name for name, _text in rows] for rows in shown] == [['core', 'edge'], ['core'], ['core', 'edge']]
@@ -0,0 +1,89 @@
+"""
+SwitchStorage persistence: cross-process locking, atomic replace and change detection.
+"""
+import glob
+import json
+import multiprocessing
+import threading
+
+import switch_storage
+from switch_storage import SwitchStorage
+
+
+def _save_many(path, prefix, count, start):
+    """Child process: save count switches once both processes are ready."""
+    start.wait()
+    storage = SwitchStorage(path)
+    for index in range(count):
+        assert storage.save_switch(f"{prefix}-{index:03d}", f"http://10.0.0.{index % 250 + 1}/")
+
+
+def test_concurrent_saves_from_two_processes_keep_every_entry(tmp_path):
+    path = str(tmp_path / 'switches.json')
+    context = multiprocessing.get_context('spawn')
+    start = context.Barrier(2)
+    processes = [context.Process(target=_save_many, args=(path, prefix, 60, start)) for prefix in ('a', 'b')]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(60)
+
+    assert [process.exitcode for process in processes] == [0, 0]
+    names = set(SwitchStorage(path).load_switches())
+    assert names == {f"{prefix}-{index:03d}" for prefix in ('a', 'b') for index in range(60)}
+
+
+def test_failed_write_leaves_the_old_file_intact(tmp_path, monkeypatch):
+    path = tmp_path / 'switches.json'
+    storage = SwitchStorage(str(path))
+    storage.save_switch('core', 'http://10.0.0.1/')
+    before = path.read_bytes()
+
+    def disk_full(fd):
+        raise OSError("disk full")
+
+    # The new contents are in the temporary file, but never make it to disk
+    monkeypatch.setattr(switch_storage.os, 'fsync', disk_full)
+    assert not storage.save_switch('edge', 'http://10.0.0.2/')
+    monkeypatch.undo()
+
+    assert path.read_bytes() == before
+    assert list(json.loads(before)) == ['core']
+    assert not glob.glob(str(tmp_path / '.switches.json-*'))
+    assert SwitchStorage(str(path)).get_switch_names() == ['core']
+
+
+def test_poll_changes_reports_only_changed_names(tmp_path):
+    path = str(tmp_path / 'switches.json')
+    writer = SwitchStorage(path)
+    for index in range(5):
+        writer.save_switch(f"sw{index}", f"http://10.0.0.{index + 1}/")
+    reader = SwitchStorage(path)
+    reader.load_switches()
+
+    writer.update_switch('sw1', url='http://10.0.1.1/')
+    writer.save_switch('sw9', 'http://10.0.0.9/')
+    writer.delete_switch('sw3')
+
+    assert reader.poll_changes() == ({'sw1', 'sw9'}, {'sw3'})
+    assert reader.poll_changes() == (set(), set())
+    assert reader.get_switch('sw1')['url'] == 'http://10.0.1.1/'
+
+
+def test_watch_reports_other_writers_only(tmp_path):
+    path = str(tmp_path / 'switches.json')
+    writer = SwitchStorage(path)
+    writer.save_switch('core', 'http://10.0.0.1/')
+    watched = SwitchStorage(path)
+    reported = []
+    changed = threading.Event()
+    watched.watch(lambda names, removed: (reported.append((names, removed)), changed.set()), interval=0.05)
+    try:
+        # Writes through the watching instance itself are not reported back
+        watched.save_switch('own', 'http://10.0.0.2/')
+        writer.save_switch('edge', 'http://10.0.0.3/')
+        assert changed.wait(5)
+    finally:
+        watched.stop_watching()
+
+    assert reported == [({'edge'}, set())]
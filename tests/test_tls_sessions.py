@@ -0,0 +1,65 @@
+"""
+TLSSessionCache against a simulated HTTPS switch: pinned certificates and resumed handshakes.
+"""
+from urllib.parse import urlparse
+
+import pytest
+import requests
+
+from fleet_sim import FleetSimulator
+from http_session import create_session
+from tls_sessions import TLSSessionCache, fetch_fingerprint
+
+
+@pytest.fixture
+def https_switch(started):
+    """A simulated HTTPS switch with its own self-signed certificate; returns (url, sim.cert_file)."""
+    sim = started(FleetSimulator(1, tls_rate=1))
+    switch = sim.start()[0]
+    return switch.url, sim.cert_file
+
+
+def _get(tls, url, **kwargs):
+    session = create_session(retries=0, tls=tls)
+    try:
+        return session.get(url, timeout=5, **kwargs)
+    finally:
+        session.close()
+
+
+def test_pinned_certificate_connects(https_switch):
+    url, _cert_file = https_switch
+    tls = TLSSessionCache()
+    tls.pin(urlparse(url).netloc, fetch_fingerprint(url)[0])
+
+    assert _get(tls, url).status_code == 200
+    assert tls.stats()['pin_mismatches'] == 0
+
+
+def test_wrong_pin_is_refused(https_switch):
+    url, _cert_file = https_switch
+    tls = TLSSessionCache()
+    tls.pin(urlparse(url).netloc, 'ab' * 32)
+
+    with pytest.raises(requests.exceptions.SSLError):
+        _get(tls, url)
+    assert tls.stats()['pin_mismatches'] >= 1
+
+
+@pytest.mark.parametrize('pinned', [False, True])
+def test_fresh_session_resumes_the_handshake(https_switch, pinned):
+    url, cert_file = https_switch
+    tls = TLSSessionCache()
+    options = {}
+    if pinned:
+        tls.pin(urlparse(url).netloc, fetch_fingerprint(url)[0])
+    else:
+        options['verify'] = cert_file
+
+    assert _get(tls, url, **options).status_code == 200
+    assert tls.last_resumed() is False
+
+    # A new session has no pooled connection: it does a handshake, but a resumed one
+    assert _get(tls, url, **options).status_code == 200
+    assert tls.last_resumed() is True
+    assert tls.stats()['resumed'] == 1
@@ -8,10 +8,10 @@ a = Analysis(
     binaries=[],
     datas=[
         ('icon.png', '.'),
-        ('core/webview_launcher.py', 'core'),
     ],
     hiddenimports=[
         'webview',
+        'webview_launcher',
         'requests',
         'PIL',
         'PIL._tkinter_finder',